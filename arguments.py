@@ -0,0 +1,67 @@
+"""
+arguments.py
+------------
+argparse type validators shared by the command-line scripts, so every
+script accepts and rejects the same spellings with the same message.
+
+Usage:
+    from arguments import validate_bytes, validate_month
+    parser.add_argument("--start", type=validate_month)
+"""
+
+import argparse
+import re
+from datetime import datetime
+
+# Period bounds a chart range may be given in, by string length
+PERIOD_BOUND_FORMATS = {
+    len("YYYY-MM"):       ("month", "%Y-%m"),
+    len("YYYY-MM-DD"):    ("day",   "%Y-%m-%d"),
+    len("YYYY-MM-DDTHH"): ("hour",  "%Y-%m-%dT%H"),
+}
+
+
+def validate_month(value: str) -> str:
+    """Validate YYYY-MM format and return the value unchanged."""
+    if not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", value):
+        raise argparse.ArgumentTypeError(
+            f"Invalid month format: '{value}'. Expected YYYY-MM (e.g. 2023-01)."
+        )
+    return value
+
+
+def parse_period(value: str) -> tuple[datetime, str]:
+    """
+    Parse a YYYY-MM, YYYY-MM-DD or YYYY-MM-DDTHH bound into (first instant,
+    granularity); ValueError names the accepted formats.
+    """
+    granularity, fmt = PERIOD_BOUND_FORMATS.get(len(value), (None, None))
+    try:
+        if fmt is None:
+            raise ValueError
+        return datetime.strptime(value, fmt), granularity
+    except ValueError:
+        raise ValueError(
+            f"Invalid period: '{value}'. Expected YYYY-MM, YYYY-MM-DD or "
+            f"YYYY-MM-DDTHH (e.g. 2024-03, 2024-03-04, 2024-03-04T17)."
+        ) from None
+
+
+def validate_period(value: str) -> str:
+    """Validate a chart bound (see parse_period) and return it unchanged."""
+    try:
+        parse_period(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+    return value
+
+
+def validate_bytes(value: str) -> int:
+    """Parse a byte count such as '500000000', '500GB' or '1.5TB'."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMGT]?B?)", value.strip().upper())
+    if not match:
+        raise argparse.ArgumentTypeError(
+            f"Invalid byte size: '{value}'. Expected e.g. 500GB or 1.5TB."
+        )
+    scale = {"": 1, "K": 1e3, "M": 1e6, "G": 1e9, "T": 1e12}
+    return int(float(match.group(1)) * scale[match.group(2).rstrip("B")])
@@ -0,0 +1,588 @@
+"""
+backends.py
+-----------
+Query backends for the fetch path: where a metric query over a range of
+months is sent, how it is dry-run and how its rows come back.
+
+Metrics are defined once, logically (which event type, which value to
+sum or just a count), and rendered into each backend's SQL:
+
+    bigquery  githubarchive.month.* on Google BigQuery (billed per byte)
+    duckdb    the same aggregation run locally by DuckDB over either a
+              mirror of the hourly GH Archive dumps (YYYY-MM-DD-H.json.gz)
+              or the monthly Parquet shards written by shards.py
+
+Both return {YYYY-MM: value} in the same shape, so fetch_runs, the result
+cache and the store don't care which one answered. A range may also be
+given in days (YYYY-MM-DD), to fetch only the days around events: BigQuery
+then reads githubarchive.day.* instead, and DuckDB only those days' files.
+
+The DuckDB backend gives an offline, zero-cost path for development,
+benchmarks and air-gapped runs. It prunes by file the way BigQuery prunes
+by _TABLE_SUFFIX, and it reports the bytes of the files it reads as "bytes
+scanned".
+
+Usage:
+    python backends.py --backend duckdb --source /mnt/gharchive --start 2024-01 --end 2024-03
+    python backends.py --backend duckdb --source data/shards --metric push_events --dry-run
+    python backends.py --backend bigquery --project YOUR_GCP_PROJECT_ID --dry-run
+"""
+
+import argparse
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Iterator, Optional, Sequence, Union
+
+from arguments import validate_month
+
+# The GCP SDK takes most of a second to import and duckdb isn't needed
+# for BigQuery runs; each backend imports its own client on first use.
+if TYPE_CHECKING:
+    import pyarrow as pa
+    from google.cloud import bigquery
+
+USD_PER_GB = 0.005          # BigQuery on-demand pricing, $5 per TB scanned
+BATCH_ROWS = 65_536         # rows per Arrow record batch when streaming
+
+# ---------------------------------------------------------------------------
+# Logical query definitions
+# ---------------------------------------------------------------------------
+# metric: (event type, value summed per month, or None to count events)
+#
+# commits sums payload.size, the authoritative commit count of a push.
+# push_events is the cheap path for estimated months: a count touches only
+# the type and created_at columns, so the payload JSON blob (the bulk of
+# every monthly table) is never read and the scan is roughly an order of
+# magnitude smaller. The other counts are overlays for the chart.
+METRIC  = "commits"
+METRICS = {
+    "commits":          ("PushEvent",         "size"),
+    "distinct_commits": ("PushEvent",         "distinct_size"),
+    "push_events":      ("PushEvent",         None),
+    "pull_requests":    ("PullRequestEvent",  None),
+    "issues":           ("IssuesEvent",       None),
+    "issue_comments":   ("IssueCommentEvent", None),
+    "forks":            ("ForkEvent",         None),
+    "stars":            ("WatchEvent",        None),
+    "creates":          ("CreateEvent",       None),
+    "releases":         ("ReleaseEvent",      None),
+}
+
+# How each logical value is read in each dialect. On BigQuery payload is a
+# raw JSON string; we cast to INT64 and guard against NULL / non-numeric
+# values with SAFE_CAST. Raw archive files are read the same way; shards
+# already hold the parsed column.
+VALUE_COLUMNS = {
+    "bigquery": {
+        "size":          "SAFE_CAST(JSON_EXTRACT_SCALAR(payload, '$.size') AS INT64)",
+        "distinct_size": "SAFE_CAST(JSON_EXTRACT_SCALAR(payload, '$.distinct_size') AS INT64)",
+    },
+    "archive": {
+        "size":          "TRY_CAST(json_extract_string(payload, '$.size') AS BIGINT)",
+        "distinct_size": "TRY_CAST(json_extract_string(payload, '$.distinct_size') AS BIGINT)",
+    },
+    "shards": {
+        "size":          "payload_size",
+        "distinct_size": "payload_distinct_size",
+    },
+}
+
+# githubarchive.month.* has one table per month named YYYYMM, and
+# githubarchive.day.* one per day named YYYYMMDD.
+BIGQUERY_TEMPLATE = """
+SELECT
+    FORMAT_TIMESTAMP('{period_format}', created_at) AS {period},
+    {columns}
+FROM
+    `githubarchive.{tables}.*`
+WHERE
+    _TABLE_SUFFIX BETWEEN @start_suffix AND @end_suffix
+    AND {type_filter}
+GROUP BY
+    {period}
+ORDER BY
+    {period}
+"""
+
+# The file list is bound as ? after pruning to the requested range, then
+# the range's bounds, since a shard holds a whole month.
+DUCKDB_TEMPLATE = """
+SELECT
+    strftime(created_at, '{period_format}') AS {period},
+    {columns}
+FROM
+    {relation}
+WHERE
+    {type_filter}
+    AND created_at >= CAST(? AS TIMESTAMP)
+    AND created_at <  CAST(? AS TIMESTAMP)
+GROUP BY
+    {period}
+ORDER BY
+    {period}
+"""
+
+# Rows are grouped at the granularity the store keeps them in (store.py),
+# so an hourly fetch can be rolled up locally to anything coarser
+# (rollup.py) and costs the same bytes as a monthly one.
+PERIOD_FORMATS = {
+    "month": "%Y-%m",
+    "day":   "%Y-%m-%d",
+    "hour":  "%Y-%m-%dT%H",
+}
+
+DUCKDB_RELATIONS = {
+    "archive": "read_json(?, format = 'newline_delimited', "
+               "columns = {type: 'VARCHAR', created_at: 'TIMESTAMP', payload: 'JSON'})",
+    "shards":  "read_parquet(?, hive_partitioning = false)",
+}
+
+
+# Several metrics share one scan: each becomes an aggregate conditional on
+# its event type, over the rows of all their types, so ten counts cost the
+# bytes of one and adding a sum costs one payload read for all of them.
+CONDITIONAL_AGGREGATES = {
+    "bigquery": {"count": "COUNTIF(type = '{event_type}')",
+                 "sum":   "SUM(IF(type = '{event_type}', {value}, NULL))"},
+    "duckdb":   {"count": "count_if(type = '{event_type}')",
+                 "sum":   "SUM({value}) FILTER (WHERE type = '{event_type}')"},
+}
+
+
+def _value_sql(metric: str, dialect: str) -> str:
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. "
+                         f"Expected one of {', '.join(sorted(METRICS))}.")
+    _, value = METRICS[metric]
+    if value is None:
+        return "COUNT(*)"
+    return f"SUM({VALUE_COLUMNS[dialect][value]})"
+
+
+def _metrics(metrics: Union[str, Sequence[str]]) -> tuple[str, ...]:
+    """One metric name or several, as a tuple without duplicates."""
+    return (metrics,) if isinstance(metrics, str) else tuple(dict.fromkeys(metrics))
+
+
+def _columns(metrics: Union[str, Sequence[str]], dialect: str) -> dict[str, str]:
+    """The value column(s) and event-type filter for one metric or several."""
+    metrics = _metrics(metrics)
+    for metric in metrics:
+        _value_sql(metric, dialect)         # validates the name
+    if len(metrics) == 1:
+        metric = metrics[0]
+        return {"columns":     f"{_value_sql(metric, dialect)} AS {metric}",
+                "type_filter": f"type = '{METRICS[metric][0]}'"}
+
+    aggregates = CONDITIONAL_AGGREGATES["bigquery" if dialect == "bigquery" else "duckdb"]
+    columns = []
+    for metric in metrics:
+        event_type, value = METRICS[metric]
+        if value is None:
+            expr = aggregates["count"].format(event_type=event_type)
+        else:
+            expr = aggregates["sum"].format(event_type=event_type,
+                                            value=VALUE_COLUMNS[dialect][value])
+        columns.append(f"{expr} AS {metric}")
+    event_types = dict.fromkeys(METRICS[metric][0] for metric in metrics)
+    return {"columns":     ",\n    ".join(columns),
+            "type_filter": f"type IN ({', '.join(repr(t) for t in event_types)})"}
+
+
+def _period(granularity: str) -> dict[str, str]:
+    if granularity not in PERIOD_FORMATS:
+        raise ValueError(f"Unknown granularity '{granularity}'. "
+                         f"Expected one of {', '.join(PERIOD_FORMATS)}.")
+    # The monthly column keeps its name so the result cache keys still match
+    return {"period_format": PERIOD_FORMATS[granularity],
+            "period": "month" if granularity == "month" else "period"}
+
+
+def bigquery_sql(metric: Union[str, Sequence[str]], granularity: str = "month",
+                 tables: str = "month") -> str:
+    """
+    The BigQuery SQL for one metric, or several in one scan, over
+    githubarchive.month.* or githubarchive.day.* (tables), parameterised on
+    the table suffixes.
+    """
+    return BIGQUERY_TEMPLATE.format(tables=tables, **_columns(metric, "bigquery"),
+                                    **_period(granularity))
+
+
+def duckdb_sql(metric: Union[str, Sequence[str]], kind: str,
+               granularity: str = "month") -> str:
+    """The DuckDB SQL for one metric, or several in one scan, over 'archive' files or 'shards'."""
+    return DUCKDB_TEMPLATE.format(relation=DUCKDB_RELATIONS[kind], **_columns(metric, kind),
+                                  **_period(granularity))
+
+
+# Monthly queries, rendered once; the text is also the result cache key
+# (see result_cache.py)
+QUERIES = {metric: bigquery_sql(metric) for metric in METRICS}
+
+
+def _suffix(yyyy_mm: str) -> str:
+    """Convert 'YYYY-MM' → 'YYYYMM' (or 'YYYY-MM-DD' → 'YYYYMMDD') for BigQuery table suffix."""
+    return yyyy_mm.replace("-", "")
+
+
+def _tables(start: str) -> str:
+    """'day' for a range given in days (YYYY-MM-DD), else 'month'."""
+    return "day" if len(start) == len("YYYY-MM-DD") else "month"
+
+
+def _bounds(start: str, end: str) -> tuple[str, str]:
+    """[first day, day after the last) of a month or day range, as YYYY-MM-DD."""
+    if _tables(start) == "day":
+        return start, (date.fromisoformat(end) + timedelta(days=1)).isoformat()
+    y, m = int(end[:4]), int(end[5:7])
+    return f"{start}-01", date(y + m // 12, m % 12 + 1, 1).isoformat()
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class QueryBackend:
+    """
+    Somewhere to run the logical metric queries.
+
+    A backend submits one query for a range of months (or of days, as
+    YYYY-MM-DD), dry-runs it, streams its (period, value) rows and reports
+    the bytes it scanned. run() does the whole round trip, so fetch_runs
+    only needs that and dry_run().
+
+    Large results should come back through stream_batches() instead: Arrow
+    record batches of at most batch_rows rows, with the period in the first
+    column and the value in a column named after the metric. The fallback
+    here batches stream(); backends with a native Arrow path override it.
+
+    submit, stream and stream_batches also take a sequence of metrics,
+    computed in one scan: rows are then (period, value, value, …) and
+    batches have one value column per metric.
+    """
+
+    name       = "backend"
+    dataset    = ""
+    usd_per_gb = 0.0
+
+    def submit(self, metric: str, start_month: str, end_month: str,
+               max_bytes_billed: Optional[int] = None,
+               granularity: str = "month"):
+        """
+        Start one query, grouped by month, day or hour, and return a job
+        handle for stream/bytes_scanned.
+        """
+        raise NotImplementedError
+
+    def stream(self, job, metric: str) -> Iterator[tuple[str, Optional[int]]]:
+        """(period, value) rows of a submitted job, waiting for it if needed."""
+        raise NotImplementedError
+
+    def stream_batches(self, job, metric: str,
+                       batch_rows: int = BATCH_ROWS) -> Iterator["pa.RecordBatch"]:
+        """Arrow record batches of a submitted job's (period, value) rows."""
+        import pyarrow as pa
+        rows = iter(self.stream(job, metric))
+        while chunk := list(islice(rows, batch_rows)):
+            periods, *values = zip(*chunk)
+            yield pa.record_batch([pa.array(periods, pa.string()),
+                                   *(pa.array(column, pa.int64()) for column in values)],
+                                  names=["period", *_metrics(metric)])
+
+    def bytes_scanned(self, job) -> int:
+        """Bytes the job read; call after stream() is exhausted."""
+        raise NotImplementedError
+
+    def dataset_for(self, start: str) -> str:
+        """What a query over a month or day range starting at start reads."""
+        return self.dataset
+
+    def dry_run(self, metric: str, start_month: str, end_month: str) -> int:
+        """Exact bytes the query would scan, without running it."""
+        raise NotImplementedError
+
+    def table_bytes(self, start_month: str, end_month: str) -> int:
+        """Upper bound on bytes for any query over the range, from metadata."""
+        raise NotImplementedError
+
+    def run(self, metric: str, start_month: str, end_month: str,
+            max_bytes_billed: Optional[int] = None,
+            granularity: str = "month") -> tuple[dict[str, int], int]:
+        """Submit one range query, wait for it, return (totals, bytes scanned)."""
+        job = self.submit(metric, start_month, end_month, max_bytes_billed, granularity)
+        totals = {period: int(value) for period, value in self.stream(job, metric)
+                  if value is not None}
+        return totals, self.bytes_scanned(job)
+
+
+def _query_parameter(name: str, type_: str, value) -> SimpleNamespace:
+    """Stand-in for bigquery.ScalarQueryParameter when the SDK is absent."""
+    return SimpleNamespace(name=name, type_=type_, value=value)
+
+
+class BigQueryBackend(QueryBackend):
+    """
+    githubarchive.month.* on Google BigQuery.
+
+    Args:
+        project: GCP project ID used for billing.
+        client:  Reuse an existing client, or any object with a
+                 bigquery.Client-compatible query(), to run offline.
+                 Without google-cloud-bigquery installed, an injected
+                 client is passed job configs as plain namespaces with
+                 the same attribute names.
+    """
+
+    name       = "bigquery"
+    dataset    = "githubarchive.month.*"
+    usd_per_gb = USD_PER_GB
+
+    def __init__(self, project: Optional[str] = None,
+                 client: Optional["bigquery.Client"] = None):
+        self.project = project
+        self._client = client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> "bigquery.Client":
+        with self._lock:
+            if self._client is None:
+                from google.cloud import bigquery
+                self._client = bigquery.Client(project=self.project)
+            return self._client
+
+    def _job_config(self, start_month: str, end_month: str,
+                    dry_run: bool = False,
+                    max_bytes_billed: Optional[int] = None) -> "bigquery.QueryJobConfig":
+        try:
+            from google.cloud import bigquery
+        except ImportError:
+            if self._client is None:
+                raise
+            # An injected offline client doesn't need the SDK
+            bigquery = SimpleNamespace(QueryJobConfig=SimpleNamespace,
+                                       ScalarQueryParameter=_query_parameter)
+        # maximum_bytes_billed makes BigQuery fail the job, unbilled, if it
+        # would scan more than the budget.
+        return bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("start_suffix", "STRING", _suffix(start_month)),
+                bigquery.ScalarQueryParameter("end_suffix",   "STRING", _suffix(end_month)),
+            ],
+            dry_run=dry_run,
+            use_query_cache=not dry_run,
+            maximum_bytes_billed=max_bytes_billed,
+        )
+
+    def submit(self, metric, start_month, end_month, max_bytes_billed=None,
+               granularity="month"):
+        return self.client.query(bigquery_sql(metric, granularity, _tables(start_month)),
+                                 job_config=self._job_config(
+                                     start_month, end_month,
+                                     max_bytes_billed=max_bytes_billed))
+
+    def stream(self, job, metric):
+        metrics = _metrics(metric)
+        for row in job.result():
+            yield (row[0], *(row[name] for name in metrics))
+
+    def stream_batches(self, job, metric, batch_rows=BATCH_ROWS):
+        # Pages come back as Arrow, through the Storage Read API when
+        # google-cloud-bigquery-storage is installed, else the REST API.
+        try:
+            from google.cloud import bigquery_storage
+            read_client = bigquery_storage.BigQueryReadClient()
+        except ImportError:
+            read_client = None
+        rows = job.result(page_size=batch_rows)
+        yield from rows.to_arrow_iterable(bqstorage_client=read_client)
+
+    def bytes_scanned(self, job) -> int:
+        return job.total_bytes_processed or 0
+
+    def dataset_for(self, start: str) -> str:
+        return f"githubarchive.{_tables(start)}.*"
+
+    def dry_run(self, metric, start_month, end_month) -> int:
+        # Dry runs validate the query and report total_bytes_processed
+        # without executing it, so nothing is billed.
+        job = self.client.query(bigquery_sql(metric, tables=_tables(start_month)),
+                                job_config=self._job_config(start_month, end_month,
+                                                            dry_run=True))
+        return job.total_bytes_processed or 0
+
+    def table_bytes(self, start_month, end_month) -> int:
+        # Table metadata lookups are free; the real scan reads only the
+        # columns the query touches, so actual bytes billed are lower.
+        from fetch_bigquery import period_range
+        tables = _tables(start_month)
+        return sum(
+            self.client.get_table(f"githubarchive.{tables}.{_suffix(period)}").num_bytes or 0
+            for period in period_range(start_month, end_month)
+        )
+
+
+class DuckDBBackend(QueryBackend):
+    """
+    The same queries run locally by DuckDB, free of charge.
+
+    Args:
+        source: A directory of hourly GH Archive .json.gz files (searched
+                recursively), or a shard directory with month=YYYY-MM/
+                partitions from shards.py; detected from its layout.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, source: Path):
+        self.source = Path(source)
+        if not self.source.is_dir():
+            raise ValueError(f"DuckDB source {self.source} is not a directory.")
+        self.kind = "shards" if any(self.source.glob("month=*")) else "archive"
+        self.dataset = f"{self.source} ({self.kind})"
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _cursor(self):
+        # One in-memory database; each job gets its own cursor, so jobs can
+        # run from fetch_runs' threads at the same time.
+        with self._lock:
+            if self._conn is None:
+                import duckdb
+                self._conn = duckdb.connect()
+                # Shards store created_at as a UTC timestamp; group it in UTC
+                self._conn.execute("SET TimeZone = 'UTC'")
+            return self._conn.cursor()
+
+    def files(self, start_month: str, end_month: str) -> list[Path]:
+        """The files a query over the range reads, pruned by name."""
+        if self.kind == "shards":
+            return sorted(
+                path for path in self.source.glob("month=*/*.parquet")
+                if start_month[:7] <= path.parent.name.removeprefix("month=") <= end_month[:7]
+            )
+        # Hour files either side too: an event can be filed after its hour
+        from ingest_local import SPILL_HOURS, archive_file_hour, list_archive_files
+        files = list_archive_files(self.source, start_month[:7], end_month[:7],
+                                   spill_hours=SPILL_HOURS)
+        if _tables(start_month) == "day":
+            spill = timedelta(hours=SPILL_HOURS)
+            first, after = (datetime.fromisoformat(bound).replace(tzinfo=timezone.utc)
+                            for bound in _bounds(start_month, end_month))
+            files = [path for path in files
+                     if first - spill <= archive_file_hour(path) < after + spill]
+        return files
+
+    def submit(self, metric, start_month, end_month, max_bytes_billed=None,
+               granularity="month"):
+        # Nothing is billed, so max_bytes_billed is only enforced through
+        # the dry run in fetch_runs.
+        files = self.files(start_month, end_month)
+        cursor = None
+        if files:
+            cursor = self._cursor()
+            cursor.execute(duckdb_sql(metric, self.kind, granularity),
+                           [[str(path) for path in files], *_bounds(start_month, end_month)])
+        return cursor, sum(path.stat().st_size for path in files)
+
+    def stream(self, job, metric):
+        cursor, _ = job
+        if cursor is None:
+            return
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            yield from rows
+        cursor.close()
+
+    def stream_batches(self, job, metric, batch_rows=BATCH_ROWS):
+        cursor, _ = job
+        if cursor is None:
+            return
+        yield from cursor.fetch_record_batch(batch_rows)
+        cursor.close()
+
+    def bytes_scanned(self, job) -> int:
+        return job[1]
+
+    def dry_run(self, metric, start_month, end_month) -> int:
+        return self.table_bytes(start_month, end_month)
+
+    def table_bytes(self, start_month, end_month) -> int:
+        return sum(path.stat().st_size for path in self.files(start_month, end_month))
+
+
+BACKENDS = ("bigquery", "duckdb")
+
+
+def get_backend(name: str,
+                project: Optional[str] = None,
+                source: Optional[Path] = None) -> QueryBackend:
+    """A backend by name: bigquery bills project, duckdb reads source."""
+    if name == "bigquery":
+        return BigQueryBackend(project)
+    if name == "duckdb":
+        if source is None:
+            raise ValueError("The duckdb backend needs a source directory.")
+        return DuckDBBackend(source)
+    raise ValueError(f"Unknown backend '{name}'. Expected one of {', '.join(BACKENDS)}.")
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run one metric query on a backend and print the monthly totals."
+    )
+    parser.add_argument("--backend", default="duckdb", choices=BACKENDS,
+                        help="Where to run the query (default: duckdb)")
+    parser.add_argument("--project", default=None,
+                        help="GCP project ID for --backend bigquery.")
+    parser.add_argument("--source", default="data/shards",
+                        help="Archive or shard directory for --backend duckdb "
+                             "(default: data/shards)")
+    parser.add_argument("--metric", default=METRIC, choices=sorted(METRICS),
+                        help=f"Metric to query (default: {METRIC})")
+    parser.add_argument("--start", default="2023-01", type=validate_month,
+                        help="Start month YYYY-MM (default: 2023-01)")
+    parser.add_argument("--end", default="2026-01", type=validate_month,
+                        help="End month YYYY-MM (default: 2026-01)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Print the bytes the query would scan and exit.")
+    parser.add_argument("--sql", action="store_true",
+                        help="Print the rendered SQL and exit.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    try:
+        backend = get_backend(args.backend, args.project, Path(args.source))
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.sql:
+        print(QUERIES[args.metric] if backend.name == "bigquery"
+              else duckdb_sql(args.metric, backend.kind))
+        sys.exit(0)
+    if args.dry_run:
+        gb = backend.dry_run(args.metric, args.start, args.end) / 1e9
+        print(f"{backend.dataset_for(args.start)}: {gb:,.3f} GB (~${gb * backend.usd_per_gb:.2f})")
+        sys.exit(0)
+
+    t0 = time.perf_counter()
+    totals, bytes_scanned = backend.run(args.metric, args.start, args.end)
+    for month in sorted(totals):
+        print(f"  {month}  {totals[month]:>14,}")
+    print(f"\n  {len(totals)} month(s), {bytes_scanned / 1e9:,.3f} GB scanned "
+          f"in {time.perf_counter() - t0:.2f}s")
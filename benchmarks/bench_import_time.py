@@ -0,0 +1,110 @@
+"""
+bench_import_time.py
+--------------------
+CLI cold-start budget: runs main.py under `python -X importtime` and fails
+(exit 1) when the imports of a scenario exceed their budget.
+
+Scenarios:
+    help       main.py --help
+    cache-hit  main.py --no-fetch --out chart.png with every build stage
+               up to date (see build_cache.py), in a scratch directory
+               seeded with a synthetic store and rendered once beforehand
+
+Import time is the sum of the top-level cumulative times reported by
+-X importtime, so it doesn't depend on how long the rest of the run takes.
+The heaviest top-level imports are listed to show what broke a budget.
+
+Usage:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --help-budget-ms 50 --cache-hit-budget-ms 150
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+MAIN = REPO / "main.py"
+
+sys.path.insert(0, str(REPO))
+
+# "import time:  self [us] | cumulative | imported package", nesting by indent
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def top_level_imports(stderr: str) -> dict[str, float]:
+    """{module: cumulative ms} for the imports not nested under another."""
+    imports = {}
+    for match in IMPORTTIME_RE.finditer(stderr):
+        _, cumulative, indent, module = match.groups()
+        if not indent:
+            imports[module] = imports.get(module, 0.0) + int(cumulative) / 1000
+    return imports
+
+
+def run(args: list[str], cwd: Path) -> tuple[dict[str, float], float]:
+    """(top-level imports, wall seconds) for one `python -X importtime main.py …`."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", str(MAIN), *args],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"main.py {' '.join(args)} failed:\n{proc.stderr[-2000:]}")
+    return top_level_imports(proc.stderr), wall
+
+
+def seed_workdir(workdir: Path) -> None:
+    """A synthetic monthly store plus one full render, so the next run is all cache hits."""
+    from store import write_metric
+
+    values = {f"{2023 + i // 12}-{i % 12 + 1:02d}": 200_000_000 + i * 5_000_000
+              for i in range(36)}
+    write_metric(values, "commits", "measured", "bench", store_dir=workdir / "data" / "store")
+    run(["--no-fetch", "--out", "chart.png"], workdir)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Fail if main.py's import time exceeds a budget."
+    )
+    parser.add_argument("--help-budget-ms", default=60.0, type=float,
+                        help="Import budget for `main.py --help` (default: 60)")
+    parser.add_argument("--cache-hit-budget-ms", default=150.0, type=float,
+                        help="Import budget for a fully cached render (default: 150)")
+    parser.add_argument("--repeat", default=3, type=int,
+                        help="Runs per scenario; the fastest is judged (default: 3)")
+    parser.add_argument("--top", default=5, type=int,
+                        help="Heaviest top-level imports to list (default: 5)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    failed = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        seed_workdir(workdir)
+        scenarios = (
+            ("help",      ["--help"],                           args.help_budget_ms),
+            ("cache-hit", ["--no-fetch", "--out", "chart.png"], args.cache_hit_budget_ms),
+        )
+        for name, cli, budget in scenarios:
+            runs = [run(cli, workdir) for _ in range(args.repeat)]
+            imports, wall = min(runs, key=lambda r: sum(r[0].values()))
+            total = sum(imports.values())
+            verdict = "ok" if total <= budget else "OVER BUDGET"
+            failed |= total > budget
+            print(f"{name:<10} imports {total:>7.1f} ms  (budget {budget:.0f} ms)  "
+                  f"wall {wall * 1000:>6.0f} ms  {verdict}")
+            heaviest = sorted(imports.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+            for module, ms in heaviest:
+                print(f"    {module:<28} {ms:>7.1f} ms")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,119 @@
+"""
+bench_ingest_prefilter.py
+-------------------------
+Lines per second for the local-ingest line parsers on synthetic GH Archive
+events: the byte-scan fast path vs. a full json.loads per line.
+
+The fixture mixes event types roughly like the real archive (~30% PushEvents)
+and uses the same compact key order. Both parsers must agree on every line
+before any timing is reported.
+
+Usage:
+    python benchmarks/bench_ingest_prefilter.py
+    python benchmarks/bench_ingest_prefilter.py --lines 500000 --push-share 0.3
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ingest_local import parse_line_fast, parse_line_json  # noqa: E402
+
+OTHER_TYPES = ["CreateEvent", "PullRequestEvent", "IssueCommentEvent",
+               "WatchEvent", "IssuesEvent", "DeleteEvent", "ForkEvent"]
+
+
+def synthetic_lines(n: int, push_share: float, seed: int = 0) -> list[bytes]:
+    """n compact GH Archive-style event lines, push_share of them PushEvents."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n):
+        is_push = rng.random() < push_share
+        day, hour = rng.randint(1, 28), rng.randint(0, 23)
+        if is_push:
+            size = rng.randint(1, 20)
+            payload = {
+                "repository_id": rng.randint(1, 10**9),
+                "push_id": rng.randint(1, 10**10),
+                "size": size,
+                "distinct_size": size,
+                "ref": "refs/heads/main",
+                "head": "%040x" % rng.getrandbits(160),
+                "before": "%040x" % rng.getrandbits(160),
+                "commits": [
+                    {"sha": "%040x" % rng.getrandbits(160),
+                     "author": {"email": "dev@example.com", "name": "Dev"},
+                     "message": 'Fix "size": handling in parser\n\nDetails …',
+                     "distinct": True,
+                     "url": "https://api.github.com/repos/o/r/commits/x"}
+                    for _ in range(min(size, 20))
+                ],
+            }
+        else:
+            payload = {"action": "opened", "number": rng.randint(1, 5000),
+                       "body": "x" * rng.randint(50, 2000)}
+        event = {
+            "id": str(30_000_000_000 + i),
+            "type": "PushEvent" if is_push else rng.choice(OTHER_TYPES),
+            "actor": {"id": rng.randint(1, 10**8), "login": "dev",
+                      "display_login": "dev", "gravatar_id": "",
+                      "url": "https://api.github.com/users/dev",
+                      "avatar_url": "https://avatars.githubusercontent.com/u/1?"},
+            "repo": {"id": rng.randint(1, 10**9), "name": "org/repo",
+                     "url": "https://api.github.com/repos/org/repo"},
+            "payload": payload,
+            "public": True,
+            "created_at": f"2024-03-{day:02d}T{hour:02d}:00:00Z",
+        }
+        lines.append(json.dumps(event, separators=(",", ":")).encode() + b"\n")
+    return lines
+
+
+def _time(parse, lines: list[bytes], repeat: int) -> float:
+    """Best-of-repeat seconds for one pass over lines."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for line in lines:
+            parse(line)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the local-ingest byte prefilter against full JSON parsing."
+    )
+    parser.add_argument("--lines", default=200_000, type=int,
+                        help="Synthetic lines to generate (default: 200000)")
+    parser.add_argument("--push-share", default=0.3, type=float,
+                        help="Fraction of lines that are PushEvents (default: 0.3)")
+    parser.add_argument("--repeat", default=3, type=int,
+                        help="Timed passes per parser; best is reported (default: 3)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    lines = synthetic_lines(args.lines, args.push_share)
+
+    mismatches = sum(parse_line_fast(l) != parse_line_json(l) for l in lines)
+    if mismatches:
+        print(f"[ERROR] fast path disagrees with json.loads on {mismatches} line(s)",
+              file=sys.stderr)
+        sys.exit(1)
+
+    mb = sum(map(len, lines)) / 1e6
+    print(f"{len(lines):,} lines ({mb:.0f} MB), {args.push_share:.0%} PushEvents\n")
+    results = {}
+    for name, parse in (("json.loads", parse_line_json), ("byte prefilter", parse_line_fast)):
+        seconds = _time(parse, lines, args.repeat)
+        results[name] = seconds
+        print(f"  {name:<15} {len(lines) / seconds:>12,.0f} lines/s  "
+              f"{mb / seconds:>7.0f} MB/s")
+    print(f"\n  speed-up        {results['json.loads'] / results['byte prefilter']:>12.1f}x")
@@ -0,0 +1,139 @@
+"""
+bench_render.py
+---------------
+Build + savefig time and peak Python memory of the event layer in
+visualize.plot: one artist per layer (LineCollection stems, one scatter,
+labels sharing one transform) vs. the previous axvline + plot + annotate
+per event.
+
+Both variants draw on the same base chart (36 months of synthetic commits)
+with the same label placement, so only the event artists differ. Memory is
+the tracemalloc peak, i.e. Python-side allocations including numpy buffers;
+Agg's own C++ raster is the same size for both and isn't counted.
+
+Usage:
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --events 40 400 4000 --repeat 3
+"""
+
+import argparse
+import io
+import random
+import sys
+import textwrap
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import visualize  # noqa: E402
+from llm_events import ORG_COLORS  # noqa: E402
+
+START = date(2023, 1, 1)
+MONTHS = 36
+
+
+def synthetic_frame(seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    dates = pd.date_range(START, periods=MONTHS, freq="MS")
+    return pd.DataFrame({
+        "period":    dates.strftime("%Y-%m"),
+        "commits":   [int(2e8 + i * 6e6 + rng.uniform(-2e7, 2e7)) for i in range(MONTHS)],
+        "estimated": [i >= MONTHS - 4 for i in range(MONTHS)],
+        "date":      dates,
+    })
+
+
+def synthetic_events(n: int, seed: int = 0) -> list[dict]:
+    """n release events spread over the chart, named like real models."""
+    rng = random.Random(seed)
+    orgs = [org for org in ORG_COLORS if org != "Other"]
+    span = (MONTHS - 1) * 30
+    events = []
+    for i in range(n):
+        org = rng.choice(orgs)
+        events.append({
+            "model": f"{org} model-{i} {rng.choice(['mini', 'Pro', 'Instruct', '70B'])}",
+            "org":   org,
+            "date":  START + timedelta(days=rng.randrange(span)),
+            "color": ORG_COLORS[org],
+        })
+    return sorted(events, key=lambda ev: ev["date"])
+
+
+def draw_events_per_artist(fig, ax, events: list[dict], y_max: float) -> None:
+    """The event layer as plot() drew it before batching: three artists per event."""
+    texts = [textwrap.fill(ev["model"], width=visualize.LABEL_MAX_WIDTH) for ev in events]
+    levels = visualize.place_event_labels(fig, ax, events, texts)
+    for ev, level, text in zip(events, levels, texts):
+        ev_dt = datetime.combine(ev["date"], datetime.min.time())
+        frac = visualize.level_frac(level or 0)
+        y_dot = y_max * 1.55 * frac
+        ax.axvline(x=ev_dt, ymin=0, ymax=frac, color=ev["color"],
+                   alpha=visualize.MARKER_ALPHA, linewidth=visualize.MARKER_LW,
+                   linestyle="--", zorder=4)
+        ax.plot(ev_dt, y_dot, "o", color=ev["color"], markersize=4, alpha=0.85, zorder=5)
+        if level is None:
+            continue
+        ax.annotate(text, xy=(ev_dt, y_dot), xytext=(0, visualize.LABEL_OFFSET),
+                    textcoords="offset points", ha="center", va="bottom",
+                    fontsize=visualize.LABEL_FONTSIZE, color=ev["color"],
+                    fontweight="semibold", rotation=visualize.LABEL_ROTATION, zorder=6)
+
+
+def render(draw, df: pd.DataFrame, events: list[dict]) -> tuple[float, float]:
+    """(seconds, peak MB) to build the chart and save it as PNG."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fig, ax = plt.subplots(figsize=visualize.FIGURE_SIZE)
+    ax.plot(df["date"], df["commits"], color=visualize.LINE_COLOR,
+            linewidth=visualize.LINE_WIDTH, zorder=3)
+    y_max = df["commits"].max()
+    ax.set_ylim(0, y_max * 1.55)
+    draw(fig, ax, events, y_max)
+    fig.savefig(io.BytesIO(), format="png", dpi=150)
+    plt.close(fig)
+    seconds = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak / 1e6
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark batched vs. per-event artists in the chart's event layer."
+    )
+    parser.add_argument("--events", default=[40, 400, 4000], type=int, nargs="+",
+                        help="Event counts to render (default: 40 400 4000)")
+    parser.add_argument("--repeat", default=3, type=int,
+                        help="Renders per case; the best time is reported (default: 3)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    df = synthetic_frame()
+    variants = (("per-event", draw_events_per_artist), ("batched", visualize.draw_events))
+
+    # Warm-up: font cache, label measurements, Agg import
+    render(visualize.draw_events, df, synthetic_events(10))
+
+    print(f"{'events':>7}  {'variant':<10} {'time':>9}  {'peak mem':>9}")
+    for n in args.events:
+        events = synthetic_events(n)
+        results = {}
+        for name, draw in variants:
+            runs = [render(draw, df, events) for _ in range(args.repeat)]
+            seconds, peak = min(r[0] for r in runs), max(r[1] for r in runs)
+            results[name] = seconds
+            print(f"{n:>7}  {name:<10} {seconds:>8.2f}s  {peak:>7.1f} MB")
+        print(f"{'':>7}  {'speed-up':<10} {results['per-event'] / results['batched']:>8.1f}x\n")
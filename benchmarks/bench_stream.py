@@ -0,0 +1,162 @@
+"""
+bench_stream.py
+---------------
+Peak memory and time to land a large query result in the store: Arrow
+record batches streamed through fetch_bigquery.stream_runs and
+store.write_batches, vs. the row path (one Python tuple per row, as
+iterating job.result() gives, collected and written in one table).
+
+The query is answered by FakeArrowBackend, a QueryBackend that yields
+synthetic hourly (period, value) batches, so nothing is billed and no
+GCP project is needed. Think of it as a per-repo hourly result: many rows
+share each hour. Each variant runs in its own process, so the peak RSS it
+reports is its own. Both variants must leave the same rows in the store.
+
+Usage:
+    python benchmarks/bench_stream.py
+    python benchmarks/bench_stream.py --rows 5000000 --batch-rows 65536
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(REPO))
+
+import numpy as np  # noqa: E402
+import pyarrow as pa  # noqa: E402
+import pyarrow.compute as pc  # noqa: E402
+
+from backends import BATCH_ROWS, QueryBackend  # noqa: E402
+from fetch_bigquery import month_range  # noqa: E402
+
+START, END = "2023-01", "2025-12"
+
+
+class FakeArrowBackend(QueryBackend):
+    """Answers any query with rows synthetic (hourly period, value) rows."""
+
+    name    = "fake"
+    dataset = "synthetic"
+
+    def __init__(self, rows: int):
+        self.rows = rows
+
+    def submit(self, metric, start_month, end_month, max_bytes_billed=None,
+               granularity="month"):
+        hours = [f"{month}-{day:02d}T{hour:02d}"
+                 for month in month_range(start_month, end_month)
+                 for day in range(1, 29) for hour in range(24)]
+        return pa.array(hours, pa.string())
+
+    def stream_batches(self, job, metric, batch_rows=BATCH_ROWS):
+        for offset in range(0, self.rows, batch_rows):
+            index = np.arange(offset, min(offset + batch_rows, self.rows))
+            yield pa.record_batch([job.take(pa.array(index % len(job))),
+                                   pa.array(index % 997, pa.int64())],
+                                  names=["month", metric])
+
+    def stream(self, job, metric):
+        for batch in self.stream_batches(job, metric):
+            yield from zip(batch.column(0).to_pylist(), batch.column(1).to_pylist())
+
+    def bytes_scanned(self, job) -> int:
+        return 0
+
+
+def run_rows(backend: QueryBackend, store_dir: Path) -> int:
+    """The row path: every row becomes a Python tuple before one big write."""
+    from datetime import datetime, timezone
+
+    from store import _schema, append_table
+
+    job = backend.submit("commits", START, END)
+    rows = list(backend.stream(job, "commits"))
+    periods, values = zip(*rows)
+    n = len(periods)
+    table = pa.table({
+        "period":     list(periods),
+        "metric":     ["commits"] * n,
+        "value":      list(values),
+        "provenance": ["measured"] * n,
+        "source":     [backend.name] * n,
+        "fetched_at": [datetime.now(timezone.utc)] * n,
+    }, schema=_schema())
+    return append_table(table, "hour", store_dir)
+
+
+def run_batches(backend: QueryBackend, store_dir: Path, batch_rows: int) -> int:
+    """The streaming path, as fetch_bigquery --stream uses it."""
+    from fetch_bigquery import stream_runs
+    return stream_runs(None, [(START, END)], backend=backend, granularity="hour",
+                       store_dir=store_dir, batch_rows=batch_rows)
+
+
+def child(variant: str, rows: int, batch_rows: int, store_dir: Path) -> None:
+    backend = FakeArrowBackend(rows)
+    t0 = time.perf_counter()
+    if variant == "rows":
+        n = run_rows(backend, store_dir)
+    else:
+        n = run_batches(backend, store_dir, batch_rows)
+    seconds = time.perf_counter() - t0
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"rows": n, "seconds": seconds, "peak_mb": peak_mb}))
+
+
+def store_checksum(store_dir: Path) -> tuple[int, int]:
+    """(rows, sum of values) across every part file, duplicates included."""
+    import pyarrow.dataset as ds
+    table = ds.dataset(store_dir, format="parquet").to_table(columns=["value"])
+    return table.num_rows, pc.sum(table["value"]).as_py() or 0
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark streaming Arrow batches into the store vs. Python rows."
+    )
+    parser.add_argument("--rows", default=2_000_000, type=int,
+                        help="Rows in the synthetic result (default: 2000000)")
+    parser.add_argument("--batch-rows", default=BATCH_ROWS, type=int,
+                        help=f"Rows per record batch (default: {BATCH_ROWS})")
+    parser.add_argument("--child", default=None, choices=["rows", "batches"],
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--store", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    if args.child:
+        child(args.child, args.rows, args.batch_rows, Path(args.store))
+        sys.exit(0)
+
+    print(f"{args.rows:,} rows, {args.batch_rows:,} rows per batch\n")
+    print(f"{'variant':<9} {'time':>8}  {'peak RSS':>9}")
+    checksums = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant in ("rows", "batches"):
+            store_dir = Path(tmp) / variant
+            proc = subprocess.run(
+                [sys.executable, __file__, "--child", variant, "--rows", str(args.rows),
+                 "--batch-rows", str(args.batch_rows), "--store", str(store_dir)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                sys.exit(1)
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            checksums[variant] = store_checksum(store_dir)
+            print(f"{variant:<9} {result['seconds']:>7.2f}s  {result['peak_mb']:>6.0f} MB")
+
+    if checksums["rows"] != checksums["batches"]:
+        print(f"\n[ERROR] Stores differ: {checksums}", file=sys.stderr)
+        sys.exit(1)
+    print(f"\nBoth stores hold {checksums['rows'][0]:,} rows summing to {checksums['rows'][1]:,}.")
@@ -0,0 +1,208 @@
+"""
+build_cache.py
+--------------
+Content-hash build cache for the main.py pipeline stages (fetch, load,
+capping, events, render), so a re-run whose inputs haven't changed reuses
+the previous artefacts instead of redoing the work.
+
+Each stage is described by a dict of named input digests, e.g. for render:
+    {"frame": <hash of the capped rows>, "events": <hash of the events>,
+     "style": <hash of visualize.py + labels.py>, "args": <hash of --out …>}
+
+A stage is skipped when every digest matches the last successful run and its
+artefact (if any) is still on disk with the content that run wrote. Stages
+pass content digests of their outputs downstream, so a stage that re-runs
+but produces the same rows (say, after `store.py compact`) doesn't
+invalidate anything after it.
+
+The manifest lives at data/build/manifest.json next to the cached frames.
+
+Usage:
+    python build_cache.py             # show the recorded stages
+    python build_cache.py clear       # forget everything
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+DATA_DIR  = Path("data")
+BUILD_DIR = DATA_DIR / "build"
+MANIFEST  = BUILD_DIR / "manifest.json"
+
+
+# ---------------------------------------------------------------------------
+# Digests and artefacts
+# ---------------------------------------------------------------------------
+
+def digest(*parts) -> str:
+    """Hash of JSON-serialisable values (anything else via str())."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_digest(*paths: Path) -> str:
+    """Hash of source files, e.g. a module whose constants shape the output."""
+    return digest(*(file_digest(Path(p)) for p in paths))
+
+
+def function_digest(path: Path, name: str) -> str:
+    """
+    Hash of one top-level function's source, found by parsing the file
+    rather than importing the module (and everything it imports).
+    """
+    import ast
+    source = Path(path).read_text()
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.FunctionDef) and node.name == name:
+            return digest(ast.get_source_segment(source, node))
+    raise ValueError(f"{path} has no function {name}()")
+
+
+def tree_digest(root: Path, pattern: str = "*.parquet") -> str:
+    """
+    Hash of the file listing under root (relative path, size, mtime).
+
+    Store and shard files are written once and never modified in place, so
+    the listing changes whenever their rows do, without reading any data.
+    """
+    if not root.exists():
+        return digest(None)
+    return digest(sorted(
+        (str(p.relative_to(root)), p.stat().st_size, p.stat().st_mtime_ns)
+        for p in root.rglob(pattern)
+    ))
+
+
+def frame_digest(df) -> str:
+    """Hash of a DataFrame's columns and row contents."""
+    import pandas as pd
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+    return digest(list(df.columns), hashlib.sha256(rows).hexdigest())
+
+
+def write_frame(df, path: Path) -> None:
+    """Write a DataFrame artefact as Parquet, atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def read_frame(path: Path):
+    import pandas as pd
+    return pd.read_parquet(path)
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+class BuildCache:
+    """
+    Per-stage input digests and artefact fingerprints from the last run.
+
+    Args:
+        manifest: JSON file the records are kept in.
+        force:    Treat every stage as stale.
+        explain:  Print why each stage ran or was skipped.
+    """
+
+    def __init__(self, manifest: Path = MANIFEST, force: bool = False,
+                 explain: bool = False):
+        self.manifest = Path(manifest)
+        self.force = force
+        self.explain = explain
+        try:
+            self._stages = json.loads(self.manifest.read_text())
+        except (OSError, ValueError):
+            self._stages = {}
+
+    def note(self, stage: str, message: str) -> None:
+        if self.explain:
+            print(f"[BUILD] {stage:<8} {message}")
+
+    def fresh(self, stage: str, inputs: dict[str, str],
+              artefact: Optional[Path] = None) -> bool:
+        """True if the stage can be skipped; explains the decision if asked."""
+        record = self._stages.get(stage)
+        if self.force:
+            reason = "ran: --force"
+        elif record is None:
+            reason = "ran: no previous build"
+        elif record["inputs"] != inputs:
+            changed = sorted(name for name in set(inputs) | set(record["inputs"])
+                             if inputs.get(name) != record["inputs"].get(name))
+            reason = f"ran: inputs changed ({', '.join(changed)})"
+        elif artefact is not None and not artefact.exists():
+            reason = f"ran: {artefact} is missing"
+        elif artefact is not None and file_digest(artefact) != record["artefact"]:
+            reason = f"ran: {artefact} was modified"
+        else:
+            self.note(stage, "skipped: inputs unchanged")
+            return True
+        self.note(stage, reason)
+        return False
+
+    def output(self, stage: str) -> Optional[str]:
+        """Content digest the stage's last run produced."""
+        record = self._stages.get(stage)
+        return record["output"] if record else None
+
+    def record(self, stage: str, inputs: dict[str, str],
+               artefact: Optional[Path] = None,
+               output: Optional[str] = None) -> None:
+        """Store a successful run; written atomically right away."""
+        self._stages[stage] = {
+            "inputs":   inputs,
+            "artefact": file_digest(artefact) if artefact is not None else None,
+            "output":   output,
+            "built_at": time.time(),
+        }
+        self.manifest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest.with_name(f".{self.manifest.name}.tmp")
+        tmp.write_text(json.dumps(self._stages, indent=1, sort_keys=True))
+        os.replace(tmp, self.manifest)
+
+    def stages(self) -> dict:
+        return dict(self._stages)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Inspect or clear the pipeline build cache."
+    )
+    parser.add_argument("command", nargs="?", default="show", choices=["show", "clear"])
+    parser.add_argument("--manifest", default=str(MANIFEST),
+                        help=f"Manifest path (default: {MANIFEST})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    manifest = Path(args.manifest)
+
+    if args.command == "clear":
+        manifest.unlink(missing_ok=True)
+        print(f"Cleared {manifest}.")
+    else:
+        for stage, record in BuildCache(manifest).stages().items():
+            built = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["built_at"]))
+            inputs = ", ".join(f"{k}={v[:8]}" for k, v in sorted(record["inputs"].items()))
+            print(f"  {stage:<8} {built}  {inputs}")
@@ -16,116 +16,401 @@ Authentication (pick one):
 Usage:
     python fetch_bigquery.py --project YOUR_GCP_PROJECT_ID
     python fetch_bigquery.py --project YOUR_GCP_PROJECT_ID --start 2022-01 --end 2024-12
+    python fetch_bigquery.py --project YOUR_GCP_PROJECT_ID --plan   # show runs, don't query
+    python fetch_bigquery.py --project YOUR_GCP_PROJECT_ID --job-per-month --max-concurrent-jobs 8
+    python fetch_bigquery.py --project YOUR_GCP_PROJECT_ID --stream   # Arrow batches → store
 """
 
 import argparse
-import csv
-import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Sequence, Union
 
-from google.cloud import bigquery
+from arguments import validate_bytes, validate_month
+from backends import (
+    BATCH_ROWS, METRIC, QUERIES, USD_PER_GB, BigQueryBackend, QueryBackend,
+)
+from result_cache import ResultCache
 
-DATA_DIR   = Path("data")
-OUTPUT_CSV = DATA_DIR / "monthly_commits.csv"
+# The GCP SDK takes most of a second to import; only code that talks to
+# BigQuery loads it (see backends.BigQueryBackend), so planning helpers like
+# month_range and the cache-only paths in main.py don't pay for it.
+if TYPE_CHECKING:
+    from google.cloud import bigquery
+
+# Months from store.ESTIMATE_FROM on are estimated from PushEvent counts
+# scaled by a commits/push ratio calibrated on the latest measured months.
+CALIBRATION_MONTHS = 6      # latest months with both metrics used for the ratio
 
 # ---------------------------------------------------------------------------
-# BigQuery SQL
+# Months
 # ---------------------------------------------------------------------------
-# githubarchive.month.* has one table per month named YYYYMM.
-# payload is a raw JSON string; $.size is the authoritative commit count.
-# We cast to INT64 and guard against NULL / non-numeric values with SAFE_CAST.
-QUERY_TEMPLATE = """
-SELECT
-    FORMAT_TIMESTAMP('%Y-%m', created_at) AS month,
-    SUM(SAFE_CAST(JSON_EXTRACT_SCALAR(payload, '$.size') AS INT64)) AS commits
-FROM
-    `githubarchive.month.*`
-WHERE
-    _TABLE_SUFFIX BETWEEN @start_suffix AND @end_suffix
-    AND type = 'PushEvent'
-GROUP BY
-    month
-ORDER BY
-    month
-"""
+# The SQL for each metric (QUERIES) is rendered from the logical definitions
+# in backends.py, which also run them locally with DuckDB.
+
+
+def _next_month(yyyy_mm: str) -> str:
+    y, m = int(yyyy_mm[:4]), int(yyyy_mm[5:7])
+    m += 1
+    if m > 12:
+        m = 1
+        y += 1
+    return f"{y:04d}-{m:02d}"
+
+
+def month_range(start_month: str, end_month: str) -> list[str]:
+    """Every 'YYYY-MM' from start_month to end_month, inclusive."""
+    months = []
+    month = start_month
+    while month <= end_month:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
 
+def _next_day(yyyy_mm_dd: str) -> str:
+    return (date.fromisoformat(yyyy_mm_dd) + timedelta(days=1)).isoformat()
 
-def _suffix(yyyy_mm: str) -> str:
-    """Convert 'YYYY-MM' → 'YYYYMM' for BigQuery table suffix."""
-    return yyyy_mm.replace("-", "")
 
+def _is_day(period: str) -> bool:
+    return len(period) == len("YYYY-MM-DD")
+
+
+def period_range(start: str, end: str) -> list[str]:
+    """Every month ('YYYY-MM') or day ('YYYY-MM-DD') from start to end, inclusive."""
+    if not _is_day(start):
+        return month_range(start, end)
+    days = []
+    day = start
+    while day <= end:
+        days.append(day)
+        day = _next_day(day)
+    return days
+
+
+# ---------------------------------------------------------------------------
+# Event windows
+# ---------------------------------------------------------------------------
+# Around a release only the days near it matter. Each event in range gets a
+# ±days window; windows that overlap or touch merge into one run, queried
+# from githubarchive.day.* so only those days' tables are scanned.
 
-def fetch(project: str, start_month: str, end_month: str) -> dict[str, int]:
+def event_days(start_month: str, end_month: str, days: int) -> list[str]:
+    """Every 'YYYY-MM-DD' within ±days of an LLM release, clipped to the months."""
+    from llm_events import get_events_in_range
+
+    first = date.fromisoformat(f"{start_month}-01")
+    last = date.fromisoformat(f"{_next_month(end_month)}-01") - timedelta(days=1)
+    window = set()
+    for event in get_events_in_range(first - timedelta(days=days),
+                                     last + timedelta(days=days)):
+        for offset in range(-days, days + 1):
+            day = event["date"] + timedelta(days=offset)
+            if first <= day <= last:
+                window.add(day.isoformat())
+    return sorted(window)
+
+
+# ---------------------------------------------------------------------------
+# Fetch planning
+# ---------------------------------------------------------------------------
+# A single BETWEEN over the first and last missing month scans every table in
+# between, cached or not. Grouping the missing months into contiguous runs and
+# issuing one BETWEEN per run only touches the tables we actually need.
+
+def plan_runs(months: list[str]) -> list[tuple[str, str]]:
     """
-    Run the BigQuery query and return {YYYY-MM: commit_count}.
+    Group months (or days) into contiguous (start, end) runs, both inclusive.
+
+    >>> plan_runs(["2023-01", "2023-02", "2023-03", "2025-06"])
+    [('2023-01', '2023-03'), ('2025-06', '2025-06')]
+    """
+    runs: list[tuple[str, str]] = []
+    for month in sorted(set(months)):
+        step = _next_day if _is_day(month) else _next_month
+        if runs and step(runs[-1][1]) == month:
+            runs[-1] = (runs[-1][0], month)
+        else:
+            runs.append((month, month))
+    return runs
+
+
+def plan_metric(months: list[str],
+                metric: str = METRIC,
+                cache: Optional[ResultCache] = None,
+                job_per_month: bool = False,
+                ) -> tuple[dict[str, Optional[int]], list[tuple[str, str]]]:
+    """Split months into cache hits and the runs still to query for one metric."""
+    cached = cache.get_many(QUERIES[metric], metric, months) if cache is not None else {}
+    runs = plan_runs([m for m in months if m not in cached])
+    if job_per_month:
+        runs = split_runs(runs)
+    return cached, runs
+
+
+def estimate_run_bytes(backend: QueryBackend,
+                       runs: list[tuple[str, str]]) -> list[int]:
+    """
+    Upper-bound bytes scanned per run, from table (or file) metadata.
+
+    Metadata lookups are free; the real scan reads only the columns the
+    query touches, so actual bytes billed are lower than this.
+    """
+    return [backend.table_bytes(start, end) for start, end in runs]
+
+
+def dry_run_bytes(backend: QueryBackend,
+                  runs: list[tuple[str, str]],
+                  metric: Union[str, Sequence[str]] = METRIC) -> list[int]:
+    """
+    Exact bytes each run would scan, from free dry runs.
+
+    BigQuery dry runs validate the query and report total_bytes_processed
+    without executing it, so nothing is billed.
+    """
+    return [backend.dry_run(metric, start, end) for start, end in runs]
+
+
+def check_budget(runs: list[tuple[str, str]],
+                 run_bytes: list[int],
+                 max_bytes_billed: int) -> None:
+    """Raise ValueError if any planned run would scan more than the budget."""
+    over = [
+        f"{start} → {end} ({n / 1e9:,.1f} GB)"
+        for (start, end), n in zip(runs, run_bytes)
+        if n > max_bytes_billed
+    ]
+    if over:
+        raise ValueError(
+            f"{len(over)} run(s) exceed the {max_bytes_billed / 1e9:,.1f} GB "
+            f"per-job budget: {', '.join(over)}. Narrow the range, use "
+            f"--job-per-month, or raise --max-bytes-billed."
+        )
+
+
+def print_plan(runs: list[tuple[str, str]],
+               run_bytes: Optional[list[int]] = None,
+               exact: bool = False) -> None:
+    """Print each run, with bytes and cost when estimates are given."""
+    bound = "" if exact else "≤ "
+    unit = "day" if runs and _is_day(runs[0][0]) else "month"
+    n_periods = sum(len(period_range(start, end)) for start, end in runs)
+    print(f"Fetch plan: {len(runs)} run(s), {n_periods} {unit}(s)")
+    for i, (start, end) in enumerate(runs):
+        line = f"  {start} → {end}  ({len(period_range(start, end))} {unit}(s))"
+        if run_bytes is not None:
+            gb = run_bytes[i] / 1e9
+            line += f"  {bound}{gb:,.1f} GB  (~${gb * USD_PER_GB:.2f})"
+        print(line)
+    if run_bytes is not None:
+        gb_total = sum(run_bytes) / 1e9
+        print(f"  Total           : {bound}{gb_total:,.1f} GB "
+              f"(~${gb_total * USD_PER_GB:.2f} cost)")
+
+
+# ---------------------------------------------------------------------------
+# Query execution
+# ---------------------------------------------------------------------------
+
+def fetch(project: str, start_month: str, end_month: str,
+          client: Optional["bigquery.Client"] = None,
+          backend: Optional[QueryBackend] = None) -> dict[str, int]:
+    """
+    Run the commits query and return {YYYY-MM: commit_count}.
 
     Args:
         project:     GCP project ID used for billing.
         start_month: Inclusive start, e.g. '2023-01'.
         end_month:   Inclusive end,   e.g. '2023-06'.
+        client:      Reuse an existing BigQuery client instead of creating one.
+        backend:     Run somewhere other than BigQuery (see backends.py).
     """
-    client = bigquery.Client(project=project)
-
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("start_suffix", "STRING", _suffix(start_month)),
-            bigquery.ScalarQueryParameter("end_suffix",   "STRING", _suffix(end_month)),
-        ]
-    )
+    if backend is None:
+        backend = BigQueryBackend(project, client)
 
-    print(f"Running BigQuery query  ({start_month} → {end_month}) …")
-    print(f"  Billing project : {project}")
-    print(f"  Dataset         : githubarchive.month.*\n")
-
-    job = client.query(QUERY_TEMPLATE, job_config=job_config)
+    print(f"Running {backend.name} query  ({start_month} → {end_month}) …")
+    if project:
+        print(f"  Billing project : {project}")
+    print(f"  Dataset         : {backend.dataset_for(start_month)}\n")
 
     # Wait for results and report bytes processed
-    results = job.result()
-    gb_processed = (job.total_bytes_processed or 0) / 1e9
+    totals, bytes_processed = backend.run(METRIC, start_month, end_month)
+    gb_processed = bytes_processed / 1e9
     print(f"  Query complete  : {gb_processed:.1f} GB scanned "
-          f"(~${gb_processed * 0.005:.2f} cost)")
-
-    totals: dict[str, int] = {}
-    for row in results:
-        if row.commits is not None:
-            totals[row.month] = int(row.commits)
+          f"(~${gb_processed * backend.usd_per_gb:.2f} cost)")
 
     return totals
 
 
-def load_existing_csv() -> dict[str, int]:
-    """Load previously saved monthly totals."""
+def split_runs(runs: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """Break every run into single-month (or single-day) runs, one job each."""
+    return [(period, period) for start, end in runs for period in period_range(start, end)]
+
+
+def fetch_runs(project: str,
+               runs: list[tuple[str, str]],
+               max_concurrent_jobs: int = 1,
+               client: Optional["bigquery.Client"] = None,
+               max_bytes_billed: Optional[int] = None,
+               cache: Optional[ResultCache] = None,
+               metric: str = METRIC,
+               backend: Optional[QueryBackend] = None) -> dict[str, int]:
+    """
+    Fetch one metric for each planned run through one shared backend and
+    merge the totals.
+
+    Up to max_concurrent_jobs queries are in flight at once, so wall-clock
+    time is bounded by the slowest job rather than the sum of all of them.
+    The backend defaults to BigQuery billed to project; pass a
+    backends.DuckDBBackend, or any object with a bigquery.Client-compatible
+    query() as client, to run offline.
+
+    With max_bytes_billed set, every run is dry-run first and the whole fetch
+    is refused (ValueError) before anything is billed if one run is over
+    budget; the budget is also set on each job as a server-side guard.
+
+    With a cache, each run's months are stored as soon as its job finishes,
+    so a fetch that fails part-way keeps everything already paid for.
+    """
+    if backend is None:
+        backend = BigQueryBackend(project, client)
+
+    if max_bytes_billed is not None:
+        check_budget(runs, dry_run_bytes(backend, runs, metric), max_bytes_billed)
+
+    n_workers = max(1, min(max_concurrent_jobs, len(runs)))
+    print(f"Running {len(runs)} {backend.name} {metric} job(s), "
+          f"up to {n_workers} at a time …")
+    if project:
+        print(f"  Billing project : {project}")
+    if runs:
+        print(f"  Dataset         : {backend.dataset_for(runs[0][0])}\n")
+
     totals: dict[str, int] = {}
-    if OUTPUT_CSV.exists():
-        with OUTPUT_CSV.open() as f:
-            for row in csv.DictReader(f):
-                totals[row["month"]] = int(row["commits"])
+    bytes_total = 0
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        futures = {
+            pool.submit(backend.run, metric, start, end, max_bytes_billed): (start, end)
+            for start, end in runs
+        }
+        for future in as_completed(futures):
+            start, end = futures[future]
+            run_totals, bytes_processed = future.result()
+            # The result cache holds whole months; a day run's totals are
+            # only the days it covered, so they bypass it
+            if cache is not None and not _is_day(start):
+                cache.put_many(QUERIES[metric], metric, month_range(start, end), run_totals)
+            totals.update(run_totals)
+            bytes_total += bytes_processed
+            print(f"  {start} → {end} : {bytes_processed / 1e9:.1f} GB scanned")
+
+    gb_processed = bytes_total / 1e9
+    print(f"  Query complete  : {gb_processed:.1f} GB scanned "
+          f"(~${gb_processed * backend.usd_per_gb:.2f} cost)")
+
     return totals
 
 
-def save_csv(totals: dict[str, int]) -> None:
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with OUTPUT_CSV.open("w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["month", "commits"])
-        for month in sorted(totals):
-            writer.writerow([month, totals[month]])
-    print(f"\n  Saved {len(totals)} month(s) → {OUTPUT_CSV}")
+def stream_runs(project: str,
+                runs: list[tuple[str, str]],
+                max_concurrent_jobs: int = 1,
+                client: Optional["bigquery.Client"] = None,
+                max_bytes_billed: Optional[int] = None,
+                metric: Union[str, Sequence[str]] = METRIC,
+                backend: Optional[QueryBackend] = None,
+                provenance: str = "measured",
+                granularity: str = "month",
+                store_dir: Optional[Path] = None,
+                batch_rows: int = BATCH_ROWS) -> int:
+    """
+    Like fetch_runs, but stream each run's result straight into the store,
+    grouped by month, day or hour (granularity).
+
+    Rows come back as Arrow record batches (backend.stream_batches) and are
+    appended with store.write_batches, so no Python object is built per row
+    and peak memory is about batch_rows × max_concurrent_jobs rows, however
+    large the result. Use this for daily, hourly or per-repo results; the
+    monthly path keeps fetch_runs, whose dicts feed the result cache and
+    the PushEvent calibration. Pass several metrics to compute them all in
+    one scan per run; each is stored as its own metric.
+
+    Each run lands in the store as soon as its stream is exhausted. Returns
+    the number of rows written.
+    """
+    from store import STORE_DIR, write_batches
+
+    if backend is None:
+        backend = BigQueryBackend(project, client)
+    store_dir = store_dir or STORE_DIR
+
+    if max_bytes_billed is not None:
+        check_budget(runs, dry_run_bytes(backend, runs, metric), max_bytes_billed)
+
+    def _stream(start: str, end: str) -> tuple[int, int]:
+        job = backend.submit(metric, start, end, max_bytes_billed, granularity)
+        n_rows = write_batches(backend.stream_batches(job, metric, batch_rows),
+                               metric, provenance, backend.name, granularity,
+                               store_dir)
+        return n_rows, backend.bytes_scanned(job)
+
+    n_workers = max(1, min(max_concurrent_jobs, len(runs)))
+    names = metric if isinstance(metric, str) else "+".join(metric)
+    print(f"Streaming {len(runs)} {backend.name} {names} job(s) into "
+          f"{store_dir}, up to {n_workers} at a time …")
+    if runs:
+        print(f"  Dataset         : {backend.dataset_for(runs[0][0])}\n")
+
+    rows_total = 0
+    bytes_total = 0
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        futures = {pool.submit(_stream, start, end): (start, end) for start, end in runs}
+        for future in as_completed(futures):
+            start, end = futures[future]
+            n_rows, bytes_processed = future.result()
+            rows_total += n_rows
+            bytes_total += bytes_processed
+            print(f"  {start} → {end} : {n_rows:,} row(s), "
+                  f"{bytes_processed / 1e9:.1f} GB scanned")
+
+    gb_processed = bytes_total / 1e9
+    print(f"  Query complete  : {rows_total:,} row(s), {gb_processed:.1f} GB scanned "
+          f"(~${gb_processed * backend.usd_per_gb:.2f} cost)")
+
+    return rows_total
 
 
 # ---------------------------------------------------------------------------
-# CLI
+# PushEvent-based estimation
 # ---------------------------------------------------------------------------
 
-def _validate_month(value: str) -> str:
-    """Validate YYYY-MM format and return the value unchanged."""
-    if not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", value):
-        raise argparse.ArgumentTypeError(
-            f"Invalid month format: '{value}'. Expected YYYY-MM (e.g. 2023-01)."
+def calibrate_ratio(commits: dict[str, int],
+                    push_events: dict[str, int],
+                    n_months: int = CALIBRATION_MONTHS) -> float:
+    """
+    Commits per PushEvent over the latest n_months where both are known.
+
+    commits must hold measured values only; estimated months would just
+    feed the previous ratio back in.
+    """
+    overlap = sorted(m for m in commits if push_events.get(m))[-n_months:]
+    if not overlap:
+        raise ValueError(
+            "Cannot calibrate the PushEvent ratio: no month has both a "
+            "measured commit total and a PushEvent count."
         )
-    return value
+    return sum(commits[m] for m in overlap) / sum(push_events[m] for m in overlap)
+
+
+def estimate_commits(push_events: dict[str, int], ratio: float) -> dict[str, int]:
+    """Scale PushEvent counts to estimated commit totals."""
+    return {month: round(count * ratio) for month, count in push_events.items()}
 
 
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
 def _parse_args():
     parser = argparse.ArgumentParser(
         description="Fetch GitHub commit counts via BigQuery."
@@ -135,18 +420,71 @@ def _parse_args():
         help="GCP project ID to bill the query against.",
     )
     parser.add_argument(
-        "--start", default="2023-01", type=_validate_month,
+        "--start", default="2023-01", type=validate_month,
         help="Start month YYYY-MM (default: 2023-01)",
     )
     parser.add_argument(
-        "--end", default="2026-01", type=_validate_month,
+        "--end", default="2026-01", type=validate_month,
         help="End month YYYY-MM (default: 2026-01)",
     )
+    parser.add_argument(
+        "--plan", action="store_true",
+        help="Print the fetch plan with estimated bytes and exit without querying.",
+    )
+    parser.add_argument(
+        "--max-concurrent-jobs", default=4, type=int,
+        help="Maximum BigQuery jobs in flight at once (default: 4)",
+    )
+    parser.add_argument(
+        "--job-per-month", action="store_true",
+        help="Submit one job per month instead of one per contiguous run.",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Ignore and don't update the local query-result cache.",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Dry-run every planned job, print exact bytes and cost, and exit.",
+    )
+    parser.add_argument(
+        "--max-bytes-billed", default=None, type=validate_bytes,
+        help="Refuse any job that would scan more than this (e.g. 500GB).",
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Stream results as Arrow batches straight into the store "
+             "instead of collecting rows; skips the result cache.",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = _parse_args()
-    totals = fetch(args.project, args.start, args.end)
-    save_csv(totals)
+    cache = None if args.no_cache or args.stream else ResultCache()
+    months = month_range(args.start, args.end)
+    cached, runs = plan_metric(months, METRIC, cache, args.job_per_month)
+    if cached:
+        print(f"{len(cached)} month(s) served from the result cache.")
+    if args.plan or args.dry_run:
+        backend = BigQueryBackend(args.project)
+        if args.dry_run:
+            print_plan(runs, dry_run_bytes(backend, runs), exact=True)
+        else:
+            print_plan(runs, estimate_run_bytes(backend, runs))
+        raise SystemExit(0)
+    if args.stream:
+        from store import export_csv
+        stream_runs(args.project, runs, args.max_concurrent_jobs,
+                    max_bytes_billed=args.max_bytes_billed)
+        export_csv()
+        raise SystemExit(0)
+    totals = {m: v for m, v in cached.items() if v is not None}
+    if runs:
+        totals.update(fetch_runs(args.project, runs, args.max_concurrent_jobs,
+                                 max_bytes_billed=args.max_bytes_billed,
+                                 cache=cache))
+    from store import export_csv, write_metric
+    write_metric(totals, METRIC, "measured", "bigquery")
+    export_csv()
     print("\nDone. Run visualize.py to generate the chart.")
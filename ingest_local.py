@@ -0,0 +1,469 @@
+"""
+ingest_local.py
+---------------
+Compute hourly GitHub commit totals from a local mirror of the hourly
+GH Archive dumps (https://www.gharchive.org/) — no BigQuery required.
+
+Each hourly YYYY-MM-DD-H.json.gz file is stream-decompressed one line at a
+time, so a worker only ever holds a single event plus a per-hour running
+sum. Files are spread over a process pool; a month of ~720 hourly files
+scales with the number of cores.
+
+Most lines are not PushEvents, so each line first goes through a byte-level
+fast path: a substring check rejects non-PushEvents without decoding, and
+payload.size and created_at are sliced out of the raw bytes. Lines the fast
+path can't read fall back to json.loads. --verify-every N cross-checks the
+fast path against a full parse on every Nth line.
+
+Progress is checkpointed in an append-only manifest (data/ingest_manifest.jsonl):
+one line per processed hourly file with its path, size, mtime, checksum and
+per-hour partial sums. Re-runs skip files whose size and mtime are
+unchanged and rebuild totals from the recorded partials, so a crash at
+hour 600 resumes at hour 601 and a refreshed hour only re-reads that file.
+--verify also re-hashes those files and re-reads any whose checksum no
+longer matches. Records for files that have been deleted are dropped.
+
+The result is keyed by hour, {YYYY-MM-DDTHH: commits}, the finest
+granularity the archive has; main.py stores it hourly and days, weeks and
+months are rolled up from it (see rollup.py). The CLI prints monthly sums.
+
+Usage:
+    python ingest_local.py --archive-dir /mnt/gharchive
+    python ingest_local.py --archive-dir /mnt/gharchive --start 2024-01 --end 2024-03 --workers 32
+    python ingest_local.py --archive-dir /mnt/gharchive --verify-every 1000
+    python ingest_local.py --archive-dir /mnt/gharchive --no-manifest   # ignore checkpoints
+    python ingest_local.py --archive-dir /mnt/gharchive --verify        # re-hash checkpoints
+    python benchmarks/bench_ingest_prefilter.py       # lines/s, fast vs full parse
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Optional
+
+from arguments import validate_month
+
+DATA_DIR      = Path("data")
+MANIFEST_PATH = DATA_DIR / "ingest_manifest.jsonl"
+
+# gharchive.org names hourly dumps YYYY-MM-DD-H.json.gz, hour without padding.
+ARCHIVE_FILE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})-(\d{1,2})\.json\.gz$")
+
+# GH Archive files an event under the hour it was collected, which can be
+# after the hour it was created; reading a month also reads this many hours
+# of files either side and keeps only the events created inside the month.
+SPILL_HOURS = 1
+
+
+def archive_file_hour(path: Path) -> datetime:
+    """The UTC hour an archive file is named for."""
+    y, m, d, h = ARCHIVE_FILE_RE.search(path.name).groups()
+    return datetime(int(y), int(m), int(d), int(h), tzinfo=timezone.utc)
+
+
+def _file_hour_key(path: Path) -> str:
+    """The YYYY-MM-DDTHH hour an archive file is named for."""
+    return f"{archive_file_hour(path):%Y-%m-%dT%H}"
+
+
+def list_archive_files(archive_dir: Path,
+                       start_month: Optional[str] = None,
+                       end_month: Optional[str] = None,
+                       months: Optional[set[str]] = None,
+                       spill_hours: int = 0) -> list[Path]:
+    """
+    Hourly archive files under archive_dir whose month is in range, sorted.
+
+    If months is given, only files for those months are returned. With
+    spill_hours, so are files that many hours either side of a month in
+    range, which can hold events created in it (see SPILL_HOURS).
+    """
+    spill = timedelta(hours=spill_hours)
+
+    def wanted(month: str) -> bool:
+        return ((not start_month or month >= start_month)
+                and (not end_month or month <= end_month)
+                and (months is None or month in months))
+
+    files = []
+    for path in Path(archive_dir).rglob("*.json.gz"):
+        if not ARCHIVE_FILE_RE.search(path.name):
+            continue
+        hour = archive_file_hour(path)
+        if any(wanted(f"{h:%Y-%m}") for h in (hour - spill, hour, hour + spill)):
+            files.append(path)
+    return sorted(files)
+
+
+# ---------------------------------------------------------------------------
+# Line parsers
+# ---------------------------------------------------------------------------
+# Both return (YYYY-MM-DDTHH, payload.size) for a PushEvent with a numeric size and
+# None for everything else. GH Archive lines are compact JSON, and inside
+# string values quotes are escaped, so these byte patterns can only match
+# real keys. Lines spaced any other way don't match them and are decoded in
+# full instead.
+
+PUSH_NAME      = b"PushEvent"
+PUSH_MARKER    = b'"type":"PushEvent"'
+PAYLOAD_KEY    = b'"payload":'
+SIZE_KEY       = b'"size":'
+CREATED_AT_KEY = b'"created_at":"'
+HOUR_LEN       = len("YYYY-MM-DDTHH")
+
+
+def parse_line_json(line: bytes) -> Optional[tuple[str, int]]:
+    """Reference parser: decode the whole event with json.loads."""
+    event = json.loads(line)
+    if event.get("type") != "PushEvent":
+        return None
+    size = (event.get("payload") or {}).get("size")
+    if not isinstance(size, int) or isinstance(size, bool):
+        return None
+    return event["created_at"][:HOUR_LEN], size
+
+
+def parse_line_fast(line: bytes) -> Optional[tuple[str, int]]:
+    """
+    Byte-scan parser: reject lines that never mention PushEvent with one
+    substring check and slice payload.size and created_at out without
+    materialising the payload.
+
+    Falls back to parse_line_json for any line that doesn't have the expected
+    shape, including non-compact spellings such as '"type": "PushEvent"', so
+    it never returns something the full parse wouldn't.
+    """
+    if PUSH_NAME not in line:
+        return None
+    if PUSH_MARKER not in line:
+        # Another event mentioning PushEvent, or JSON with other spacing
+        return parse_line_json(line)
+
+    payload_at = line.find(PAYLOAD_KEY)
+    size_at = line.find(SIZE_KEY, payload_at) if payload_at >= 0 else -1
+    # created_at is a top-level key after payload; commit objects inside the
+    # payload never carry one, so the last occurrence is the event's own.
+    created_at = line.rfind(CREATED_AT_KEY)
+    if size_at < 0 or created_at < 0:
+        return parse_line_json(line)
+
+    start = size_at + len(SIZE_KEY)
+    end = start
+    while end < len(line) and 48 <= line[end] <= 57:       # ASCII digits
+        end += 1
+    if end == start or line[end:end + 1] not in (b",", b"}"):
+        return parse_line_json(line)
+
+    hour_start = created_at + len(CREATED_AT_KEY)
+    return line[hour_start:hour_start + HOUR_LEN].decode("ascii"), int(line[start:end])
+
+
+class _HashingReader:
+    """File wrapper that feeds every byte read through a hash."""
+
+    def __init__(self, raw, hasher):
+        self._raw = raw
+        self._hasher = hasher
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._raw.read(size)
+        self._hasher.update(data)
+        return data
+
+
+def ingest_file(path: Path,
+                fast: bool = True,
+                verify_every: int = 0,
+                hasher=None) -> dict[str, int]:
+    """
+    Sum payload.size over the PushEvents in one hourly file.
+
+    Returns {YYYY-MM-DDTHH: commits}, keyed on the event's created_at hour
+    like FORMAT_TIMESTAMP('%Y-%m-%dT%H', created_at) in an hourly BigQuery
+    fetch. Events without a numeric size are skipped, as SAFE_CAST does
+    there.
+
+    Args:
+        path:         Hourly .json.gz file.
+        fast:         Use the byte-scan parser (default) instead of json.loads.
+        verify_every: If > 0, re-parse every Nth line with json.loads and
+                      raise ValueError if the fast path disagrees.
+        hasher:       Optional hashlib object updated with the compressed bytes.
+    """
+    parse = parse_line_fast if fast else parse_line_json
+    totals: dict[str, int] = {}
+    try:
+        with open(path, "rb") as raw, \
+                gzip.GzipFile(fileobj=_HashingReader(raw, hasher) if hasher else raw) as f:
+            for lineno, line in enumerate(f, 1):
+                parsed = parse(line)
+                if verify_every and lineno % verify_every == 0:
+                    expected = parse_line_json(line)
+                    if parsed != expected:
+                        raise ValueError(
+                            f"{path}:{lineno}: fast path returned {parsed}, "
+                            f"full parse returned {expected}"
+                        )
+                if parsed is None:
+                    continue
+                hour, size = parsed
+                totals[hour] = totals.get(hour, 0) + size
+    except (OSError, EOFError, json.JSONDecodeError) as exc:
+        raise OSError(f"Failed to read {path}: {exc}") from exc
+    return totals
+
+
+def _file_sha256(path: Path) -> str:
+    """sha256 of a file's compressed bytes, as _ingest_worker records it."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _ingest_worker(path: Path, fast: bool,
+                   verify_every: int) -> tuple[Path, dict[str, int], str]:
+    """Pool task: (path, per-hour partial sums, sha256 of the file)."""
+    hasher = hashlib.sha256()
+    totals = ingest_file(path, fast=fast, verify_every=verify_every, hasher=hasher)
+    return path, totals, hasher.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint manifest
+# ---------------------------------------------------------------------------
+
+class IngestManifest:
+    """
+    Append-only JSONL record of processed hourly files.
+
+    Each line: {"path", "size", "mtime_ns", "sha256", "hours"}. The last line
+    for a path wins; a file whose size or mtime differs from its record is
+    treated as changed and re-ingested, as is one recorded with per-month
+    sums ("months") before ingests were hourly. With verify, the sha256 is
+    checked too, for rewrites that keep the size and mtime.
+    """
+
+    def __init__(self, path: Path = MANIFEST_PATH):
+        self.path = Path(path)
+        self._records: dict[str, dict] = {}
+        self._n_lines = 0
+        if self.path.exists():
+            with self.path.open() as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue        # torn last line from a crash
+                    self._records[record["path"]] = record
+                    self._n_lines += 1
+
+    def lookup(self, path: Path, verify: bool = False) -> Optional[dict[str, int]]:
+        """Recorded partial sums if path is unchanged since it was ingested."""
+        record = self._records.get(str(path.resolve()))
+        if record is None:
+            return None
+        st = path.stat()
+        if record["size"] != st.st_size or record["mtime_ns"] != st.st_mtime_ns:
+            return None
+        if verify and record.get("sha256") != _file_sha256(path):
+            return None
+        return record.get("hours")
+
+    def prune(self) -> int:
+        """Forget files that no longer exist; returns how many were dropped."""
+        gone = [path for path in self._records if not os.path.exists(path)]
+        for path in gone:
+            del self._records[path]
+        return len(gone)
+
+    def record(self, path: Path, sha256: str, hours: dict[str, int]) -> None:
+        """Append a checkpoint for one processed file and flush it to disk."""
+        st = path.stat()
+        record = {
+            "path":     str(path.resolve()),
+            "size":     st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256":   sha256,
+            "hours":    hours,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._records[record["path"]] = record
+        self._n_lines += 1
+
+    def compact(self) -> None:
+        """Rewrite the manifest with only the latest record per file."""
+        if self._n_lines == len(self._records):
+            return
+        tmp = self.path.with_suffix(".jsonl.tmp")
+        with tmp.open("w") as f:
+            for record in self._records.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp, self.path)
+        self._n_lines = len(self._records)
+
+
+def ingest(archive_dir: Path,
+           start_month: Optional[str] = None,
+           end_month: Optional[str] = None,
+           workers: Optional[int] = None,
+           months: Optional[set[str]] = None,
+           fast: bool = True,
+           verify_every: int = 0,
+           manifest: Optional[IngestManifest] = None,
+           verify: bool = False) -> dict[str, int]:
+    """
+    Return {YYYY-MM-DDTHH: commits} for every archive file in range,
+    including 0 for the hour of a file with no pushes.
+
+    With a manifest, files already recorded and unchanged on disk are not
+    re-read; their partial sums come from the manifest, and every newly
+    processed file is checkpointed as soon as it finishes. Records for
+    files that no longer exist are dropped from the manifest.
+
+    Args:
+        archive_dir: Directory holding the hourly .json.gz files (searched recursively).
+        start_month: Inclusive start, e.g. '2023-01'. None for no lower bound.
+        end_month:   Inclusive end,   e.g. '2023-06'. None for no upper bound.
+        workers:     Worker processes (default: all cores).
+        months:      Only ingest these months, e.g. the gaps in a cached range.
+        fast:        Use the byte-scan fast path (see ingest_file).
+        verify_every: Cross-check every Nth line against json.loads.
+        manifest:    Checkpoint manifest to resume from and append to.
+        verify:      Also re-hash recorded files and re-read any whose
+                     sha256 differs from the manifest's.
+    """
+    # The neighbouring months' edge files too, for events filed an hour late
+    files = list_archive_files(archive_dir, start_month, end_month, months,
+                               spill_hours=SPILL_HOURS)
+    if not files:
+        print(f"  No archive files found under {archive_dir}")
+        return {}
+
+    # Every hour a file was read for is reported, 0 if it had no pushes, so
+    # the store records which hours the mirror covered (see rollup.py)
+    totals: dict[str, int] = {_file_hour_key(path): 0 for path in files}
+
+    def _add(file_totals: dict[str, int]) -> None:
+        for hour, commits in file_totals.items():
+            totals[hour] = totals.get(hour, 0) + commits
+
+    todo = []
+    for path in files:
+        recorded = manifest.lookup(path, verify) if manifest is not None else None
+        if recorded is None:
+            todo.append(path)
+        else:
+            _add(recorded)
+    if manifest is not None:
+        print(f"  {len(files) - len(todo)} of {len(files)} file(s) unchanged "
+              f"since the last ingest ({manifest.path})")
+
+    if todo:
+        workers = workers or os.cpu_count() or 1
+        print(f"Ingesting {len(todo)} hourly file(s) from {archive_dir} "
+              f"with {workers} worker(s) …")
+
+        t0 = time.perf_counter()
+        work = partial(_ingest_worker, fast=fast, verify_every=verify_every)
+        with Pool(processes=workers) as pool:
+            # chunksize=1: files are large and uneven, so hand them out one at
+            # a time to keep every worker busy until the end.
+            for i, (path, file_totals, sha256) in enumerate(
+                    pool.imap_unordered(work, todo, chunksize=1), 1):
+                if manifest is not None:
+                    manifest.record(path, sha256, file_totals)
+                _add(file_totals)
+                if i % 100 == 0 or i == len(todo):
+                    print(f"  {i}/{len(todo)} files  ({time.perf_counter() - t0:.0f}s)")
+    if manifest is not None:
+        pruned = manifest.prune()
+        if pruned:
+            print(f"  Dropped {pruned} deleted file(s) from {manifest.path}")
+        manifest.compact()
+
+    # Events can straddle the hour boundary; keep only the requested months.
+    return {
+        hour: commits for hour, commits in totals.items()
+        if (not start_month or hour[:7] >= start_month)
+        and (not end_month or hour[:7] <= end_month)
+        and (months is None or hour[:7] in months)
+    }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compute monthly GitHub commit totals from local GH Archive files."
+    )
+    parser.add_argument(
+        "--archive-dir", required=True,
+        help="Directory holding hourly YYYY-MM-DD-H.json.gz files.",
+    )
+    parser.add_argument(
+        "--start", default=None, type=validate_month,
+        help="Start month YYYY-MM (default: all files)",
+    )
+    parser.add_argument(
+        "--end", default=None, type=validate_month,
+        help="End month YYYY-MM (default: all files)",
+    )
+    parser.add_argument(
+        "--workers", default=None, type=int,
+        help="Worker processes (default: all cores)",
+    )
+    parser.add_argument(
+        "--no-prefilter", action="store_true",
+        help="Decode every line with json.loads instead of the byte-scan fast path.",
+    )
+    parser.add_argument(
+        "--verify-every", default=0, type=int, metavar="N",
+        help="Cross-check the fast path against a full JSON parse on every "
+             "Nth line; abort on the first mismatch.",
+    )
+    parser.add_argument(
+        "--no-manifest", action="store_true",
+        help=f"Re-read every file; don't use or update {MANIFEST_PATH}.",
+    )
+    parser.add_argument(
+        "--verify", action="store_true",
+        help="Re-hash files the manifest records as unchanged and re-read "
+             "any whose sha256 differs.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    try:
+        totals = ingest(Path(args.archive_dir), args.start, args.end, args.workers,
+                        fast=not args.no_prefilter, verify_every=args.verify_every,
+                        manifest=None if args.no_manifest else IngestManifest(),
+                        verify=args.verify)
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+    if not totals:
+        sys.exit(1)
+    monthly: dict[str, int] = {}
+    for hour, commits in totals.items():
+        monthly[hour[:7]] = monthly.get(hour[:7], 0) + commits
+    for month in sorted(monthly):
+        print(f"  {month}  {monthly[month]:>14,}")
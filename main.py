@@ -19,6 +19,30 @@ Examples
 # Save chart to file:
     python main.py --project YOUR_GCP_PROJECT_ID --out chart.png
 
+# Compute from a local mirror of the hourly GH Archive dumps, no BigQuery:
+    python main.py --source local --archive-dir /mnt/gharchive --out chart.png
+
+# Re-aggregate from monthly Parquet shards (see shards.py convert):
+    python main.py --source shards --out chart.png
+
+# Run the BigQuery fetch's queries offline with DuckDB over the shards:
+    python main.py --backend duckdb --shard-dir data/shards --out chart.png
+
+# Daily commits for ±14 days around each LLM release only, from githubarchive.day.*:
+    python main.py --project YOUR_GCP_PROJECT_ID --event-windows 14 --granularity day --out releases.png
+
+# Overlay stars and forks, fetched in the same scan as each other:
+    python main.py --project YOUR_GCP_PROJECT_ID --overlay stars forks pull_requests --out chart.png
+
+# Weekly chart, rolled up from whatever finer data is stored (never re-queried):
+    python main.py --no-fetch --granularity week --plot-start 2024-01 --out weekly.png
+
+# Stages whose inputs haven't changed are skipped; say why each ran or not:
+    python main.py --no-fetch --out chart.png --explain
+
+# Show which month runs would be queried (and estimated bytes), then exit:
+    python main.py --project YOUR_GCP_PROJECT_ID --plan
+
 Authentication
 --------------
 Run once before using:
@@ -26,18 +50,16 @@ Run once before using:
 """
 
 import argparse
-import re
+import calendar
+import json
 import sys
+import time
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
 
-
-def _validate_month(value: str) -> str:
-    """Validate YYYY-MM format and return the value unchanged."""
-    if not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", value):
-        raise argparse.ArgumentTypeError(
-            f"Invalid month format: '{value}'. Expected YYYY-MM (e.g. 2023-01)."
-        )
-    return value
+from arguments import validate_bytes, validate_month, validate_period
+from store import ESTIMATE_FROM
 
 
 def _parse_args():
@@ -49,107 +71,848 @@ def _parse_args():
         help="GCP project ID to bill the BigQuery query against.",
     )
     parser.add_argument(
-        "--start", default="2023-01", type=_validate_month,
+        "--source", choices=["bigquery", "local", "shards"], default="bigquery",
+        help="Where to fetch commit counts from: BigQuery (default), a "
+             "local GH Archive mirror given by --archive-dir, or Parquet "
+             "shards built by shards.py in --shard-dir.",
+    )
+    parser.add_argument(
+        "--backend", choices=["bigquery", "duckdb"], default="bigquery",
+        help="Where --source bigquery runs its queries: BigQuery (default), "
+             "or DuckDB locally and free of charge over --archive-dir if "
+             "given, else --shard-dir (see backends.py).",
+    )
+    parser.add_argument(
+        "--shard-dir", default="data/shards",
+        help="Monthly Parquet shards for --source shards (default: data/shards)",
+    )
+    parser.add_argument(
+        "--archive-dir", default=None,
+        help="Directory of hourly YYYY-MM-DD-H.json.gz files for --source local.",
+    )
+    parser.add_argument(
+        "--workers", default=None, type=int,
+        help="Worker processes for --source local (default: all cores)",
+    )
+    parser.add_argument(
+        "--verify-every", default=0, type=int, metavar="N",
+        help="With --source local, cross-check the byte-scan fast path "
+             "against a full JSON parse on every Nth line.",
+    )
+    parser.add_argument(
+        "--start", default="2023-01", type=validate_month,
         help="Start month YYYY-MM (default: 2023-01)",
     )
     parser.add_argument(
-        "--end", default="2026-01", type=_validate_month,
+        "--end", default="2026-01", type=validate_month,
         help="End month YYYY-MM (default: 2026-01)",
     )
     parser.add_argument(
         "--no-fetch", action="store_true",
-        help="Skip fetch step; use existing data/monthly_commits.csv",
+        help="Skip fetch step; use existing data in data/store "
+             "(seeded from data/monthly_commits.csv if only that exists)",
+    )
+    parser.add_argument(
+        "--plan", action="store_true",
+        help="Print the runs of missing months that would be queried, with "
+             "estimated bytes, and exit without fetching.",
+    )
+    parser.add_argument(
+        "--max-concurrent-jobs", default=4, type=int,
+        help="Maximum BigQuery jobs in flight at once (default: 4)",
+    )
+    parser.add_argument(
+        "--job-per-month", action="store_true",
+        help="Submit one BigQuery job per missing month instead of one per "
+             "contiguous run; more parallelism, same bytes scanned.",
+    )
+    parser.add_argument(
+        "--estimate-from", default=ESTIMATE_FROM, type=validate_month,
+        help="Estimate months >= YYYY-MM from PushEvent counts instead of "
+             "summing payload.size (default: %(default)s, when GH Archive "
+             "dropped the size field)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Ignore and don't update local caches: the BigQuery result "
+             "cache (data/query_cache.sqlite) and the local ingest manifest "
+             "(data/ingest_manifest.jsonl).",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Dry-run every planned BigQuery job, print exact bytes and "
+             "estimated cost, and exit without fetching.",
+    )
+    parser.add_argument(
+        "--max-bytes-billed", default=None, type=validate_bytes,
+        help="Refuse any BigQuery job that would scan more than this "
+             "(e.g. 500GB, 1.5TB).",
     )
     parser.add_argument(
         "--out", default=None,
         help="Save chart to this path (e.g. chart.png). Omit to show interactively.",
     )
     parser.add_argument(
-        "--plot-start", default=None,
-        help="Restrict chart to months >= YYYY-MM",
+        "--fetch-granularity", choices=["month", "day", "hour"], default="month",
+        help="With --source bigquery, group fetched rows by month (default), "
+             "day or hour. Same bytes scanned; finer rows are streamed into "
+             "the store and coarser series rolled up from them locally.",
+    )
+    parser.add_argument(
+        "--event-windows", default=None, type=int, metavar="N",
+        help="Instead of whole months, fetch daily commits for the days within "
+             "±N of each LLM release in --start … --end, querying only those "
+             "days' githubarchive.day.* tables (overlapping windows merge).",
+    )
+    parser.add_argument(
+        "--overlay", default=None, nargs="+", metavar="METRIC",
+        help="Also fetch and plot these metrics (e.g. stars forks pull_requests "
+             "issues releases) on a right-hand axis. Whatever the store lacks "
+             "is fetched for all of them in one scan per run.",
+    )
+    parser.add_argument(
+        "--granularity", choices=["hour", "day", "week", "month"], default="month",
+        help="Plot one point per hour, day, week or month (default: month), "
+             "rolled up from the finest data in the store; never re-queried.",
+    )
+    parser.add_argument(
+        "--plot-start", default=None, type=validate_period,
+        help="Restrict chart to periods >= YYYY-MM (or YYYY-MM-DD, YYYY-MM-DDTHH)",
+    )
+    parser.add_argument(
+        "--plot-end", default=None, type=validate_period,
+        help="Restrict chart to periods <= YYYY-MM (or YYYY-MM-DD, YYYY-MM-DDTHH)",
+    )
+    parser.add_argument(
+        "--outlier-window", default=None, type=int,
+        help="Score outliers against a trailing window of N points instead "
+             "of one median/MAD over the whole series",
+    )
+    parser.add_argument(
+        "--verify-capping", action="store_true",
+        help="With --outlier-window, check the incrementally updated outlier "
+             "state against a full recompute and fail on any difference",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Re-run every stage even if its inputs are unchanged since the "
+             "last run (see build_cache.py).",
     )
     parser.add_argument(
-        "--plot-end", default=None,
-        help="Restrict chart to months <= YYYY-MM",
+        "--explain", action="store_true",
+        help="Say why each pipeline stage ran or was skipped.",
     )
     return parser.parse_args()
 
 
+def _fetch(args, scanned: Optional[set[str]] = None) -> None:
+    """
+    Bring the store's monthly commits up to date for --start … --end.
+
+    Months before --estimate-from are measured (summed payload.size). Later
+    months, and any measured month that came back without a size, are
+    estimated from cheap PushEvent counts scaled by a ratio calibrated on the
+    latest months where both metrics exist.
+
+    scanned holds the months _fetch_overlays already measured commits for
+    in its own scan; they are never queried again, and PushEvent counts it
+    stored are used as they are.
+    """
+    from backends import get_backend
+    from fetch_bigquery import (
+        CALIBRATION_MONTHS, calibrate_ratio, dry_run_bytes, estimate_commits,
+        estimate_run_bytes, fetch_runs, month_range, plan_metric, print_plan,
+    )
+    from result_cache import ResultCache
+    from rollup import load_metric, load_provenance
+    from store import export_csv, load_metric as load_stored, write_metric
+
+    scanned = scanned or set()
+    # Only fetch months not already in the store (fetched monthly or rolled
+    # up from finer rows) or the result cache, one query per contiguous run
+    # of what is left.
+    existing = load_metric("commits")
+    sources = load_provenance("commits")
+    all_months = month_range(args.start, args.end)
+    missing = [mo for mo in all_months if mo not in existing]
+    to_measure = [mo for mo in missing if mo < args.estimate_from and mo not in scanned]
+    to_estimate = [mo for mo in missing if mo >= args.estimate_from or mo in scanned]
+
+    try:
+        backend = get_backend(args.backend, args.project,
+                              Path(args.archive_dir or args.shard_dir))
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+    # Local queries cost nothing, so only BigQuery results are worth caching;
+    # the cache holds monthly results only.
+    cache = (None if args.no_cache or args.backend != "bigquery"
+             or args.fetch_granularity != "month" else ResultCache())
+    fetch_kwargs = dict(max_concurrent_jobs=args.max_concurrent_jobs,
+                        max_bytes_billed=args.max_bytes_billed, cache=cache,
+                        backend=backend)
+
+    def _calibration_months(measured: dict[str, int]) -> list[str]:
+        return sorted(measured)[-CALIBRATION_MONTHS:] if to_estimate else []
+
+    measured = {mo: v for mo, v in existing.items() if sources.get(mo) == "measured"}
+    cached, runs = plan_metric(to_measure, "commits", cache, args.job_per_month)
+    if cached:
+        print(f"[INFO] {len(cached)} month(s) served from the result cache.")
+
+    if args.plan or args.dry_run:
+        push_months = to_estimate + _calibration_months(measured)
+        _, push_runs = plan_metric(push_months, "push_events", cache,
+                                   args.job_per_month)
+        print(f"[INFO] {len(existing)} month(s) cached.")
+        for metric, metric_runs in (("commits", runs), ("push_events", push_runs)):
+            print(f"\n[{metric}]")
+            if args.dry_run:
+                print_plan(metric_runs, dry_run_bytes(backend, metric_runs, metric),
+                           exact=True)
+            else:
+                print_plan(metric_runs, estimate_run_bytes(backend, metric_runs))
+        sys.exit(0)
+
+    if not missing:
+        print("[INFO] All months already fetched. Using existing data.")
+        return
+
+    print(f"[INFO] {len(existing)} month(s) cached. Fetching {len(missing)} new "
+          f"month(s): {len(to_measure)} measured, {len(to_estimate)} estimated.")
+    if args.fetch_granularity != "month":
+        _stream_fetch(args, backend, runs, to_measure, to_estimate, measured)
+        return
+    try:
+        # ---- measured months ----------------------------------------------
+        new_measured = {mo: v for mo, v in cached.items() if v is not None}
+        if runs:
+            new_measured.update(
+                fetch_runs(args.project, runs, metric="commits", **fetch_kwargs)
+            )
+        # Months with no payload.size fall through to the estimated path.
+        to_estimate += [mo for mo in to_measure if mo not in new_measured]
+        measured.update(new_measured)
+
+        # ---- estimated months ---------------------------------------------
+        estimated: dict[str, int] = {}
+        push_events: dict[str, int] = {}
+        if to_estimate:
+            calibration = _calibration_months(measured)
+            stored_push = load_stored("push_events")
+            push_months = [mo for mo in sorted(set(to_estimate + calibration))
+                           if mo not in stored_push]
+            push_cached, push_runs = plan_metric(push_months, "push_events",
+                                                 cache, args.job_per_month)
+            push_events = {mo: v for mo, v in push_cached.items() if v is not None}
+            if push_runs:
+                push_events.update(
+                    fetch_runs(args.project, push_runs, metric="push_events",
+                               **fetch_kwargs)
+                )
+            all_push = {**stored_push, **push_events}
+            ratio = calibrate_ratio({mo: measured[mo] for mo in calibration},
+                                    all_push)
+            print(f"[INFO] Calibrated {ratio:.2f} commits per PushEvent over "
+                  f"{', '.join(calibration)}")
+            estimated = estimate_commits(
+                {mo: all_push[mo] for mo in to_estimate if mo in all_push},
+                ratio,
+            )
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+    write_metric(new_measured, "commits", "measured", backend.name)
+    write_metric(estimated, "commits", "estimated", backend.name)
+    write_metric(push_events, "push_events", "measured", backend.name)
+    export_csv()
+
+
+def _stream_fetch(args, backend, runs: list[tuple[str, str]],
+                  to_measure: list[str], to_estimate: list[str],
+                  measured: dict[str, int]) -> None:
+    """
+    _fetch with --fetch-granularity day or hour: every run's rows are
+    streamed into the store at that granularity, then months that came back
+    without payload.size are estimated from PushEvent counts at the same
+    granularity. The ratio is calibrated per month on the monthly totals
+    (stored or rolled up), or, for a month not complete yet, on the periods
+    where both commits and PushEvents were measured.
+    """
+    from fetch_bigquery import (
+        CALIBRATION_MONTHS, calibrate_ratio, estimate_commits, plan_metric,
+        stream_runs,
+    )
+    from rollup import load_metric, load_provenance
+    from store import (
+        export_csv, load_metric as load_stored, load_provenance as load_stored_provenance,
+        write_metric,
+    )
+
+    granularity = args.fetch_granularity
+    stream_kwargs = dict(max_concurrent_jobs=args.max_concurrent_jobs,
+                         max_bytes_billed=args.max_bytes_billed, backend=backend,
+                         granularity=granularity)
+    try:
+        if runs:
+            stream_runs(args.project, runs, metric="commits", **stream_kwargs)
+        sources = load_stored_provenance("commits", granularity)
+        rows = {p: v for p, v in load_stored("commits", granularity).items()
+                if sources.get(p) == "measured"}
+        # Months with no payload.size fall through to the estimated path;
+        # a month with any measured rows (say, one not complete yet) is
+        # never estimated over them.
+        returned = {p[:7] for p in rows}
+        to_estimate = [mo for mo in sorted(set(to_estimate + to_measure))
+                       if mo not in returned]
+        if not to_estimate:
+            export_csv()
+            return
+
+        monthly_sources = load_provenance("commits")
+        measured.update({mo: v for mo, v in load_metric("commits").items()
+                         if monthly_sources.get(mo) == "measured"})
+        calibration = sorted(set(measured) | returned)[-CALIBRATION_MONTHS:]
+        have_push = (set(load_metric("push_events")) |
+                     {p[:7] for p in load_stored("push_events", granularity)})
+        push_months = [mo for mo in sorted(set(to_estimate + calibration))
+                       if mo not in have_push]
+        _, push_runs = plan_metric(push_months, "push_events", None, args.job_per_month)
+        if push_runs:
+            stream_runs(args.project, push_runs, metric="push_events", **stream_kwargs)
+
+        push_rows = load_stored("push_events", granularity)
+        push_monthly = load_metric("push_events")
+        commit_totals, push_totals = {}, {}
+        for mo in calibration:
+            if mo in measured and mo in push_monthly:
+                commit_totals[mo], push_totals[mo] = measured[mo], push_monthly[mo]
+                continue
+            overlap = [p for p in rows if p[:7] == mo and p in push_rows]
+            if overlap:
+                commit_totals[mo] = sum(rows[p] for p in overlap)
+                push_totals[mo] = sum(push_rows[p] for p in overlap)
+        ratio = calibrate_ratio(commit_totals, push_totals)
+        print(f"[INFO] Calibrated {ratio:.2f} commits per PushEvent over "
+              f"{', '.join(sorted(commit_totals))}")
+        estimated = estimate_commits(
+            {p: v for p, v in push_rows.items() if p[:7] in to_estimate}, ratio,
+        )
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+    write_metric(estimated, "commits", "estimated", backend.name, granularity)
+    export_csv()
+
+
+def _fetch_event_windows(args, scanned: Optional[set[str]] = None) -> None:
+    """
+    _fetch with --event-windows N: daily commits for the days within ±N of
+    each LLM release in --start … --end, streamed into the store's day
+    partition. Overlapping windows merge into one run each, and only those
+    days' githubarchive.day.* tables are scanned. Days already stored are
+    skipped.
+
+    Days from --estimate-from on, or that came back without payload.size,
+    are estimated from their PushEvent counts, scaled by a ratio calibrated
+    on the window days where both were measured. Days in scanned were
+    already measured by _fetch_overlays and are not queried again.
+    """
+    from backends import get_backend
+    from fetch_bigquery import (
+        calibrate_ratio, dry_run_bytes, estimate_commits, estimate_run_bytes,
+        event_days, month_range, plan_runs, print_plan, stream_runs,
+    )
+    from rollup import load_metric as load_monthly, load_provenance as monthly_provenance
+    from store import export_csv, load_metric, load_provenance, write_metric
+
+    def export_if_months_changed() -> None:
+        # Window days rarely complete a month, so the CSV seldom changes
+        if (load_monthly("commits"), monthly_provenance("commits")) != months_before:
+            export_csv()
+
+    days = event_days(args.start, args.end, args.event_windows)
+    stored = load_metric("commits", "day", args.start, args.end)
+    missing = [day for day in days if day not in stored]
+    to_measure = [day for day in missing
+                  if day[:7] < args.estimate_from and day not in (scanned or set())]
+    try:
+        backend = get_backend(args.backend, args.project,
+                              Path(args.archive_dir or args.shard_dir))
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+    n_days = sum(calendar.monthrange(int(mo[:4]), int(mo[5:7]))[1]
+                 for mo in month_range(args.start, args.end))
+    print(f"[INFO] {len(plan_runs(days))} window(s) of ±{args.event_windows} day(s) "
+          f"around LLM releases: {len(days)} of {n_days} day(s), "
+          f"{len(days) - len(missing)} already stored.")
+    runs = plan_runs(to_measure)
+    have_push = load_metric("push_events", "day", args.start, args.end)
+
+    if args.plan or args.dry_run:
+        print(f"[INFO] Dataset: {backend.dataset_for(days[0]) if days else backend.dataset}")
+        push_runs = plan_runs([day for day in days if day not in have_push])
+        for metric, metric_runs in (("commits", runs), ("push_events", push_runs)):
+            print(f"\n[{metric}]")
+            if args.dry_run:
+                print_plan(metric_runs, dry_run_bytes(backend, metric_runs, metric),
+                           exact=True)
+            else:
+                print_plan(metric_runs, estimate_run_bytes(backend, metric_runs))
+        sys.exit(0)
+
+    if not missing:
+        print("[INFO] All window days already fetched. Using existing data.")
+        return
+
+    months_before = (load_monthly("commits"), monthly_provenance("commits"))
+    stream_kwargs = dict(max_concurrent_jobs=args.max_concurrent_jobs,
+                         max_bytes_billed=args.max_bytes_billed, backend=backend,
+                         granularity="day")
+    try:
+        if runs:
+            stream_runs(args.project, runs, metric="commits", **stream_kwargs)
+        sources = load_provenance("commits", "day")
+        measured = {day: v for day, v in load_metric("commits", "day").items()
+                    if sources.get(day) == "measured" and day in days}
+        # Days with no payload.size fall through to the estimated path.
+        to_estimate = [day for day in missing if day not in measured]
+        if not to_estimate:
+            export_if_months_changed()
+            return
+
+        # PushEvents for every window day: the estimated days and the
+        # measured ones the ratio is calibrated on.
+        push_runs = plan_runs([day for day in days if day not in have_push])
+        if push_runs:
+            stream_runs(args.project, push_runs, metric="push_events", **stream_kwargs)
+        push_events = load_metric("push_events", "day", args.start, args.end)
+        commit_totals: dict[str, int] = {}
+        push_totals: dict[str, int] = {}
+        for day in measured:
+            if day in push_events:
+                commit_totals[day[:7]] = commit_totals.get(day[:7], 0) + measured[day]
+                push_totals[day[:7]] = push_totals.get(day[:7], 0) + push_events[day]
+        ratio = calibrate_ratio(commit_totals, push_totals)
+        print(f"[INFO] Calibrated {ratio:.2f} commits per PushEvent on window days")
+        estimated = estimate_commits(
+            {day: push_events[day] for day in to_estimate if day in push_events}, ratio,
+        )
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+    write_metric(estimated, "commits", "estimated", backend.name, "day")
+    export_if_months_changed()
+
+
+def _fetch_overlays(args) -> set[str]:
+    """
+    Fetch the --overlay metrics the store lacks for the range being fetched,
+    together with the main series, all of them in one scan per run: the
+    query computes every metric in one pass (a COUNTIF per event type, SUMs
+    of push sizes), so the run costs the bytes of the widest metric rather
+    than one scan each. Rows are streamed into the store at
+    --fetch-granularity, or by day for --event-windows. With --plan /
+    --dry-run, only the plan is printed.
+
+    Payload sums (commits, distinct_commits) are only measured before
+    --estimate-from; from then on only the event counts are fetched, with
+    push_events for the commit estimate. push_events is also fetched for
+    the calibration periods before the cutoff.
+
+    Returns the periods (months, or days with --event-windows) commits was
+    measured for, which _fetch and _fetch_event_windows then skip.
+    """
+    from backends import METRICS, get_backend
+    from fetch_bigquery import (
+        CALIBRATION_MONTHS, dry_run_bytes, estimate_run_bytes, event_days,
+        month_range, plan_runs, print_plan, stream_runs,
+    )
+    from store import load_metric
+
+    if "commits" in args.overlay:
+        print("[ERROR] commits is the main series; it can't also be an overlay.",
+              file=sys.stderr)
+        sys.exit(1)
+    unknown = [metric for metric in args.overlay if metric not in METRICS]
+    if unknown:
+        print(f"[ERROR] Unknown overlay metric(s): {', '.join(unknown)}. "
+              f"Expected any of {', '.join(sorted(set(METRICS) - {'commits'}))}.",
+              file=sys.stderr)
+        sys.exit(1)
+    try:
+        backend = get_backend(args.backend, args.project,
+                              Path(args.archive_dir or args.shard_dir))
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.event_windows is not None:
+        granularity = "day"
+        periods = event_days(args.start, args.end, args.event_windows)
+    else:
+        granularity = args.fetch_granularity
+        periods = month_range(args.start, args.end)
+    before = [p for p in periods if p[:7] < args.estimate_from]
+    after = [p for p in periods if p[:7] >= args.estimate_from]
+    # Periods each metric is wanted for; a run is only planned over periods
+    # where some wanted metric isn't stored yet
+    wanted = {metric: set(periods if METRICS[metric][1] is None else before)
+              for metric in args.overlay}
+    wanted["commits"] = set(before)
+    if after:
+        # Every window day calibrates; otherwise the latest months do
+        latest = sorted({p[:7] for p in before})[-CALIBRATION_MONTHS:]
+        calibration = {p for p in before
+                       if args.event_windows is not None or p[:7] in latest}
+        wanted["push_events"] = wanted.get("push_events", set()) | set(after) | calibration
+    width = len(periods[0]) if periods else 0
+    stored = {metric: {period[:width] for period in load_metric(metric, granularity,
+                                                                args.start, args.end)}
+              for metric in wanted}
+    sums = [metric for metric in wanted if METRICS[metric][1] is not None]
+    counts = [metric for metric in wanted if METRICS[metric][1] is None]
+
+    # (metrics, runs): every metric before --estimate-from, counts after
+    jobs = []
+    for metrics, span in ((sums + counts, before), (counts, after)):
+        runs = plan_runs([period for period in span
+                          if any(period in wanted[metric] and period not in stored[metric]
+                                 for metric in metrics)])
+        if metrics and runs:
+            jobs.append((metrics, runs))
+
+    if args.plan or args.dry_run:
+        for metrics, runs in jobs or [(list(wanted), [])]:
+            print(f"\n[{', '.join(metrics)}]")
+            if args.dry_run:
+                print_plan(runs, dry_run_bytes(backend, runs, metrics), exact=True)
+            else:
+                print_plan(runs, estimate_run_bytes(backend, runs))
+        sys.exit(0)
+    if not jobs:
+        print(f"[INFO] Overlays already fetched: {', '.join(args.overlay)}")
+        return set()
+    try:
+        for metrics, runs in jobs:
+            stream_runs(args.project, runs, metric=metrics,
+                        max_concurrent_jobs=args.max_concurrent_jobs,
+                        max_bytes_billed=args.max_bytes_billed, backend=backend,
+                        granularity=granularity)
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+    measured = {period for metrics, runs in jobs if "commits" in metrics
+                for start, end in runs for period in before if start <= period <= end}
+    return measured if args.event_windows is not None else {p[:7] for p in measured}
+
+
+def _ingest_local(args) -> None:
+    """
+    Bring the store's hourly commits up to date from local archive files.
+
+    With the ingest manifest (the default) every month in range is
+    re-aggregated from per-file checkpoints, so only new or changed hourly
+    files are read and any hour whose inputs changed is updated. With
+    --no-cache only months missing from the store are ingested, from scratch.
+    Days, weeks and months are rolled up from the hours (see rollup.py).
+    """
+    from fetch_bigquery import month_range
+    from ingest_local import IngestManifest, ingest
+    from rollup import incomplete_days, load_metric
+    from store import export_csv, load_metric as load_stored, write_metric
+
+    existing = load_metric("commits")
+    all_months = month_range(args.start, args.end)
+    if args.no_cache:
+        months = [mo for mo in all_months if mo not in existing]
+        manifest = None
+    else:
+        months = all_months
+        manifest = IngestManifest()
+    if not months:
+        print("[INFO] All months already ingested. Using existing data.")
+        return
+
+    print(f"[INFO] {len(existing)} month(s) cached. "
+          f"Ingesting {len(months)} month(s) from {args.archive_dir}")
+    try:
+        new_totals = ingest(Path(args.archive_dir), months[0], months[-1],
+                            args.workers, months=set(months),
+                            verify_every=args.verify_every, manifest=manifest)
+    except (OSError, ValueError) as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+
+    existing_hours = load_stored("commits", "hour", months[0], months[-1])
+    changed = {h: v for h, v in new_totals.items() if existing_hours.get(h) != v}
+    if changed:
+        changed_months = sorted({h[:7] for h in changed})
+        print(f"[INFO] Updating {len(changed)} hour(s) in {', '.join(changed_months)}")
+        write_metric(changed, "commits", "measured", "local", "hour")
+    else:
+        print("[INFO] No hour changed. Using existing data.")
+
+    short = incomplete_days("commits", months[0], months[-1])
+    if short:
+        listed = ", ".join(f"{day} ({n}/{expected} h)"
+                           for day, (n, expected) in sorted(short.items())[:10])
+        more = f" and {len(short) - 10} more" if len(short) > 10 else ""
+        print(f"[INFO] {len(short)} day(s) have hours missing from {args.archive_dir}: "
+              f"{listed}{more}. They, and the weeks and months summed from them, "
+              f"are marked estimated.")
+    if changed:
+        export_csv()
+
+
+def _aggregate_shards(args) -> None:
+    """Bring the store's monthly commits up to date from monthly Parquet shards."""
+    from shards import aggregate_monthly
+    from store import export_csv, load_metric, write_metric
+
+    shard_dir = Path(args.shard_dir)
+    if not shard_dir.is_dir():
+        print(f"[ERROR] Shard directory not found: {shard_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    existing = load_metric("commits")
+    new_totals = aggregate_monthly(shard_dir, args.start, args.end)
+
+    changed = {mo: v for mo, v in new_totals.items() if existing.get(mo) != v}
+    if not changed:
+        print("[INFO] No month changed. Using existing data.")
+        return
+    print(f"[INFO] Updating {len(changed)} month(s) from {args.shard_dir}")
+    write_metric(changed, "commits", "measured", "shards")
+    export_csv()
+
+
 def main():
     args = _parse_args()
+    store_dir = Path("data/store")
     csv_path = Path("data/monthly_commits.csv")
 
     # ------------------------------------------------------------------
-    # Step 1: Fetch via BigQuery
+    # Step 1: Fetch via BigQuery or a local GH Archive mirror into the
+    #         columnar store (data/store), exporting the CSV alongside
     # ------------------------------------------------------------------
-    if not args.no_fetch:
-        if not args.project:
-            print(
-                "[ERROR] --project is required for BigQuery fetch.\n"
-                "        Find yours at: https://console.cloud.google.com/\n"
-                "        Or skip fetch with --no-fetch if data already exists.",
-                file=sys.stderr,
-            )
-            sys.exit(1)
+    from build_cache import BuildCache
+    from store import ensure_seeded, has_data
+    ensure_seeded(csv_path, store_dir)
+    cache = BuildCache(force=args.force, explain=args.explain)
 
-        from fetch_bigquery import fetch, load_existing_csv, save_csv
-
-        # Only fetch months not already in the CSV
-        existing = load_existing_csv()
-        all_months = []
-        y, m = int(args.start[:4]), int(args.start[5:7])
-        ey, em = int(args.end[:4]), int(args.end[5:7])
-        while (y, m) <= (ey, em):
-            all_months.append(f"{y:04d}-{m:02d}")
-            m += 1
-            if m > 12:
-                m = 1
-                y += 1
-
-        missing = [mo for mo in all_months if mo not in existing]
-        if not missing:
-            print("[INFO] All months already fetched. Using existing data.")
-        else:
-            # BigQuery BETWEEN fetches all months in the range, including
-            # ones already cached. existing.update() deduplicates by
-            # overwriting with fresh values, so this is safe but may
-            # scan more data than strictly necessary.
-            fetch_start, fetch_end = missing[0], missing[-1]
-            print(f"[INFO] {len(existing)} month(s) cached. "
-                  f"Fetching {len(missing)} new month(s): {fetch_start} → {fetch_end}")
-            new_totals = fetch(args.project, fetch_start, fetch_end)
-            existing.update(new_totals)
-            save_csv(existing)
-    else:
-        if not csv_path.exists():
+    if args.no_fetch:
+        if not has_data(None, store_dir):
             print(
-                f"[ERROR] No data file found at '{csv_path}'.\n"
+                f"[ERROR] No data found in '{store_dir}' or '{csv_path}'.\n"
                 "        Run without --no-fetch to query BigQuery first.",
                 file=sys.stderr,
             )
             sys.exit(1)
-        print(f"[INFO] Using existing data: {csv_path}")
+        cache.note("fetch", "skipped: --no-fetch")
+        print(f"[INFO] Using existing data: {store_dir}")
+    elif args.source == "local" and not args.archive_dir:
+        print("[ERROR] --archive-dir is required with --source local.",
+              file=sys.stderr)
+        sys.exit(1)
+    elif args.event_windows is not None and (args.source != "bigquery"
+                                             or args.event_windows < 0):
+        print("[ERROR] --event-windows takes N >= 0 days and needs --source bigquery.",
+              file=sys.stderr)
+        sys.exit(1)
+    elif args.source == "bigquery" and args.backend == "bigquery" and not args.project:
+        print(
+            "[ERROR] --project is required for BigQuery fetch.\n"
+            "        Find yours at: https://console.cloud.google.com/\n"
+            "        Or skip fetch with --no-fetch if data already exists.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    else:
+        fetch_inputs = _fetch_inputs(args)
+        # --plan / --dry-run only report and exit, so they always run
+        if args.plan or args.dry_run:
+            cache.note("fetch", "ran: --plan / --dry-run")
+            fresh = False
+        elif not has_data(None, store_dir):
+            cache.note("fetch", "ran: the store is empty")
+            fresh = False
+        else:
+            fresh = cache.fresh("fetch", fetch_inputs)
+        if fresh:
+            print(f"[INFO] Fetch inputs unchanged; using existing data: {store_dir}")
+        else:
+            if args.source == "local":
+                _ingest_local(args)
+            elif args.source == "shards":
+                _aggregate_shards(args)
+            else:
+                scanned = _fetch_overlays(args) if args.overlay else set()
+                if args.event_windows is not None:
+                    _fetch_event_windows(args, scanned)
+                else:
+                    _fetch(args, scanned)
+            cache.record("fetch", fetch_inputs)
 
     # ------------------------------------------------------------------
-    # Step 2: Visualize
+    # Step 2: Load, cap, select events and render — each stage skipped
+    #         when its inputs are unchanged since the last run
     # ------------------------------------------------------------------
-    from visualize import load_commits, plot
-    from llm_events import get_events_in_range
+    _visualize(args, store_dir, cache)
 
-    df = load_commits(csv_path, args.plot_start, args.plot_end)
 
-    if df.empty:
-        print("[ERROR] No commit data in the requested plot range.", file=sys.stderr)
-        sys.exit(1)
+def _fetch_inputs(args) -> dict[str, str]:
+    """What the fetch stage depends on, as build-cache digests."""
+    from build_cache import digest, tree_digest
+
+    inputs = {"args": digest(args.source, args.backend, args.project, args.start,
+                             args.end, args.estimate_from, args.archive_dir,
+                             args.shard_dir, args.fetch_granularity,
+                             args.event_windows, args.overlay)}
+    if args.event_windows is not None:
+        from llm_events import LLM_RELEASES
+        inputs["events"] = digest(LLM_RELEASES)
+    if args.source == "local" or (args.backend == "duckdb" and args.archive_dir):
+        inputs["sources"] = tree_digest(Path(args.archive_dir), "*.json.gz")
+    elif args.source == "shards" or args.backend == "duckdb":
+        inputs["sources"] = tree_digest(Path(args.shard_dir))
+    else:
+        # Closed months never change upstream; a range that reaches the open
+        # month goes stale on the same schedule as the result cache.
+        from result_cache import OPEN_MONTH_TTL
+        open_month = datetime.now(timezone.utc).strftime("%Y-%m")
+        inputs["sources"] = digest(
+            int(time.time() // OPEN_MONTH_TTL) if args.end >= open_month else "closed"
+        )
+    return inputs
+
 
-    start_date = df["date"].min().date()
-    end_date   = df["date"].max().date()
-    events     = get_events_in_range(start_date, end_date)
+def _visualize(args, store_dir: Path, cache) -> None:
+    """
+    Load, cap, select events and render, skipping every stage whose inputs
+    are unchanged. Frames are only read back from data/build/ when a later
+    stage actually runs, so a full cache hit never imports pandas,
+    matplotlib or visualize.
+    """
+    import importlib.util
+    from datetime import date
 
-    print(f"\nPlotting {len(df)} months  |  {len(events)} LLM events")
+    from build_cache import (
+        BUILD_DIR, digest, frame_digest, function_digest, read_frame,
+        source_digest, tree_digest, write_frame,
+    )
+    from llm_events import LLM_RELEASES, ORG_COLORS
 
+    visualize_py = Path(importlib.util.find_spec("visualize").origin)
+    frame_path  = BUILD_DIR / "frame.parquet"
+    capped_path = BUILD_DIR / "capped.parquet"
+    events_path = BUILD_DIR / "events.json"
+    df = None
+
+    # ---- load ----------------------------------------------------------
+    # Every granularity's rows, since coarser series are rolled up from finer
+    load_inputs = {
+        "data rows": tree_digest(store_dir),
+        "args":      digest(args.plot_start, args.plot_end, args.granularity),
+    }
+    if not cache.fresh("load", load_inputs, frame_path):
+        from visualize import load_commits
+        try:
+            df = load_commits(store_dir, args.plot_start, args.plot_end,
+                              args.granularity, cap=False)
+        except ValueError as exc:
+            print(f"[ERROR] {exc}", file=sys.stderr)
+            sys.exit(1)
+        if df.empty:
+            print("[ERROR] No commit data in the requested plot range.", file=sys.stderr)
+            sys.exit(1)
+        write_frame(df, frame_path)
+        cache.record("load", load_inputs, frame_path, frame_digest(df))
+
+    # ---- capping -------------------------------------------------------
+    cap_inputs = {
+        "frame": cache.output("load"),
+        "args":  digest(args.outlier_window, args.granularity),
+        "code":  digest(function_digest(visualize_py, "cap_outliers"),
+                        function_digest(visualize_py, "_runs"),
+                        source_digest(visualize_py.with_name("outliers.py"))),
+    }
+    if args.verify_capping:
+        cache.note("capping", "ran: --verify-capping")
+    if args.verify_capping or not cache.fresh("capping", cap_inputs, capped_path):
+        from visualize import cap_outliers, capping_state_path
+        if df is None:
+            df = read_frame(frame_path)
+        state_path = (capping_state_path(store_dir, granularity=args.granularity)
+                      if args.outlier_window else None)
+        try:
+            df = cap_outliers(df, window=args.outlier_window, state_path=state_path,
+                              verify=args.verify_capping, granularity=args.granularity)
+        except ValueError as exc:
+            print(f"[ERROR] {exc}", file=sys.stderr)
+            sys.exit(1)
+        write_frame(df, capped_path)
+        cache.record("capping", cap_inputs, capped_path, frame_digest(df))
+    else:
+        df = None   # the uncapped frame, if loaded, is superseded
+
+    # ---- events --------------------------------------------------------
+    # The date range comes from the capped frame, so its digest stands in
+    # for the range without reading the frame back.
+    events_inputs = {
+        "releases": digest(LLM_RELEASES, ORG_COLORS),
+        "frame":    cache.output("capping"),
+    }
+    events = None
+    if not cache.fresh("events", events_inputs, events_path):
+        from llm_events import get_events_in_range
+        if df is None:
+            df = read_frame(capped_path)
+        events = get_events_in_range(df["date"].min().date(), df["date"].max().date())
+        events_path.write_text(json.dumps(events, default=str))
+        cache.record("events", events_inputs, events_path, digest(events))
+
+    # ---- render --------------------------------------------------------
     out_path = Path(args.out) if args.out else None
-    plot(df, events, output_path=out_path)
+    render_inputs = {
+        "frame":  cache.output("capping"),
+        "events": cache.output("events"),
+        "style":  source_digest(visualize_py, visualize_py.with_name("labels.py")),
+        "args":   digest(args.out, args.granularity, args.overlay),
+    }
+    if args.overlay:
+        render_inputs["overlay rows"] = load_inputs["data rows"]
+    if out_path is None:
+        cache.note("render", "ran: interactive display is never cached")
+    elif cache.fresh("render", render_inputs, out_path):
+        print(f"\n[INFO] {out_path} is up to date (use --force to re-render)")
+        return
+
+    from visualize import load_overlays, plot
+    if df is None:
+        df = read_frame(capped_path)
+    overlays = None
+    if args.overlay:
+        try:
+            overlays = load_overlays(store_dir, args.overlay, args.plot_start,
+                                     args.plot_end, args.granularity)
+        except ValueError as exc:
+            print(f"[ERROR] {exc}", file=sys.stderr)
+            sys.exit(1)
+    if events is None:
+        events = [{**ev, "date": date.fromisoformat(ev["date"])}
+                  for ev in json.loads(events_path.read_text())]
+
+    print(f"\nPlotting {len(df)} {args.granularity}(s)  |  {len(events)} LLM events")
+    plot(df, events, output_path=out_path, granularity=args.granularity,
+         overlays=overlays)
+    if out_path is not None:
+        cache.record("render", render_inputs, out_path)
 
 
 if __name__ == "__main__":
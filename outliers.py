@@ -0,0 +1,266 @@
+"""
+outliers.py
+-----------
+Streaming robust outlier scores over a sliding window.
+
+cap_outliers in visualize.py originally computed one median/MAD over the
+whole series. On a series that doubles over three years that flags the
+trend, not the spikes. RollingRobustZ instead keeps the last `window`
+values in a sorted container and scores each new point against them with
+the modified Z-score (Iglewicz & Hoaglin):
+
+    z = 0.6745 * (x - median) / (MAD + 1)
+
+Each push is O(log w) to update the window. The median is one indexed
+lookup, itself O(log w) on a SortedList. The MAD (median of
+|x_i - median|) is found in O(log² w) without materialising the
+deviations: the deviations left and right of the median form two sorted
+sequences, and the k-th smallest of two sorted sequences is a binary
+search of O(log w) steps, each an O(log w) indexed lookup. A series of n
+points costs O(n log² w) and can be fed one point at a time as new data
+arrives.
+
+CappingState persists the scores, flags and capped values next to the
+store, so appending a month re-scores only the new points and
+re-interpolates only from the last unflagged point before them.
+"""
+
+import json
+import os
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sortedcontainers import SortedList
+
+MODIFIED_Z_SCALE = 0.6745
+
+
+def _kth_of_two(left, n_left: int, right, n_right: int, k: int) -> float:
+    """
+    k-th smallest (0-based) of two ascending sequences given as index
+    functions, by binary search over how many items come from `left`.
+    Makes O(log k) calls to left/right.
+    """
+    lo, hi = max(0, k + 1 - n_right), min(k + 1, n_left)
+    while lo < hi:
+        i = (lo + hi) // 2
+        if left(i) < right(k - i):
+            lo = i + 1
+        else:
+            hi = i
+    i, j = lo, k + 1 - lo
+    candidates = []
+    if i > 0:
+        candidates.append(left(i - 1))
+    if j > 0:
+        candidates.append(right(j - 1))
+    return max(candidates)
+
+
+class RollingRobustZ:
+    """
+    Trailing-window median, MAD and modified Z-score, fed one value at a time.
+
+    Args:
+        window:      Number of most recent values (including the new one)
+                     the statistics are computed over.
+        min_periods: Values needed before a score is produced; earlier
+                     pushes return None.
+    """
+
+    def __init__(self, window: int, min_periods: Optional[int] = None):
+        if window < 1:
+            raise ValueError(f"window must be >= 1, got {window}")
+        self.window = window
+        self.min_periods = min_periods if min_periods is not None else max(3, window // 2)
+        self._fifo: deque = deque()
+        self._sorted = SortedList()
+
+    def __len__(self) -> int:
+        return len(self._fifo)
+
+    def values(self) -> list[float]:
+        """Current window contents, oldest first."""
+        return list(self._fifo)
+
+    def median(self) -> float:
+        s, n = self._sorted, len(self._sorted)
+        mid = n // 2
+        return s[mid] if n % 2 else (s[mid - 1] + s[mid]) / 2
+
+    def mad(self) -> float:
+        """Median absolute deviation from the window median, in O(log² w)."""
+        s, n = self._sorted, len(self._sorted)
+        m = self.median()
+        p = s.bisect_left(m)
+        # Deviations below the median, ascending: m - s[p-1], m - s[p-2], …
+        # Deviations at/above the median, ascending: s[p] - m, s[p+1] - m, …
+        left = lambda i: m - s[p - 1 - i]          # noqa: E731
+        right = lambda j: s[p + j] - m             # noqa: E731
+        mid = n // 2
+        upper = _kth_of_two(left, p, right, n - p, mid)
+        if n % 2:
+            return upper
+        return (_kth_of_two(left, p, right, n - p, mid - 1) + upper) / 2
+
+    def push(self, x: float) -> Optional[float]:
+        """Add x to the window and return its modified Z-score (or None)."""
+        self._fifo.append(x)
+        self._sorted.add(x)
+        if len(self._fifo) > self.window:
+            self._sorted.remove(self._fifo.popleft())
+        if len(self._fifo) < self.min_periods:
+            return None
+        return MODIFIED_Z_SCALE * (x - self.median()) / (self.mad() + 1)
+
+
+def rolling_modified_z(values: Iterable[float],
+                       window: int,
+                       min_periods: Optional[int] = None) -> list[Optional[float]]:
+    """Modified Z-score of every value against its trailing window."""
+    scorer = RollingRobustZ(window, min_periods)
+    return [scorer.push(x) for x in values]
+
+
+# ---------------------------------------------------------------------------
+# Capping (score → flag → interpolate), full and incremental
+# ---------------------------------------------------------------------------
+
+def interpolate_flagged(values: list[int], flagged: list[bool]) -> list[int]:
+    """
+    Replace flagged values by linear interpolation between their nearest
+    unflagged neighbours (back/forward-filled at the ends), rounded to int.
+
+    Each gap depends only on its two anchors, so interpolating any suffix
+    that starts at an unflagged point gives the same values as interpolating
+    the whole series.
+    """
+    anchors = [i for i, f in enumerate(flagged) if not f]
+    if not anchors:
+        return list(values)
+    out: list[float] = list(values)
+    for i in range(anchors[0]):
+        out[i] = values[anchors[0]]
+    for a, b in zip(anchors, anchors[1:]):
+        for i in range(a + 1, b):
+            out[i] = values[a] + (values[b] - values[a]) * (i - a) / (b - a)
+    for i in range(anchors[-1] + 1, len(values)):
+        out[i] = values[anchors[-1]]
+    return [int(round(v)) for v in out]
+
+
+def cap_series(values: list[int],
+               window: int,
+               z_thresh: float = 3.0,
+               min_periods: Optional[int] = None):
+    """Full recompute: (scores, flagged, capped) for a whole series."""
+    scores = rolling_modified_z(values, window, min_periods)
+    flagged = [z is not None and abs(z) > z_thresh for z in scores]
+    return scores, flagged, interpolate_flagged(values, flagged)
+
+
+class CappingState:
+    """
+    Persisted result of cap_series for one series, so an append only
+    re-evaluates the tail.
+
+    The JSON file holds the parameters, and per point the period, raw value,
+    score, flag and capped value. On update the longest unchanged prefix
+    (same periods, same raw values) is kept:
+
+    * scores before the first changed point are reused; the scorer is
+      re-seeded with the `window` raw values before it, so every new score
+      sees exactly the window a full pass would;
+    * capped values are reused up to the last unflagged point before the
+      change, and interpolation resumes from that anchor.
+
+    Floats round-trip exactly through JSON (repr), and both paths run the
+    same arithmetic, so frozen history is bit-identical to cap_series.
+
+    Args:
+        path:        JSON file the state is kept in.
+        window:      Trailing window, as for RollingRobustZ.
+        z_thresh:    |score| above which a point is capped.
+        min_periods: As for RollingRobustZ.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Path, window: int, z_thresh: float = 3.0,
+                 min_periods: Optional[int] = None):
+        self.path = Path(path)
+        self.window = window
+        self.z_thresh = z_thresh
+        self.min_periods = min_periods if min_periods is not None else max(3, window // 2)
+
+    def _params(self) -> dict:
+        return {"version": self.VERSION, "window": self.window,
+                "z_thresh": self.z_thresh, "min_periods": self.min_periods}
+
+    def load(self) -> Optional[dict]:
+        """Stored state, or None if missing, unreadable or built with other parameters."""
+        try:
+            state = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return None
+        return state if state.get("params") == self._params() else None
+
+    def save(self, periods: list[str], values: list[int], scores, flagged, capped) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(json.dumps({
+            "params":  self._params(),
+            "periods": periods,
+            "values":  values,
+            "scores":  scores,
+            "flagged": flagged,
+            "capped":  capped,
+        }))
+        os.replace(tmp, self.path)
+
+    def update(self, periods: list[str], values: list[int]):
+        """
+        (scores, flagged, capped, first) for the series, recomputing only
+        from index `first` (the first point that is new or changed) and
+        saving the new state.
+        """
+        state = self.load() or dict.fromkeys(
+            ("periods", "values", "scores", "flagged", "capped"), [])
+        first = 0
+        for old_period, old_value, period, value in zip(
+                state["periods"], state["values"], periods, values):
+            if old_period != period or old_value != value:
+                break
+            first += 1
+
+        if first == len(periods) == len(state["periods"]):
+            return state["scores"], state["flagged"], state["capped"], first
+
+        scorer = RollingRobustZ(self.window, self.min_periods)
+        for x in values[max(0, first - self.window):first]:
+            scorer.push(x)
+        scores = state["scores"][:first] + [scorer.push(x) for x in values[first:]]
+        flagged = [z is not None and abs(z) > self.z_thresh for z in scores]
+
+        # Resume interpolation from the last unflagged point before the change
+        anchor = next((i for i in range(first - 1, -1, -1) if not flagged[i]), None)
+        if anchor is None:
+            capped = interpolate_flagged(values, flagged)
+        else:
+            capped = state["capped"][:anchor] + interpolate_flagged(values[anchor:],
+                                                                    flagged[anchor:])
+
+        self.save(periods, values, scores, flagged, capped)
+        return scores, flagged, capped, first
+
+    def verify(self, values: list[int], scores, flagged, capped) -> None:
+        """Raise ValueError unless (scores, flagged, capped) match a full recompute."""
+        full = cap_series(values, self.window, self.z_thresh, self.min_periods)
+        for name, got, want in zip(("score", "flag", "capped value"),
+                                   (scores, flagged, capped), full):
+            diff = [i for i, (a, b) in enumerate(zip(got, want)) if a != b]
+            if diff or len(got) != len(want):
+                raise ValueError(f"Incremental capping diverged from a full recompute: "
+                                 f"{len(diff)} {name}(s) differ, first at index "
+                                 f"{diff[0] if diff else min(len(got), len(want))}.")
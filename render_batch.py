@@ -0,0 +1,205 @@
+"""
+render_batch.py
+---------------
+Render many chart variants in one go: per-org event sets, different date
+windows, web and print sizes.
+
+Running main.py once per variant reloads the store, re-runs cap_outliers
+and re-imports pandas and matplotlib every time. Here the series is loaded
+and cleaned once, then rendering fans out over a process pool. Each worker
+receives the cleaned frame once, when it starts, and renders a throwaway
+chart so matplotlib's font cache and the label measurements are warm before
+the first real variant arrives.
+
+Outliers are capped once over the whole stored series and each variant
+plots a slice of it, so with the global MAD a variant's capped months can
+differ from a single main.py run over the same window.
+
+Spec file (JSON):
+    {
+      "outlier_window": 12,
+      "defaults": {"dpi": 150},
+      "variants": [
+        {"name": "all",    "out": "charts/all.png"},
+        {"name": "openai", "out": "charts/openai.png", "orgs": ["OpenAI"]},
+        {"name": "2024",   "out": "charts/2024.png", "start": "2024-01", "end": "2024-12"},
+        {"name": "web",    "out": "charts/web.png", "figsize": [12, 5.4], "dpi": 100}
+      ]
+    }
+
+outlier_window (as in main.py) and defaults (merged into every variant) are
+optional. Variant keys: out (required), name, start, end (YYYY-MM), orgs,
+figsize (inches), dpi.
+
+Usage:
+    python render_batch.py charts.json
+    python render_batch.py charts.json --workers 8 --store data/store
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import textwrap
+import time
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_STORE = Path("data/store")
+VARIANT_KEYS  = {"name", "out", "start", "end", "orgs", "figsize", "dpi"}
+
+# Per-worker state, set once by _warm_worker
+_FRAME = None
+
+
+# ---------------------------------------------------------------------------
+# Spec
+# ---------------------------------------------------------------------------
+
+def load_spec(path: Path) -> tuple[list[dict], Optional[int]]:
+    """(variants with defaults applied, outlier_window) from a spec file."""
+    try:
+        spec = json.loads(path.read_text())
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"Cannot read spec {path}: {exc}") from exc
+
+    defaults = spec.get("defaults", {})
+    variants = []
+    for i, entry in enumerate(spec.get("variants", [])):
+        variant = {**defaults, **entry}
+        unknown = set(variant) - VARIANT_KEYS
+        if unknown:
+            raise ValueError(f"Variant {i}: unknown key(s) {', '.join(sorted(unknown))}.")
+        if "out" not in variant:
+            raise ValueError(f"Variant {i}: 'out' is required.")
+        variant.setdefault("name", Path(variant["out"]).stem)
+        variants.append(variant)
+    if not variants:
+        raise ValueError(f"Spec {path} has no variants.")
+    return variants, spec.get("outlier_window")
+
+
+# ---------------------------------------------------------------------------
+# Workers
+# ---------------------------------------------------------------------------
+
+def _warm_worker(frame) -> None:
+    """Pool initializer: keep the frame and warm matplotlib with a dummy render."""
+    global _FRAME
+    _FRAME = frame
+
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    import visualize
+    from llm_events import get_events_as_dicts
+
+    fig = Figure(figsize=(2, 1))
+    FigureCanvasAgg(fig)
+    fig.add_subplot().set_title("warm-up", fontweight="semibold")
+    fig.savefig(io.BytesIO(), format="png")
+    for ev in get_events_as_dicts():
+        text = textwrap.fill(ev["model"], width=visualize.LABEL_MAX_WIDTH)
+        visualize.measure_label(text, visualize.LABEL_FONTSIZE, "semibold",
+                                visualize.LABEL_ROTATION)
+
+
+def render_variant(variant: dict) -> tuple[str, Optional[str], float, int, int]:
+    """
+    Render one variant from the worker's frame.
+
+    Returns (name, error or None, seconds, periods plotted, events plotted).
+    """
+    import visualize
+    from llm_events import get_events_in_range
+
+    t0 = time.perf_counter()
+    df = _FRAME
+    try:
+        if variant.get("start"):
+            df = df[df["date"] >= visualize._bound(variant["start"], upper=False)]
+        if variant.get("end"):
+            df = df[df["date"] < visualize._bound(variant["end"], upper=True)]
+    except ValueError as exc:
+        return variant["name"], str(exc), time.perf_counter() - t0, 0, 0
+    if df.empty:
+        return variant["name"], "no data in range", time.perf_counter() - t0, 0, 0
+
+    events = get_events_in_range(df["date"].min().date(), df["date"].max().date())
+    if variant.get("orgs"):
+        events = [ev for ev in events if ev["org"] in variant["orgs"]]
+
+    try:
+        visualize.plot(df, events, Path(variant["out"]),
+                       figsize=tuple(variant.get("figsize", visualize.FIGURE_SIZE)),
+                       dpi=variant.get("dpi", visualize.DPI))
+    except (OSError, ValueError) as exc:
+        return variant["name"], str(exc), time.perf_counter() - t0, len(df), len(events)
+    return variant["name"], None, time.perf_counter() - t0, len(df), len(events)
+
+
+# ---------------------------------------------------------------------------
+# Batch
+# ---------------------------------------------------------------------------
+
+def render_batch(variants: list[dict],
+                 store_dir: Path = DEFAULT_STORE,
+                 outlier_window: Optional[int] = None,
+                 workers: Optional[int] = None) -> list[tuple]:
+    """Load and clean the series once, then render every variant in a pool."""
+    from store import has_data
+    from visualize import load_commits
+
+    # Otherwise load_commits would read the missing directory as a CSV
+    if not has_data(None, store_dir):
+        raise ValueError(f"No data found in '{store_dir}'. "
+                         "Run main.py first to fetch it.")
+    t0 = time.perf_counter()
+    frame = load_commits(store_dir, None, None, outlier_window=outlier_window)
+    if frame.empty:
+        raise ValueError(f"No commit data in {store_dir}.")
+    print(f"Loaded {len(frame)} periods in {time.perf_counter() - t0:.2f}s")
+
+    workers = min(workers or os.cpu_count() or 1, len(variants))
+    t0 = time.perf_counter()
+    results = []
+    with Pool(processes=workers, initializer=_warm_worker, initargs=(frame,)) as pool:
+        print(f"Rendering {len(variants)} variant(s) on {workers} worker(s)\n")
+        for name, error, seconds, n_periods, n_events in pool.imap_unordered(render_variant, variants):
+            status = f"[ERROR] {error}" if error else "ok"
+            print(f"  {name:<24} {seconds:>6.2f}s  {n_periods:>4} periods  "
+                  f"{n_events:>4} events  {status}")
+            results.append((name, error, seconds, n_periods, n_events))
+    print(f"\n  {len(variants)} variant(s) in {time.perf_counter() - t0:.2f}s wall, "
+          f"{sum(r[2] for r in results):.2f}s rendering")
+    return results
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Render many chart variants from one data load."
+    )
+    parser.add_argument("spec", help="JSON spec file listing the variants")
+    parser.add_argument("--store", default=str(DEFAULT_STORE),
+                        help=f"Columnar store directory (default: {DEFAULT_STORE})")
+    parser.add_argument("--workers", default=None, type=int,
+                        help="Worker processes (default: all cores, at most one per variant)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    try:
+        variants, outlier_window = load_spec(Path(args.spec))
+        results = render_batch(variants, Path(args.store), outlier_window, args.workers)
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+    if any(error for _, error, *_ in results):
+        sys.exit(1)
@@ -0,0 +1,371 @@
+"""
+render_server.py
+----------------
+Long-running render daemon for dashboards and scripts that need charts
+faster than a cold `main.py` start (imports, font cache, store load)
+allows.
+
+`serve` loads and caps the store once. It keeps that frame in memory and
+starts a pool of warm render workers (render_batch's, with matplotlib,
+visualize and the label measurements already loaded). It then answers
+requests on a Unix domain socket. Before a request, at most once every
+VERSION_CHECK_SECONDS, the store's file listing is compared with the one
+the frame was loaded from. If anything was written or compacted since, the
+frame is reloaded and the workers are restarted with it; renders already
+running finish on the old workers, which then exit. Finished renders are
+kept in a small in-memory cache keyed on the data and the request, so
+repeating a request is answered without rendering again.
+
+Protocol: one JSON object per line each way.
+    {"cmd": "render", "variant": {...render_batch variant...}, "bytes": false}
+        → {"ok": true, "path": "...", "seconds": 0.41, "cached": false}
+        → {"ok": true, "png": "<base64>", ...}                  with "bytes": true
+        A relative variant "out" is resolved against the server's cwd.
+    {"cmd": "series", "start": "2024-01", "end": "2024-12"}
+        → {"ok": true, "periods": [...], "commits": [...], "estimated": [...], "is_outlier": [...]}
+    {"cmd": "stats"}      → data version, periods, workers, requests, cache hits
+    {"cmd": "shutdown"}
+
+Usage:
+    python render_server.py serve --workers 4 &
+    python render_server.py render --out charts/2024.png --start 2024-01 --end 2024-12
+    python render_server.py render --out - --orgs OpenAI Anthropic > chart.png
+    python render_server.py series --start 2025-01
+    python render_server.py stats
+    python render_server.py shutdown
+"""
+
+import argparse
+import base64
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from arguments import validate_period
+
+DEFAULT_SOCKET = Path("data/render.sock")
+DEFAULT_STORE  = Path("data/store")
+RESULT_CACHE_SIZE = 64          # finished renders kept in memory
+VERSION_CHECK_SECONDS = 1.0     # how stale the store listing may be
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+class RenderService:
+    """
+    The memory-resident frame, its worker pool and the render cache.
+
+    Args:
+        store_dir:      Columnar store to load from.
+        workers:        Render worker processes.
+        outlier_window: As main.py --outlier-window.
+    """
+
+    def __init__(self, store_dir: Path = DEFAULT_STORE, workers: int = 2,
+                 outlier_window: Optional[int] = None):
+        self.store_dir = store_dir
+        self.workers = workers
+        self.outlier_window = outlier_window
+        self.frame = None
+        self.version = None
+        self.loaded_at = None
+        self.requests = 0
+        self.cache_hits = 0
+        self._pool = None
+        self._pool_users: dict = {}     # pool → renders running on it
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._results: OrderedDict = OrderedDict()
+        self._tmp = tempfile.TemporaryDirectory(prefix="render-server-")
+
+    def _store_version(self) -> str:
+        from build_cache import tree_digest
+        return tree_digest(self.store_dir)
+
+    def _retire(self, pool) -> None:
+        """Close and join a replaced pool once no render is using it; call locked."""
+        if self._pool_users.get(pool):
+            return
+        self._pool_users.pop(pool, None)
+
+        def shut_down():
+            pool.close()
+            pool.join()
+        threading.Thread(target=shut_down, daemon=True).start()
+
+    def refresh(self) -> bool:
+        """Reload the frame and restart the workers if the store changed."""
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < VERSION_CHECK_SECONDS:
+            return False
+        self._checked_at = now
+        version = self._store_version()
+        with self._lock:
+            if version == self.version:
+                return False
+            from multiprocessing import Pool
+
+            from render_batch import _warm_worker
+            from visualize import load_commits
+
+            t0 = time.perf_counter()
+            frame = load_commits(self.store_dir, None, None,
+                                 outlier_window=self.outlier_window)
+            pool = Pool(processes=self.workers, initializer=_warm_worker,
+                        initargs=(frame,))
+            old, self._pool = self._pool, pool
+            if old is not None:
+                self._retire(old)       # in-flight renders finish on the old data
+            self.frame, self.version = frame, version
+            self.loaded_at = time.time()
+            self._results.clear()
+            print(f"[INFO] Loaded {len(frame)} periods from {self.store_dir} "
+                  f"({time.perf_counter() - t0:.2f}s), {self.workers} warm worker(s)")
+            return True
+
+    def render(self, variant: dict, as_bytes: bool) -> dict:
+        from render_batch import render_variant
+
+        if not as_bytes and not variant.get("out"):
+            return {"ok": False, "error": "variant needs 'out' unless bytes are requested"}
+        with self._lock:
+            key = json.dumps([self.version, variant, as_bytes], sort_keys=True)
+            hit = self._results.get(key)
+            if hit is not None and ("path" not in hit or Path(hit["path"]).exists()):
+                self._results.move_to_end(key)
+                self.cache_hits += 1
+                return {**self._results[key], "cached": True}
+            # Held until the render returns, so a refresh can't close it under us
+            pool = self._pool
+            self._pool_users[pool] = self._pool_users.get(pool, 0) + 1
+
+        variant = dict(variant)
+        variant.setdefault("name", "render")
+        if as_bytes:
+            variant["out"] = str(Path(self._tmp.name) / f"{time.time_ns()}.png")
+        try:
+            name, error, seconds, n_periods, n_events = pool.apply(render_variant, (variant,))
+        finally:
+            with self._lock:
+                self._pool_users[pool] -= 1
+                if pool is not self._pool:
+                    self._retire(pool)
+        if error:
+            return {"ok": False, "error": error}
+        response = {"ok": True, "seconds": round(seconds, 3),
+                    "periods": n_periods, "events": n_events}
+        if as_bytes:
+            out = Path(variant["out"])
+            response["png"] = base64.b64encode(out.read_bytes()).decode()
+            out.unlink()
+        else:
+            response["path"] = str(Path(variant["out"]).resolve())
+
+        with self._lock:
+            self._results[key] = response
+            while len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        return {**response, "cached": False}
+
+    def series(self, start: Optional[str], end: Optional[str]) -> dict:
+        from visualize import _bound
+
+        df = self.frame
+        if start:
+            df = df[df["date"] >= _bound(start, upper=False)]
+        if end:
+            df = df[df["date"] < _bound(end, upper=True)]
+        return {
+            "ok":         True,
+            "periods":    df["period"].tolist(),
+            "commits":    df["commits"].tolist(),
+            "estimated":  df["estimated"].tolist(),
+            "is_outlier": df["is_outlier"].tolist(),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "ok":         True,
+            "version":    self.version[:12] if self.version else None,
+            "loaded_at":  self.loaded_at,
+            "periods":    0 if self.frame is None else len(self.frame),
+            "workers":    self.workers,
+            "requests":   self.requests,
+            "cache_hits": self.cache_hits,
+        }
+
+    def handle(self, request: dict) -> dict:
+        self.requests += 1
+        cmd = request.get("cmd")
+        self.refresh()
+        if cmd == "render":
+            return self.render(request.get("variant", {}), bool(request.get("bytes")))
+        if cmd == "series":
+            return self.series(request.get("start"), request.get("end"))
+        if cmd == "stats":
+            return self.stats()
+        return {"ok": False, "error": f"unknown command {cmd!r}"}
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+        self._tmp.cleanup()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as exc:
+                response = {"ok": False, "error": f"bad request: {exc}"}
+            else:
+                if request.get("cmd") == "shutdown":
+                    self._reply({"ok": True})
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+                try:
+                    response = self.server.service.handle(request)
+                except (OSError, ValueError) as exc:
+                    response = {"ok": False, "error": str(exc)}
+            self._reply(response)
+
+    def _reply(self, response: dict) -> None:
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+        self.wfile.flush()
+
+
+class RenderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, service: RenderService):
+        self.service = service
+        super().__init__(str(socket_path), _Handler)
+
+
+def serve(socket_path: Path, service: RenderService) -> None:
+    """Load the data, start the workers and answer requests until shutdown."""
+    if socket_path.exists():
+        try:
+            request(socket_path, {"cmd": "stats"})
+        except OSError:
+            socket_path.unlink()            # stale socket from a crashed server
+        else:
+            raise OSError(f"A server is already listening on {socket_path}")
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+    service.refresh()
+    server = RenderServer(socket_path, service)
+    print(f"[INFO] Listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        socket_path.unlink(missing_ok=True)
+        service.close()
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+def request(socket_path: Path, payload: dict, timeout: float = 300.0) -> dict:
+    """Send one request and return the decoded response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(payload).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise OSError(f"No response from {socket_path}")
+    return json.loads(line)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Serve chart renders from warm workers over a Unix socket, "
+                    "or talk to a running server."
+    )
+    parser.add_argument("command", choices=["serve", "render", "series", "stats", "shutdown"])
+    parser.add_argument("--socket", default=str(DEFAULT_SOCKET),
+                        help=f"Unix socket path (default: {DEFAULT_SOCKET})")
+    parser.add_argument("--store", default=str(DEFAULT_STORE),
+                        help=f"Columnar store directory for serve (default: {DEFAULT_STORE})")
+    parser.add_argument("--workers", default=None, type=int,
+                        help="Render workers for serve (default: all cores)")
+    parser.add_argument("--outlier-window", default=None, type=int,
+                        help="As main.py --outlier-window, for serve")
+    parser.add_argument("--out", default=None,
+                        help="render: output path, or '-' for PNG bytes on stdout")
+    parser.add_argument("--start", default=None, type=validate_period,
+                        help="render/series: start month YYYY-MM (or a day or hour)")
+    parser.add_argument("--end", default=None, type=validate_period,
+                        help="render/series: end month YYYY-MM (or a day or hour)")
+    parser.add_argument("--orgs", default=None, nargs="+", help="render: only these orgs' events")
+    parser.add_argument("--figsize", default=None, type=float, nargs=2,
+                        metavar=("W", "H"), help="render: figure size in inches")
+    parser.add_argument("--dpi", default=None, type=int, help="render: output dpi")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    socket_path = Path(args.socket)
+
+    if args.command == "serve":
+        service = RenderService(Path(args.store), args.workers or os.cpu_count() or 1,
+                                args.outlier_window)
+        serve(socket_path, service)
+        sys.exit(0)
+
+    if args.command == "render":
+        if not args.out:
+            print("[ERROR] --out is required for render.", file=sys.stderr)
+            sys.exit(1)
+        variant = {key: value for key, value in (
+            # The server has its own cwd; send a path that means the same there
+            ("out", None if args.out == "-" else str(Path(args.out).resolve())),
+            ("start", args.start), ("end", args.end), ("orgs", args.orgs),
+            ("figsize", args.figsize), ("dpi", args.dpi),
+        ) if value is not None}
+        payload = {"cmd": "render", "variant": variant, "bytes": args.out == "-"}
+    elif args.command == "series":
+        payload = {"cmd": "series", "start": args.start, "end": args.end}
+    else:
+        payload = {"cmd": args.command}
+
+    t0 = time.perf_counter()
+    try:
+        response = request(socket_path, payload)
+    except OSError as exc:
+        print(f"[ERROR] Cannot reach the render server at {socket_path}: {exc}\n"
+              f"        Start one with: python render_server.py serve", file=sys.stderr)
+        sys.exit(1)
+    if not response.get("ok"):
+        print(f"[ERROR] {response.get('error')}", file=sys.stderr)
+        sys.exit(1)
+
+    if "png" in response:
+        sys.stdout.buffer.write(base64.b64decode(response.pop("png")))
+        sys.stdout.flush()
+    elif args.command == "render":
+        print(f"{response['path']}  ({response['seconds']:.2f}s render, "
+              f"{'cached' if response['cached'] else 'fresh'}, "
+              f"{(time.perf_counter() - t0) * 1000:.0f} ms round trip)")
+    elif args.command != "shutdown":
+        print(json.dumps(response, indent=1))
@@ -0,0 +1,191 @@
+"""
+result_cache.py
+---------------
+Content-addressed cache of per-month BigQuery results, stored in SQLite
+under data/ so re-running the same plan never hits BigQuery twice.
+
+Every cached value is keyed on a hash of the rendered SQL, the metric name
+and the month's _TABLE_SUFFIX. Range queries group by month, so a month's
+row is the same whichever run fetched it and is stored as if it came from
+its own single-month query. Editing the query text changes the hash, so old
+entries simply stop matching.
+
+Closed months never expire. The current (open) month keeps receiving events,
+so its entries expire after OPEN_MONTH_TTL.
+
+Usage:
+    python result_cache.py stats
+    python result_cache.py prune     # drop expired and superseded entries
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+DATA_DIR       = Path("data")
+CACHE_DB       = DATA_DIR / "query_cache.sqlite"
+OPEN_MONTH_TTL = 6 * 3600       # seconds
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key         TEXT PRIMARY KEY,
+    query_hash  TEXT NOT NULL,
+    metric      TEXT NOT NULL,
+    month       TEXT NOT NULL,
+    value       INTEGER,
+    fetched_at  REAL NOT NULL,
+    expires_at  REAL
+)
+"""
+
+
+def query_hash(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+def result_key(sql: str, metric: str, month: str) -> str:
+    """Hash of the rendered SQL, metric and the month's table suffix."""
+    suffix = month.replace("-", "")
+    payload = json.dumps([query_hash(sql), metric, suffix, suffix])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _current_month() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+
+class ResultCache:
+    """SQLite-backed {month: value} cache for one or more query/metric pairs."""
+
+    def __init__(self, path: Path = CACHE_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # check_same_thread=False: fetch_runs stores results from the main
+        # thread, but callers may share one cache across a thread pool.
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get_many(self, sql: str, metric: str,
+                 months: list[str]) -> dict[str, Optional[int]]:
+        """
+        Return {month: value} for every fresh hit.
+
+        A value of None means the month was queried and returned no rows,
+        which is still a hit: it should not be queried again.
+        """
+        now = time.time()
+        hits: dict[str, Optional[int]] = {}
+        for month in months:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM results WHERE key = ?",
+                (result_key(sql, metric, month),),
+            ).fetchone()
+            if row is None:
+                continue
+            value, expires_at = row
+            if expires_at is None or expires_at > now:
+                hits[month] = value
+        return hits
+
+    def put_many(self, sql: str, metric: str,
+                 months: list[str], values: dict[str, int]) -> None:
+        """Store values for months; months missing from values are stored as None."""
+        now = time.time()
+        open_month = _current_month()
+        qhash = query_hash(sql)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (result_key(sql, metric, month), qhash, metric, month,
+                     values.get(month), now,
+                     now + OPEN_MONTH_TTL if month >= open_month else None)
+                    for month in months
+                ],
+            )
+
+    def stats(self) -> dict:
+        now = time.time()
+        total, expired, open_entries, n_queries = self._conn.execute(
+            "SELECT COUNT(*),"
+            "       COALESCE(SUM(expires_at IS NOT NULL AND expires_at <= ?), 0),"
+            "       COALESCE(SUM(expires_at IS NOT NULL), 0),"
+            "       COUNT(DISTINCT query_hash)"
+            "  FROM results",
+            (now,),
+        ).fetchone()
+        by_metric = dict(self._conn.execute(
+            "SELECT metric, COUNT(*) FROM results GROUP BY metric ORDER BY metric"
+        ).fetchall())
+        return {
+            "entries":      total,
+            "expired":      expired,
+            "open_month":   open_entries,
+            "query_hashes": n_queries,
+            "by_metric":    by_metric,
+            "size_bytes":   self.path.stat().st_size if self.path.exists() else 0,
+        }
+
+    def prune(self) -> int:
+        """
+        Delete expired entries and entries from superseded query text.
+
+        A query hash is superseded when a newer hash has been written for the
+        same metric, i.e. the SQL changed since those rows were fetched.
+        """
+        with self._conn:
+            expired = self._conn.execute(
+                "DELETE FROM results WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),),
+            ).rowcount
+            superseded = self._conn.execute(
+                """
+                DELETE FROM results
+                 WHERE query_hash != (
+                    SELECT r.query_hash FROM results r
+                     WHERE r.metric = results.metric
+                     ORDER BY r.fetched_at DESC LIMIT 1
+                 )
+                """
+            ).rowcount
+        self._conn.execute("VACUUM")
+        return expired + superseded
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Inspect or prune the local BigQuery result cache."
+    )
+    parser.add_argument("command", choices=["stats", "prune"])
+    parser.add_argument("--db", default=str(CACHE_DB),
+                        help=f"Path to the cache database (default: {CACHE_DB})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    cache = ResultCache(Path(args.db))
+
+    if args.command == "prune":
+        removed = cache.prune()
+        print(f"Pruned {removed} entr{'y' if removed == 1 else 'ies'}.")
+
+    stats = cache.stats()
+    print(f"Cache           : {cache.path}  ({stats['size_bytes'] / 1e3:.1f} KB)")
+    print(f"  Entries       : {stats['entries']}  "
+          f"({stats['open_month']} open-month, {stats['expired']} expired)")
+    print(f"  Query hashes  : {stats['query_hashes']}")
+    for metric, count in stats["by_metric"].items():
+        print(f"  {metric:<13} : {count}")
@@ -0,0 +1,285 @@
+"""
+rollup.py
+---------
+Rollup cube over the columnar store: hour → day → week → month.
+
+Fetches and ingests store the finest granularity they paid for: hourly from
+a local archive mirror or an hourly BigQuery fetch, daily around release
+dates, monthly from the classic BigQuery fetch. Coarser series are derived
+here by summing, never re-queried:
+
+    hour → day     every day with a stored hour; 'estimated' unless all 24 are
+    day  → week    Monday-start weeks whose 7 days are all present
+    day  → month   months whose days are all present
+
+GH Archive has hours missing upstream, so a day short of hours is kept but
+marked 'estimated' (and with it the weeks and months summed from it)
+rather than passing as measured; incomplete_days lists them. A local
+ingest stores a 0 for a mirrored hour with no pushes, so only hours
+nothing was read for count as missing. Weeks and months are only derived
+when every day is present, so the partial month around an event window
+never passes for a monthly total. Hours and days that haven't happened yet
+don't count against the open day, week or month.
+
+Where a period is both stored and derived, the most recently fetched value
+wins, as everywhere else in the store. A derived row is 'estimated' if any
+row it sums is. Weeks are labelled with their Monday, 'YYYY-MM-DD', and are
+never stored.
+
+Usage:
+    python rollup.py --granularity week
+    python rollup.py --granularity month --metric push_events --start 2024-01 --end 2024-12
+    python rollup.py --metric commits stars forks          # side by side
+"""
+
+import argparse
+import calendar
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from store import STORE_DIR, _latest, _schema, read_table
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+
+# ---------------------------------------------------------------------------
+# Roll-up
+# ---------------------------------------------------------------------------
+
+def _previous_month(yyyy_mm: str) -> str:
+    y, m = int(yyyy_mm[:4]), int(yyyy_mm[5:7])
+    return f"{y - 1:04d}-12" if m == 1 else f"{y:04d}-{m - 1:02d}"
+
+
+def _expected_hours(day: str, now: datetime) -> int:
+    """Hours a YYYY-MM-DD day needs to be complete, up to now."""
+    first = datetime.fromisoformat(day).replace(tzinfo=timezone.utc)
+    elapsed = (now - first) // timedelta(hours=1) + 1
+    return max(1, min(24, elapsed))
+
+
+def _expected_days(period: str, granularity: str, today: date) -> int:
+    """Days a week or month period needs to be complete, up to today."""
+    if granularity == "week":
+        first = date.fromisoformat(period)
+        days = 7
+    else:
+        first = date(int(period[:4]), int(period[5:7]), 1)
+        days = calendar.monthrange(first.year, first.month)[1]
+    elapsed = (today - first).days + 1
+    return max(1, min(days, elapsed))
+
+
+def _sum_by(table: "pa.Table", keys: "pa.Array") -> "pa.Table":
+    """Sum values per (key, metric) into store rows, counting the rows summed."""
+    import pyarrow as pa
+    # 'estimated' < 'measured', so the min is 'estimated' if any input is
+    grouped = table.set_column(0, "period", keys).group_by(
+        ["period", "metric"], use_threads=False,
+    ).aggregate([
+        ("value", "sum"), ("provenance", "min"), ("source", "min"),
+        ("fetched_at", "max"), ("value", "count"),
+    ])
+    return pa.table({
+        "period":     grouped["period"],
+        "metric":     grouped["metric"],
+        "value":      grouped["value_sum"],
+        "provenance": grouped["provenance_min"],
+        "source":     grouped["source_min"],
+        "fetched_at": grouped["fetched_at_max"],
+        "n":          grouped["value_count"],
+    })
+
+
+def _complete(rolled: "pa.Table", expected: list[int]) -> "pa.Table":
+    """Rows of a _sum_by table that summed at least the expected count."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    keep = pc.greater_equal(rolled["n"], pa.array(expected, pa.int64()))
+    return rolled.filter(keep)
+
+
+def roll_up(table: "pa.Table", granularity: str,
+            now: Optional[datetime] = None) -> "pa.Table":
+    """
+    Sum hourly or daily store rows (store._schema()) up to day, week or month.
+
+    Days missing any hour are marked 'estimated', and weeks and months
+    missing any day are dropped; pass now (UTC) to fix the instant that
+    open periods are judged against (default: the current time).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    if granularity not in ("day", "week", "month"):
+        raise ValueError(f"Cannot roll up to '{granularity}'. Expected day, week or month.")
+    if table.num_rows == 0:
+        return _schema().empty_table()
+
+    now = now or datetime.now(timezone.utc)
+    days = _sum_by(table, pc.utf8_slice_codeunits(table["period"], 0, 10))
+    if len(table["period"][0].as_py()) > len("YYYY-MM-DD"):
+        expected = [_expected_hours(d, now) for d in days["period"].to_pylist()]
+        short = pc.less(days["n"], pa.array(expected, pa.int64()))
+        days = days.set_column(days.schema.get_field_index("provenance"), "provenance",
+                               pc.if_else(short, "estimated", days["provenance"]))
+    if granularity == "day":
+        return days.drop_columns(["n"]).cast(_schema())
+
+    if granularity == "month":
+        keys = pc.utf8_slice_codeunits(days["period"], 0, 7)
+    else:
+        ts = pc.strptime(days["period"], format="%Y-%m-%d", unit="s")
+        monday = pc.floor_temporal(ts, unit="week", week_starts_monday=True)
+        keys = pc.strftime(monday, format="%Y-%m-%d")
+    rolled = _sum_by(days, keys)
+
+    expected = [_expected_days(p, granularity, now.date())
+                for p in rolled["period"].to_pylist()]
+    return _complete(rolled, expected).drop_columns(["n"]).cast(_schema())
+
+
+def incomplete_days(metric: str = "commits",
+                    start: Optional[str] = None,
+                    end: Optional[str] = None,
+                    store_dir: Path = STORE_DIR,
+                    now: Optional[datetime] = None) -> dict[str, tuple[int, int]]:
+    """{YYYY-MM-DD: (hours stored, hours expected)} for days short of hours."""
+    import pyarrow.compute as pc
+    hours = read_table("hour", [metric], start, end, store_dir)
+    if hours.num_rows == 0:
+        return {}
+    now = now or datetime.now(timezone.utc)
+    days = _sum_by(hours, pc.utf8_slice_codeunits(hours["period"], 0, 10))
+    short = {}
+    for day, n in zip(days["period"].to_pylist(), days["n"].to_pylist()):
+        expected = _expected_hours(day, now)
+        if n < expected:
+            short[day] = (n, expected)
+    return short
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def read_series(granularity: str = "month",
+                metrics: Optional[list[str]] = None,
+                start: Optional[str] = None,
+                end: Optional[str] = None,
+                store_dir: Path = STORE_DIR) -> "pa.Table":
+    """
+    Latest rows (store._schema()) at any cube granularity, stored or derived.
+
+    Like store.read_table, start/end prune by month; a week series may
+    include the weeks straddling them, which callers filter by date.
+    """
+    import pyarrow as pa
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'. "
+                         f"Expected one of {', '.join(GRANULARITIES)}.")
+
+    if granularity == "hour":
+        return read_table("hour", metrics, start, end, store_dir)
+    if granularity == "day":
+        hours = read_table("hour", metrics, start, end, store_dir)
+        stored = read_table("day", metrics, start, end, store_dir)
+        return _latest(pa.concat_tables([stored, roll_up(hours, "day")]))
+
+    # The first week of a range can start in the month before it
+    day_start = _previous_month(start[:7]) if start and granularity == "week" else start
+    days = read_series("day", metrics, day_start, end, store_dir)
+    if granularity == "week":
+        return _latest(roll_up(days, "week"))
+    stored = read_table("month", metrics, start, end, store_dir)
+    return _latest(pa.concat_tables([stored, roll_up(days, "month")]))
+
+
+def read_wide(metrics: list[str],
+              granularity: str = "month",
+              start: Optional[str] = None,
+              end: Optional[str] = None,
+              store_dir: Path = STORE_DIR) -> "pa.Table":
+    """
+    Several metrics side by side, as one multi-metric fetch returns them:
+    period, then one int64 column per metric (null where it has no value),
+    sorted by period.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    table = read_series(granularity, metrics, start, end, store_dir)
+    periods = pc.unique(table["period"])
+    periods = periods.take(pc.array_sort_indices(periods))
+    columns = {"period": periods}
+    for metric in metrics:
+        rows = table.filter(pc.equal(table["metric"], metric))
+        columns[metric] = rows["value"].take(pc.index_in(periods, value_set=rows["period"]))
+    return pa.table(columns)
+
+
+def load_metric(metric: str = "commits",
+                granularity: str = "month",
+                start: Optional[str] = None,
+                end: Optional[str] = None,
+                store_dir: Path = STORE_DIR) -> dict[str, int]:
+    """{period: value} for one metric, stored or derived."""
+    table = read_series(granularity, [metric], start, end, store_dir)
+    return dict(zip(table["period"].to_pylist(), table["value"].to_pylist()))
+
+
+def load_provenance(metric: str = "commits",
+                    granularity: str = "month",
+                    store_dir: Path = STORE_DIR) -> dict[str, str]:
+    """{period: 'measured' | 'estimated'} for one metric, stored or derived."""
+    table = read_series(granularity, [metric], store_dir=store_dir)
+    return dict(zip(table["period"].to_pylist(), table["provenance"].to_pylist()))
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Print one metric at any granularity, rolled up from the finest stored."
+    )
+    parser.add_argument("--granularity", default="month", choices=GRANULARITIES,
+                        help="Granularity to print (default: month)")
+    parser.add_argument("--metric", default=["commits"], nargs="+",
+                        help="Metric(s) to print; several print side by side "
+                             "(default: commits)")
+    parser.add_argument("--start", default=None, help="Start month YYYY-MM (default: all data)")
+    parser.add_argument("--end", default=None, help="End month YYYY-MM (default: all data)")
+    parser.add_argument("--store-dir", default=str(STORE_DIR),
+                        help=f"Store directory (default: {STORE_DIR})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    try:
+        if len(args.metric) > 1:
+            table = read_wide(args.metric, args.granularity, args.start, args.end,
+                              Path(args.store_dir))
+        else:
+            table = read_series(args.granularity, args.metric, args.start, args.end,
+                                Path(args.store_dir))
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+    if len(args.metric) > 1:
+        print(f"  {'period':<13}" + "".join(f" {metric:>16}" for metric in args.metric))
+        for row in table.to_pylist():
+            print(f"  {row['period']:<13}" + "".join(
+                f" {'—' if row[m] is None else f'{row[m]:,}':>16}" for m in args.metric))
+        print(f"\n  {table.num_rows} {args.granularity}(s) of {', '.join(args.metric)}")
+        sys.exit(0)
+    for period, value, provenance, source in zip(
+            table["period"].to_pylist(), table["value"].to_pylist(),
+            table["provenance"].to_pylist(), table["source"].to_pylist()):
+        print(f"  {period:<13} {value:>14,}  {provenance:<9} {source}")
+    print(f"\n  {table.num_rows} {args.granularity}(s) of {args.metric[0]}")
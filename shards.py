@@ -0,0 +1,312 @@
+"""
+shards.py
+---------
+Convert hourly GH Archive dumps into compact columnar shards — one Parquet
+file per month — so new questions (distinct repos, bots, event types, …) can
+be answered without re-parsing the raw JSON.
+
+Each shard keeps only:
+    type, created_at, repo_id, actor_id, payload_size, payload_distinct_size
+
+Shards live in a hive-partitioned layout (data/shards/month=YYYY-MM/), keyed
+by each event's created_at rather than the hour file it was archived in, so
+aggregations prune whole months by path, skip row groups by the type
+predicate and read only the columns they need.
+
+Usage:
+    python shards.py convert   --archive-dir /mnt/gharchive
+    python shards.py convert   --archive-dir /mnt/gharchive --start 2024-01 --end 2024-12 --workers 32
+    python shards.py aggregate --start 2023-01 --end 2025-12 --metric commits
+"""
+
+import argparse
+import bisect
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from arguments import validate_month
+from ingest_local import SPILL_HOURS, archive_file_hour, list_archive_files
+
+DATA_DIR  = Path("data")
+SHARD_DIR = DATA_DIR / "shards"
+
+SCHEMA = pa.schema([
+    ("type",                  pa.dictionary(pa.int8(), pa.string())),
+    ("created_at",            pa.timestamp("s", tz="UTC")),
+    ("repo_id",               pa.int64()),
+    ("actor_id",              pa.int64()),
+    ("payload_size",          pa.int32()),
+    ("payload_distinct_size", pa.int32()),
+])
+
+# How each metric is computed from the shard columns:
+#   (event type filter or None, column, pyarrow aggregation)
+METRICS = {
+    "commits":          ("PushEvent", "payload_size",          "sum"),
+    "distinct_commits": ("PushEvent", "payload_distinct_size", "sum"),
+    "push_events":      ("PushEvent", "payload_size",          "count_all"),
+    "events":           (None,        "type",                  "count_all"),
+    "active_repos":     (None,        "repo_id",               "count_distinct"),
+    "active_actors":    (None,        "actor_id",              "count_distinct"),
+}
+
+# month=YYYY-MM directories; declared so the key stays a string
+PARTITIONING = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+
+
+# ---------------------------------------------------------------------------
+# Conversion
+# ---------------------------------------------------------------------------
+
+def _int_or_none(value) -> Optional[int]:
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def hour_table(path: Path) -> pa.Table:
+    """Parse one hourly .json.gz file into a table with SCHEMA."""
+    types, created, repos, actors, sizes, distinct = [], [], [], [], [], []
+    try:
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                event = json.loads(line)
+                payload = event.get("payload") or {}
+                types.append(event.get("type"))
+                created.append(event.get("created_at"))
+                repos.append((event.get("repo") or {}).get("id"))
+                actors.append((event.get("actor") or {}).get("id"))
+                sizes.append(_int_or_none(payload.get("size")))
+                distinct.append(_int_or_none(payload.get("distinct_size")))
+    except (OSError, EOFError, json.JSONDecodeError) as exc:
+        raise OSError(f"Failed to read {path}: {exc}") from exc
+
+    created_at = pc.strptime(pa.array(created, pa.string()),
+                             format="%Y-%m-%dT%H:%M:%SZ", unit="s")
+    return pa.table({
+        "type":                  pa.array(types, pa.string()).dictionary_encode()
+                                   .cast(SCHEMA.field("type").type),
+        "created_at":            created_at.cast(SCHEMA.field("created_at").type),
+        "repo_id":               pa.array(repos, pa.int64()),
+        "actor_id":              pa.array(actors, pa.int64()),
+        "payload_size":          pa.array(sizes, pa.int32()),
+        "payload_distinct_size": pa.array(distinct, pa.int32()),
+    }, schema=SCHEMA)
+
+
+def _shard_path(shard_dir: Path, month: str) -> Path:
+    return shard_dir / f"month={month}" / "events.parquet"
+
+
+def _month_bounds(month: str) -> tuple[datetime, datetime]:
+    """First instant of month and of the month after it, in UTC."""
+    first = datetime(int(month[:4]), int(month[5:7]), 1, tzinfo=timezone.utc)
+    return first, (first + timedelta(days=32)).replace(day=1)
+
+
+def _source_stats(files: list[Path]) -> dict[str, list[int]]:
+    """{resolved path: [size, mtime_ns]} for the files a shard is built from."""
+    stats = {}
+    for path in files:
+        st = path.stat()
+        stats[str(path.resolve())] = [st.st_size, st.st_mtime_ns]
+    return stats
+
+
+def _shard_sources(path: Path) -> Optional[dict[str, list[int]]]:
+    """Source file stats a shard was built from, or None if absent or older."""
+    if not path.exists():
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    value = metadata.get(b"sources")
+    return json.loads(value) if value is not None else None
+
+
+def convert(archive_dir: Path,
+            shard_dir: Path = SHARD_DIR,
+            start_month: Optional[str] = None,
+            end_month: Optional[str] = None,
+            workers: Optional[int] = None,
+            force: bool = False) -> list[str]:
+    """
+    Write one Parquet shard per month from the hourly archive files.
+
+    A month's shard holds the events created in that month, read from its
+    own hourly files plus SPILL_HOURS of files either side. Months whose
+    shard was built from the same files, each with the same size and mtime
+    as now (as IngestManifest checks), are skipped unless force is set.
+    Each hourly file becomes at most one row group. Files are handed to the
+    pool `workers` at a time, so at most that many parsed hours are held in
+    memory at once. Shards are written to a temporary file and renamed into
+    place, so a crash never leaves a half-written shard behind.
+
+    Returns the months that were (re)written.
+    """
+    # Every file, not just those in range: the edge months need neighbours
+    paths = sorted(list_archive_files(archive_dir), key=archive_file_hour)
+    hours = [archive_file_hour(path) for path in paths]
+    months = sorted({
+        f"{hour:%Y-%m}" for hour in hours
+        if (not start_month or f"{hour:%Y-%m}" >= start_month)
+        and (not end_month or f"{hour:%Y-%m}" <= end_month)
+    })
+    spill = timedelta(hours=SPILL_HOURS)
+    by_month: dict[str, list[Path]] = {}
+    for month in months:
+        first, after = _month_bounds(month)
+        lo = bisect.bisect_left(hours, first - spill)
+        hi = bisect.bisect_left(hours, after + spill)
+        by_month[month] = paths[lo:hi]
+
+    stats = {month: _source_stats(files) for month, files in by_month.items()}
+    todo = [
+        month for month in months
+        if force or _shard_sources(_shard_path(shard_dir, month)) != stats[month]
+    ]
+    print(f"{len(by_month)} month(s) of archive files, {len(todo)} to convert "
+          f"→ {shard_dir}")
+
+    workers = workers or os.cpu_count() or 1
+    with Pool(processes=workers) as pool:
+        for month in todo:
+            t0 = time.perf_counter()
+            files = by_month[month]
+            out = _shard_path(shard_dir, month)
+            out.parent.mkdir(parents=True, exist_ok=True)
+            # Leading dot: dataset discovery ignores it if a crash leaves it behind
+            tmp = out.parent / f".{out.name}.tmp"
+            schema = SCHEMA.with_metadata({"sources": json.dumps(stats[month])})
+            created_type = SCHEMA.field("created_at").type
+            first, after = (pa.scalar(bound, created_type) for bound in _month_bounds(month))
+            n_rows = 0
+            with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+                # imap queues every result it is handed with no backpressure;
+                # one window of files per worker bounds what is held at once
+                for i in range(0, len(files), workers):
+                    for table in pool.imap(hour_table, files[i:i + workers]):
+                        created = table["created_at"]
+                        table = table.filter(pc.and_(pc.greater_equal(created, first),
+                                                     pc.less(created, after)))
+                        if table.num_rows:
+                            writer.write_table(table.replace_schema_metadata(schema.metadata))
+                            n_rows += table.num_rows
+            os.replace(tmp, out)
+            print(f"  {month}: {len(files)} file(s), {n_rows:,} events, "
+                  f"{out.stat().st_size / 1e6:,.0f} MB  ({time.perf_counter() - t0:.0f}s)")
+    return todo
+
+
+# ---------------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------------
+
+def aggregate_monthly(shard_dir: Path = SHARD_DIR,
+                      start_month: Optional[str] = None,
+                      end_month: Optional[str] = None,
+                      metric: str = "commits") -> dict[str, int]:
+    """
+    Return {YYYY-MM: value} for one metric from the shards.
+
+    Only the month partitions in range are opened and only the columns the
+    metric needs are read; the event-type predicate is pushed down to the
+    Parquet reader.
+    """
+    event_type, column, how = METRICS[metric]
+    dataset = ds.dataset(shard_dir, format="parquet", partitioning=PARTITIONING)
+
+    predicate = None
+    clauses = []
+    if start_month:
+        clauses.append(ds.field("month") >= start_month)
+    if end_month:
+        clauses.append(ds.field("month") <= end_month)
+    if event_type:
+        clauses.append(ds.field("type") == event_type)
+    for clause in clauses:
+        predicate = clause if predicate is None else predicate & clause
+
+    table = dataset.to_table(columns=["month", column], filter=predicate)
+    if how == "count_all":
+        grouped = table.group_by("month").aggregate([([], "count_all")])
+        value_col = "count_all"
+    else:
+        grouped = table.group_by("month").aggregate([(column, how)])
+        value_col = f"{column}_{how}"
+
+    return {
+        month: int(value)
+        for month, value in zip(grouped["month"].to_pylist(),
+                                grouped[value_col].to_pylist())
+        if value is not None
+    }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convert GH Archive dumps to monthly Parquet shards and aggregate them."
+    )
+    parser.add_argument("command", choices=["convert", "aggregate"])
+    parser.add_argument(
+        "--archive-dir", default=None,
+        help="Directory holding hourly YYYY-MM-DD-H.json.gz files (convert).",
+    )
+    parser.add_argument(
+        "--shard-dir", default=str(SHARD_DIR),
+        help=f"Shard directory (default: {SHARD_DIR})",
+    )
+    parser.add_argument(
+        "--start", default=None, type=validate_month,
+        help="Start month YYYY-MM (default: everything)",
+    )
+    parser.add_argument(
+        "--end", default=None, type=validate_month,
+        help="End month YYYY-MM (default: everything)",
+    )
+    parser.add_argument(
+        "--workers", default=None, type=int,
+        help="Worker processes for convert (default: all cores)",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Rebuild shards even if they look up to date.",
+    )
+    parser.add_argument(
+        "--metric", default="commits", choices=sorted(METRICS),
+        help="Metric to aggregate (default: commits)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    shard_dir = Path(args.shard_dir)
+
+    if args.command == "convert":
+        if not args.archive_dir:
+            print("[ERROR] --archive-dir is required for convert.", file=sys.stderr)
+            sys.exit(1)
+        convert(Path(args.archive_dir), shard_dir, args.start, args.end,
+                args.workers, args.force)
+    else:
+        if not shard_dir.is_dir():
+            print(f"[ERROR] Shard directory not found: {shard_dir}", file=sys.stderr)
+            sys.exit(1)
+        t0 = time.perf_counter()
+        totals = aggregate_monthly(shard_dir, args.start, args.end, args.metric)
+        for month in sorted(totals):
+            print(f"  {month}  {totals[month]:>14,}")
+        print(f"\n  {len(totals)} month(s) in {time.perf_counter() - t0:.2f}s")
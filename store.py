@@ -0,0 +1,428 @@
+"""
+store.py
+--------
+Columnar metric store: the hot load path for everything the pipeline
+fetches, replacing data/monthly_commits.csv (which is still exported for
+humans and other tools).
+
+Layout (hive-partitioned Parquet):
+    data/store/granularity=month/month=2024-03/part-<ns>-<id>.parquet
+
+Every row is one value of one metric for one period:
+    period      'YYYY-MM' (month), 'YYYY-MM-DD' (day) or 'YYYY-MM-DDTHH' (hour)
+    metric      e.g. 'commits', 'push_events'
+    value       int64
+    provenance  'measured' or 'estimated'
+    source      where it came from: 'bigquery', 'local', 'shards', 'csv', …
+    fetched_at  UTC timestamp of the write
+
+Writes are append-only: each write lands in a new part file, written to a
+dot-prefixed temp file and renamed into place, so readers never see a
+partial file. When a period is written more than once, the row with the
+latest fetched_at wins on read. `compact` folds each partition back into a
+single file.
+
+Usage:
+    python store.py stats
+    python store.py compact
+    python store.py export-csv               # → data/monthly_commits.csv
+    python store.py import-csv               # seed the store from the CSV
+"""
+
+import argparse
+import csv
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence, Union
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+DATA_DIR  = Path("data")
+STORE_DIR = DATA_DIR / "store"
+CSV_PATH  = DATA_DIR / "monthly_commits.csv"
+
+GRANULARITIES = ("hour", "day", "month")
+
+# GH Archive stopped populating payload.size from this month on; later months
+# are estimated from PushEvent counts scaled by a calibrated commits/push ratio.
+ESTIMATE_FROM = "2025-10"
+
+# pyarrow (and pyarrow.dataset in particular) is imported on first use, not
+# at import time, so callers that only need has_data/ensure_seeded on a
+# warm store, like a cached `main.py --no-fetch`, start quickly.
+
+
+@lru_cache(maxsize=None)
+def _schema() -> "pa.Schema":
+    import pyarrow as pa
+    return pa.schema([
+        ("period",     pa.string()),
+        ("metric",     pa.string()),
+        ("value",      pa.int64()),
+        ("provenance", pa.string()),
+        ("source",     pa.string()),
+        ("fetched_at", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+@lru_cache(maxsize=None)
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(
+        pa.schema([("granularity", pa.string()), ("month", pa.string())]),
+        flavor="hive",
+    )
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+def _partition_dir(store_dir: Path, granularity: str, month: str) -> Path:
+    return store_dir / f"granularity={granularity}" / f"month={month}"
+
+
+def _write_atomic(table: "pa.Table", directory: Path) -> Path:
+    import pyarrow.parquet as pq
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+    # Dot prefix: dataset discovery skips it, so a crash mid-write is harmless
+    tmp = directory / f".{name}.tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, directory / name)
+    return directory / name
+
+
+def append_table(table: "pa.Table",
+                 granularity: str = "month",
+                 store_dir: Path = STORE_DIR) -> int:
+    """Append rows with the store schema (_schema()), one new part file per month partition touched."""
+    import pyarrow.compute as pc
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'. "
+                         f"Expected one of {', '.join(GRANULARITIES)}.")
+    table = table.cast(_schema())
+    months = pc.utf8_slice_codeunits(table["period"], 0, 7)
+    for month in pc.unique(months).to_pylist():
+        part = table.filter(pc.equal(months, month))
+        _write_atomic(part, _partition_dir(store_dir, granularity, month))
+    return table.num_rows
+
+
+def write_metric(values: dict[str, int],
+                 metric: str,
+                 provenance: Union[str, dict[str, str]],
+                 source: str,
+                 granularity: str = "month",
+                 store_dir: Path = STORE_DIR) -> int:
+    """
+    Append {period: value} for one metric.
+
+    provenance is either one value for every row or a {period: provenance} map.
+    """
+    if not values:
+        return 0
+    import pyarrow as pa
+    periods = sorted(values)
+    if isinstance(provenance, str):
+        provenance = dict.fromkeys(periods, provenance)
+    fetched_at = datetime.now(timezone.utc)
+    table = pa.table({
+        "period":     periods,
+        "metric":     [metric] * len(periods),
+        "value":      [values[p] for p in periods],
+        "provenance": [provenance[p] for p in periods],
+        "source":     [source] * len(periods),
+        "fetched_at": [fetched_at] * len(periods),
+    }, schema=_schema())
+    return append_table(table, granularity, store_dir)
+
+
+def write_batches(batches: Iterable["pa.RecordBatch"],
+                  metric: Union[str, Sequence[str]],
+                  provenance: str,
+                  source: str,
+                  granularity: str = "month",
+                  store_dir: Path = STORE_DIR) -> int:
+    """
+    Append one metric, or several, from a stream of Arrow record batches.
+
+    Each batch holds the period in its first column and the value in a
+    column named metric, as backends.QueryBackend.stream_batches yields
+    them. A wide batch from a multi-metric query has one value column per
+    metric and is written as one row per period and metric. Batches are
+    converted with Arrow compute and written as row groups to one open part
+    file per month partition, so no Python object is built per row and
+    memory stays bounded by the batch size. Rows with a null value are
+    dropped. The part files are renamed into place only once the stream is
+    exhausted, so a failed stream writes nothing.
+
+    Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'. "
+                         f"Expected one of {', '.join(GRANULARITIES)}.")
+
+    schema = _schema()
+    metrics = [metric] if isinstance(metric, str) else list(metric)
+    fetched_at = pa.scalar(datetime.now(timezone.utc), schema.field("fetched_at").type)
+    writers: dict[str, tuple] = {}
+    n_rows = 0
+    try:
+        for batch in batches:
+            parts = []
+            for name in metrics:
+                values = batch.column(name).cast(pa.int64())
+                keep = pc.is_valid(values)
+                periods = batch.column(0).cast(pa.string()).filter(keep)
+                values = values.filter(keep)
+                n = len(values)
+                parts.append(pa.table([
+                    periods, pa.repeat(pa.scalar(name), n), values,
+                    pa.repeat(pa.scalar(provenance), n), pa.repeat(pa.scalar(source), n),
+                    pa.repeat(fetched_at, n),
+                ], schema=schema))
+            table = pa.concat_tables(parts)
+            n = table.num_rows
+            if n == 0:
+                continue
+            months = pc.utf8_slice_codeunits(table["period"], 0, 7)
+            for month in pc.unique(months).to_pylist():
+                if month not in writers:
+                    directory = _partition_dir(store_dir, granularity, month)
+                    directory.mkdir(parents=True, exist_ok=True)
+                    name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+                    tmp = directory / f".{name}.tmp"
+                    writers[month] = (pq.ParquetWriter(tmp, schema, compression="zstd"),
+                                      tmp, directory / name)
+                writers[month][0].write_table(table.filter(pc.equal(months, month)))
+            n_rows += n
+    except BaseException:
+        for writer, tmp, _ in writers.values():
+            writer.close()
+            tmp.unlink(missing_ok=True)
+        raise
+    for writer, tmp, path in writers.values():
+        writer.close()
+        os.replace(tmp, path)
+    return n_rows
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def _latest(table: "pa.Table") -> "pa.Table":
+    """Keep the most recently fetched row per (period, metric)."""
+    if table.num_rows == 0:
+        return table
+    table = table.sort_by([("fetched_at", "ascending")])
+    latest = table.group_by(["period", "metric"], use_threads=False).aggregate([
+        ("value", "last"), ("provenance", "last"),
+        ("source", "last"), ("fetched_at", "last"),
+    ])
+    latest = latest.rename_columns([
+        name.removesuffix("_last") for name in latest.column_names
+    ])
+    return latest.select(_schema().names).sort_by([("metric", "ascending"),
+                                                ("period", "ascending")])
+
+
+def has_data(granularity: Optional[str] = "month", store_dir: Path = STORE_DIR) -> bool:
+    """Whether any rows are stored at granularity, or at all if it is None."""
+    directory = store_dir if granularity is None else store_dir / f"granularity={granularity}"
+    return directory.exists() and any(directory.rglob("*.parquet"))
+
+
+def read_table(granularity: str = "month",
+               metrics: Optional[list[str]] = None,
+               start: Optional[str] = None,
+               end: Optional[str] = None,
+               store_dir: Path = STORE_DIR) -> "pa.Table":
+    """
+    Latest rows for the given granularity, metrics and inclusive period range.
+
+    The granularity and month partitions are pruned by path before any file
+    is opened; start/end may be months even for finer granularities.
+    """
+    if not has_data(granularity, store_dir):
+        return _schema().empty_table()
+
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(store_dir, format="parquet", partitioning=_partitioning())
+    predicate = ds.field("granularity") == granularity
+    # A month bound covers every finer period inside that month, so it only
+    # needs the partition key; finer bounds also filter on period.
+    if start:
+        predicate &= ds.field("month") >= start[:7]
+        if len(start) > 7:
+            predicate &= ds.field("period") >= start
+    if end:
+        predicate &= ds.field("month") <= end[:7]
+        if len(end) > 7:
+            # Compare on the bound's prefix so '2024-03-01' keeps '2024-03-01T23'
+            period_prefix = pc.utf8_slice_codeunits(ds.field("period"), 0, len(end))
+            predicate &= period_prefix <= end
+    if metrics:
+        predicate &= ds.field("metric").isin(metrics)
+
+    return _latest(dataset.to_table(columns=_schema().names, filter=predicate))
+
+
+def load_metric(metric: str = "commits",
+                granularity: str = "month",
+                start: Optional[str] = None,
+                end: Optional[str] = None,
+                store_dir: Path = STORE_DIR) -> dict[str, int]:
+    """{period: value} for one metric."""
+    table = read_table(granularity, [metric], start, end, store_dir)
+    return dict(zip(table["period"].to_pylist(), table["value"].to_pylist()))
+
+
+def load_provenance(metric: str = "commits",
+                    granularity: str = "month",
+                    store_dir: Path = STORE_DIR) -> dict[str, str]:
+    """{period: 'measured' | 'estimated'} for one metric."""
+    table = read_table(granularity, [metric], store_dir=store_dir)
+    return dict(zip(table["period"].to_pylist(), table["provenance"].to_pylist()))
+
+
+def load_frame(metric: str = "commits",
+               granularity: str = "month",
+               start: Optional[str] = None,
+               end: Optional[str] = None,
+               store_dir: Path = STORE_DIR):
+    """
+    One metric as a pandas DataFrame (period, value, provenance, source,
+    fetched_at).
+
+    Arrow → pandas conversion uses split_blocks/self_destruct so the
+    numeric columns are handed over without an extra copy.
+    """
+    table = read_table(granularity, [metric], start, end, store_dir)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+# ---------------------------------------------------------------------------
+# Maintenance and CSV interchange
+# ---------------------------------------------------------------------------
+
+def compact(store_dir: Path = STORE_DIR) -> int:
+    """
+    Rewrite every partition with more than one part file as a single file
+    holding only the latest rows. Returns the number of files removed.
+
+    The compacted file is renamed into place before the old parts are
+    deleted; in between, readers see duplicate rows that _latest resolves.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    removed = 0
+    for directory in sorted(store_dir.glob("granularity=*/month=*")):
+        parts = sorted(directory.glob("part-*.parquet"))
+        if len(parts) < 2:
+            continue
+        table = _latest(pa.concat_tables(
+            pq.read_table(p).select(_schema().names) for p in parts
+        ))
+        _write_atomic(table, directory)
+        for part in parts:
+            part.unlink()
+        removed += len(parts) - 1
+    return removed
+
+
+def export_csv(csv_path: Path = CSV_PATH,
+               metric: str = "commits",
+               store_dir: Path = STORE_DIR) -> None:
+    """
+    Write monthly values as month,commits,source (source = provenance),
+    including months rolled up from hourly or daily rows (rollup.py).
+    """
+    from rollup import read_series
+    table = read_series("month", [metric], store_dir=store_dir)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = csv_path.with_name(f".{csv_path.name}.tmp")
+    with tmp.open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["month", "commits", "source"])
+        writer.writerows(zip(table["period"].to_pylist(),
+                             table["value"].to_pylist(),
+                             table["provenance"].to_pylist()))
+    os.replace(tmp, csv_path)
+    print(f"\n  Exported {table.num_rows} month(s) → {csv_path}")
+
+
+def import_csv(csv_path: Path = CSV_PATH,
+               store_dir: Path = STORE_DIR) -> int:
+    """
+    Seed the store from a monthly_commits.csv. CSVs without a source column
+    are treated as measured before ESTIMATE_FROM and estimated from it on.
+    """
+    values: dict[str, int] = {}
+    provenance: dict[str, str] = {}
+    with csv_path.open() as f:
+        for row in csv.DictReader(f):
+            month = row["month"]
+            values[month] = int(row["commits"])
+            provenance[month] = row.get("source") or (
+                "estimated" if month >= ESTIMATE_FROM else "measured"
+            )
+    return write_metric(values, "commits", provenance, "csv", store_dir=store_dir)
+
+
+def ensure_seeded(csv_path: Path = CSV_PATH, store_dir: Path = STORE_DIR) -> None:
+    """Import the legacy CSV on first use so no fetched month is lost."""
+    if not has_data(None, store_dir) and csv_path.exists():
+        n = import_csv(csv_path, store_dir)
+        print(f"[INFO] Imported {n} month(s) from {csv_path} into {store_dir}")
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Inspect and maintain the columnar metric store."
+    )
+    parser.add_argument("command", choices=["stats", "compact", "export-csv", "import-csv"])
+    parser.add_argument("--store-dir", default=str(STORE_DIR),
+                        help=f"Store directory (default: {STORE_DIR})")
+    parser.add_argument("--csv", default=str(CSV_PATH),
+                        help=f"CSV for export-csv / import-csv (default: {CSV_PATH})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    store_dir = Path(args.store_dir)
+
+    if args.command == "compact":
+        print(f"Removed {compact(store_dir)} superseded part file(s).")
+    elif args.command == "export-csv":
+        export_csv(Path(args.csv), store_dir=store_dir)
+    elif args.command == "import-csv":
+        print(f"Imported {import_csv(Path(args.csv), store_dir)} row(s).")
+
+    for granularity in GRANULARITIES:
+        table = read_table(granularity, store_dir=store_dir)
+        if table.num_rows == 0:
+            continue
+        n_files = len(list((store_dir / f"granularity={granularity}").rglob("*.parquet")))
+        counts = table.group_by("metric").aggregate([("period", "count")])
+        per_metric = ", ".join(
+            f"{m}={n}" for m, n in zip(counts["metric"].to_pylist(),
+                                       counts["period_count"].to_pylist())
+        )
+        print(f"  {granularity:<6} {n_files:>5} file(s)  {per_metric}")
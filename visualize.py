@@ -2,119 +2,402 @@
 visualize.py
 ------------
 Generate a publication-quality chart showing:
-  - Monthly GitHub commit volume (line)
+  - GitHub commit volume per month, week, day or hour (line)
   - Major LLM release events (vertical markers with labels)
 
 Usage:
-    python visualize.py                            # uses data/monthly_commits.csv
+    python visualize.py                            # uses data/store (or the CSV)
     python visualize.py --csv path/to/file.csv
     python visualize.py --start 2020-01 --end 2025-01
+    python visualize.py --granularity week --start 2024-01 --end 2024-06
+    python visualize.py --overlay stars forks      # fetched with --overlay
     python visualize.py --out chart.png            # save instead of display
 """
 
 import argparse
-import csv
 import textwrap
-from datetime import date, datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
-import matplotlib
-import matplotlib.dates as mdates
-import matplotlib.patches as mpatches
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 from typing import Optional
 
+from arguments import parse_period, validate_period
+from labels import measure_label, place_labels
 from llm_events import ORG_COLORS, get_events_in_range
+from outliers import CappingState, cap_series
+from store import ESTIMATE_FROM
+
+# matplotlib is imported inside the drawing functions below, so loading and
+# cleaning data (load_commits, cap_outliers) doesn't pay for it.
 
 # ---------------------------------------------------------------------------
 # Styling constants
 # ---------------------------------------------------------------------------
 FIGURE_SIZE      = (20, 9)
+DPI              = 150       # saved charts
 LINE_COLOR       = "#1f77b4"
+OVERLAY_COLORS   = ["#ff7f0e", "#2ca02c", "#9467bd", "#8c564b", "#e377c2", "#17becf"]
+OVERLAY_WIDTH    = 1.4
 LINE_WIDTH       = 2.2
 MARKER_ALPHA     = 0.55
 MARKER_LW        = 1.2
 LABEL_FONTSIZE   = 7.5
 LABEL_MAX_WIDTH  = 14        # chars before wrapping
+LABEL_ROTATION   = 70        # degrees
+LABEL_OFFSET     = 6         # points between dot and label
 ANNOTATION_LEVELS = 6        # vertical stagger levels to avoid overlap
 LEVEL_STEP_FRAC  = 0.055     # fraction of y-axis height per level
-MIN_DAY_GAP      = 20        # days of separation before a new level resets
+
+# Legend and axis wording per chart granularity
+GRANULARITY_WORDS = {
+    "month": ("Monthly", "Month"),
+    "week":  ("Weekly",  "Week"),
+    "day":   ("Daily",   "Day"),
+    "hour":  ("Hourly",  "Hour (UTC)"),
+}
 
 
 # ---------------------------------------------------------------------------
 # Data loading
 # ---------------------------------------------------------------------------
 
-def cap_outliers(df: pd.DataFrame, z_thresh: float = 3.0) -> pd.DataFrame:
+def cap_outliers(df: pd.DataFrame,
+                 z_thresh: float = 3.0,
+                 window: Optional[int] = None,
+                 state_path: Optional[Path] = None,
+                 verify: bool = False,
+                 granularity: str = "month") -> pd.DataFrame:
     """
     Replace outliers with linearly interpolated values.
     Uses Median Absolute Deviation (robust to extreme spikes).
-    Prints which months were capped.
+    Prints which periods were capped.
+
+    With window=None the median/MAD is global over the series. With a window
+    each point is scored against its trailing `window` points
+    (outliers.RollingRobustZ), so a long-term trend isn't mistaken for
+    spikes.
+
+    With a window and a state_path, detection state is kept in that file
+    (outliers.CappingState) and only points after the last unchanged one are
+    re-evaluated; verify additionally checks the result against a full
+    recompute and raises ValueError on any difference. The global score
+    depends on every point, so it is always recomputed.
+
+    The result gains an `outlier_z` score column (NaN while a rolling window
+    is warming up) and a boolean `is_outlier` mask for downstream stages.
+
+    With the global score, a capped point is interpolated only from its own
+    run of consecutive periods (granularity sets the step), so days from
+    different event windows are never treated as neighbours.
     """
+    df = df.copy()
+    if window is not None:
+        periods, values = df["period"].tolist(), df["commits"].tolist()
+        if state_path is not None:
+            state = CappingState(state_path, window, z_thresh)
+            scores, flagged, capped, first = state.update(periods, values)
+            if first < len(periods):
+                print(f"  Outlier state: re-evaluated {len(periods) - first} of "
+                      f"{len(periods)} period(s) ({state_path})")
+            if verify:
+                state.verify(values, scores, flagged, capped)
+                print("  Outlier state: matches a full recompute")
+        else:
+            scores, flagged, capped = cap_series(values, window, z_thresh)
+        df["outlier_z"] = pd.Series(scores, index=df.index, dtype="float64")
+        df["is_outlier"] = flagged
+        if any(flagged):
+            names = df.loc[df["is_outlier"], "period"].tolist()
+            print(f"  Capping {len(names)} outlier period(s): {', '.join(names)}")
+            df["commits"] = pd.Series(capped, index=df.index, dtype="int64")
+        return df
+
     median = df["commits"].median()
     mad = (df["commits"] - median).abs().median()
     # Modified Z-score (Iglewicz & Hoaglin)
     modified_z = 0.6745 * (df["commits"] - median) / (mad + 1)
     outlier_mask = modified_z.abs() > z_thresh
 
+    df["outlier_z"] = modified_z
+    df["is_outlier"] = outlier_mask
+
     if outlier_mask.any():
-        capped = df.loc[outlier_mask, "month"].tolist()
-        print(f"  Capping {len(capped)} outlier month(s): {', '.join(capped)}")
-        df = df.copy()
+        capped = df.loc[outlier_mask, "period"].tolist()
+        print(f"  Capping {len(capped)} outlier period(s): {', '.join(capped)}")
+        raw = df["commits"].copy()
         df.loc[outlier_mask, "commits"] = None
-        df["commits"] = df["commits"].interpolate(method="linear").bfill().ffill().round().astype("int64")
+        runs = _runs(df["date"], granularity)
+        df["commits"] = (df.groupby(runs)["commits"]
+                         .transform(lambda s: s.interpolate(method="linear").bfill().ffill())
+                         .fillna(raw)       # a run with every point flagged is left as is
+                         .round().astype("int64"))
 
     return df
 
 
-def load_commits(csv_path: Path,
-                 start_month: Optional[str],
-                 end_month: Optional[str]) -> pd.DataFrame:
-    rows = []
-    with csv_path.open() as f:
-        for row in csv.DictReader(f):
-            rows.append({"month": row["month"], "commits": int(row["commits"])})
+# Period strings per granularity, as written by store.py and derived by
+# rollup.py (weeks are labelled with their Monday)
+PERIOD_FORMATS = {
+    "month": "%Y-%m",
+    "week":  "%Y-%m-%d",
+    "day":   "%Y-%m-%d",
+    "hour":  "%Y-%m-%dT%H",
+}
+
+# One period after another, per granularity
+PERIOD_STEPS = {
+    "month": pd.DateOffset(months=1),
+    "week":  pd.Timedelta(weeks=1),
+    "day":   pd.Timedelta(days=1),
+    "hour":  pd.Timedelta(hours=1),
+}
+
+
+def _runs(dates: pd.Series, granularity: str) -> pd.Series:
+    """Run number of each sorted date, going up after every missing period."""
+    return (dates > dates.shift() + PERIOD_STEPS[granularity]).cumsum()
+
+
+def _break_at_gaps(df: pd.DataFrame, granularity: str) -> pd.DataFrame:
+    """
+    df with an all-NaN row in the first missing period after each run, so
+    lines and fills stop at gaps (event windows) instead of bridging them.
+    """
+    if df.empty:
+        return df
+    runs = _runs(df["date"], granularity)
+    ends = df.loc[runs.ne(runs.shift(-1)), "date"].iloc[:-1]
+    if ends.empty:
+        return df
+    gaps = pd.DataFrame({"date": ends + PERIOD_STEPS[granularity]})
+    return pd.concat([df, gaps], ignore_index=True).sort_values("date", kind="stable")
+
+
+def _bound(value: str, upper: bool) -> datetime:
+    """
+    First instant of a YYYY-MM / YYYY-MM-DD / YYYY-MM-DDTHH bound, or for an
+    upper bound the first instant after it, so a month bound covers every day
+    or hour inside that month. Raises ValueError for any other format.
+    """
+    dt, granularity = parse_period(value)
+    if not upper:
+        return dt
+    if granularity == "month":
+        return datetime(dt.year + dt.month // 12, dt.month % 12 + 1, 1)
+    return dt + (timedelta(days=1) if granularity == "day" else timedelta(hours=1))
+
+
+def _in_range(ts: pa.Array, start: Optional[str], end: Optional[str]) -> Optional[pa.Array]:
+    """Mask of timestamps within [start, end], or None if neither is given."""
+    mask = None
+    if start:
+        mask = pc.greater_equal(ts, pa.scalar(_bound(start, upper=False), ts.type))
+    if end:
+        below = pc.less(ts, pa.scalar(_bound(end, upper=True), ts.type))
+        mask = below if mask is None else pc.and_(mask, below)
+    return mask
+
+
+def _read_csv_arrow(csv_path: Path) -> pa.Table:
+    """Typed period/value/provenance columns from an exported monthly CSV."""
+    table = pacsv.read_csv(csv_path, convert_options=pacsv.ConvertOptions(
+        column_types={"month": pa.string(), "commits": pa.int64(), "source": pa.string()},
+        include_columns=["month", "commits", "source"],
+        include_missing_columns=True,
+    ))
+    period = table["month"]
+    # CSVs without a source column: months from ESTIMATE_FROM on were estimated
+    fallback = pc.if_else(pc.greater_equal(period, ESTIMATE_FROM), "estimated", "measured")
+    return pa.table({
+        "period":     period,
+        "value":      table["commits"],
+        "provenance": pc.coalesce(table["source"], fallback),
+    })
+
+
+def capping_state_path(store_dir: Path, metric: str = "commits",
+                       granularity: str = "month") -> Path:
+    """Where cap_outliers keeps its incremental state for a store series."""
+    return store_dir / "_capping" / f"{metric}-{granularity}.json"
+
+
+def load_commits(path: Path,
+                 start: Optional[str],
+                 end: Optional[str],
+                 granularity: str = "month",
+                 metric: str = "commits",
+                 outlier_window: Optional[int] = None,
+                 verify_capping: bool = False,
+                 cap: bool = True) -> pd.DataFrame:
+    """
+    Load one metric from the columnar store (a directory, e.g. data/store)
+    or from an exported monthly_commits.csv, as a DataFrame with columns
+    period, commits, estimated and date, sorted by date.
+
+    From the store, granularity may be hour, day, week or month; anything
+    coarser than what was fetched is rolled up from it (see rollup.py).
+
+    Everything up to the final DataFrame stays in Arrow: periods are parsed
+    into a timestamp index in one vectorised pass, the [start, end] range is
+    applied to that index, and only the surviving rows are converted.
+    start/end may be given at any granularity (YYYY-MM, YYYY-MM-DD,
+    YYYY-MM-DDTHH). outlier_window is passed to cap_outliers; when loading
+    from the store, its capping state is kept under <store>/_capping/ (the
+    underscore keeps it out of dataset discovery) and verify_capping checks
+    it against a full recompute. cap=False returns the rows uncapped.
+    """
+    state_path = None
+    if path.is_dir():
+        from rollup import read_series
+        state_path = capping_state_path(path, metric, granularity)
+        table = read_series(granularity, [metric], start, end, path)
+        table = table.select(["period", "value", "provenance"])
+    elif granularity != "month" or metric != "commits":
+        raise ValueError(f"{path} only holds monthly commits; "
+                         f"use the store for {granularity} {metric}.")
+    else:
+        table = _read_csv_arrow(path)
+
+    ts = pc.strptime(table["period"], format=PERIOD_FORMATS[granularity], unit="s")
+    mask = _in_range(ts, start, end)
+    if mask is not None:
+        table, ts = table.filter(mask), ts.filter(mask)
 
-    df = pd.DataFrame(rows)
-    df["date"] = pd.to_datetime(df["month"], format="%Y-%m")
-    df = df.sort_values("date").reset_index(drop=True)
+    order = pc.sort_indices(ts)
+    table, ts = table.take(order), ts.take(order)
 
-    if start_month:
-        df = df[df["month"] >= start_month]
-    if end_month:
-        df = df[df["month"] <= end_month]
+    df = pd.DataFrame({
+        "period":    table["period"].to_numpy(),
+        "commits":   table["value"].to_numpy(),
+        "estimated": pc.equal(table["provenance"], "estimated").to_numpy(),
+        "date":      ts.cast(pa.timestamp("ns")).to_numpy(),
+    })
 
-    df = cap_outliers(df)
+    if cap:
+        df = cap_outliers(df, window=outlier_window, state_path=state_path,
+                          verify=verify_capping, granularity=granularity)
 
     return df
 
 
+def load_overlays(path: Path,
+                  metrics: list[str],
+                  start: Optional[str],
+                  end: Optional[str],
+                  granularity: str = "month") -> pd.DataFrame:
+    """
+    Extra metrics to draw over the commit line, from the store's wide view
+    (rollup.read_wide): a DataFrame with date and one column per metric,
+    over the same range as load_commits. Missing values are NaN.
+    """
+    if not path.is_dir():
+        raise ValueError(f"{path} only holds monthly commits; overlays need the store.")
+    from rollup import read_wide
+    table = read_wide(metrics, granularity, start, end, path)
+    ts = pc.strptime(table["period"], format=PERIOD_FORMATS[granularity], unit="s")
+    mask = _in_range(ts, start, end)
+    if mask is not None:
+        table, ts = table.filter(mask), ts.filter(mask)
+    df = table.drop_columns(["period"]).to_pandas()
+    df.insert(0, "date", ts.cast(pa.timestamp("ns")).to_numpy())
+    return df
+
+
 # ---------------------------------------------------------------------------
-# Label stagger: assign a vertical level to each event so labels don't pile up
+# Label placement: pick a stem height for each event so labels don't collide
 # ---------------------------------------------------------------------------
 
-def assign_levels(events: list[dict], min_day_gap: int = MIN_DAY_GAP) -> list[int]:
+def level_frac(level: int) -> float:
+    """Stem top for a level, as a fraction of the axes height."""
+    return 0.30 + level * LEVEL_STEP_FRAC
+
+
+def place_event_labels(fig, ax, events: list[dict],
+                       texts: list[str]) -> list[Optional[int]]:
     """
-    Simple greedy algorithm: keep track of the last date placed at each level.
-    Assign the lowest level whose last-placed date is far enough away.
+    Level for each event's label, or None where it would overlap at every
+    level (see labels.place_labels). Uses the axes' current size and x
+    limits, so call it once the data is plotted.
     """
-    level_last: dict[int, date] = {}
-    levels = []
-    for ev in events:
-        ev_date = ev["date"]
-        assigned = None
-        for lvl in range(ANNOTATION_LEVELS):
-            last = level_last.get(lvl)
-            if last is None or (ev_date - last).days >= min_day_gap:
-                assigned = lvl
-                break
-        if assigned is None:
-            assigned = 0   # fallback: overlap at level 0
-        level_last[assigned] = ev_date
-        levels.append(assigned)
-    return levels
+    import matplotlib.dates as mdates
+
+    fig_w, fig_h = fig.get_size_inches()
+    box = ax.get_position()
+    width_pt, height_pt = box.width * fig_w * 72, box.height * fig_h * 72
+    x_lo, x_hi = ax.get_xlim()
+    scale = width_pt / (x_hi - x_lo)
+
+    xs = [(mdates.date2num(datetime.combine(ev["date"], datetime.min.time())) - x_lo) * scale
+          for ev in events]
+    sizes = [measure_label(text, LABEL_FONTSIZE, "semibold", LABEL_ROTATION) for text in texts]
+    heights = [level_frac(level) * height_pt for level in range(ANNOTATION_LEVELS)]
+    return place_labels(xs, sizes, heights, height_pt, offset=LABEL_OFFSET)
+
+
+def draw_events(fig, ax, events: list[dict], y_max: float) -> None:
+    """
+    Draw the event stems, dots and labels.
+
+    Stems and dots are one artist each rather than one per event: a
+    LineCollection for the stems and one scatter for the dots (coloured
+    through an org-code array). Labels are still one Text per placed event,
+    sharing a single offset transform, so thousands of events stay cheap to
+    build and save.
+    """
+    if not events:
+        return
+
+    import matplotlib.dates as mdates
+    import numpy as np
+    from matplotlib.collections import LineCollection
+    from matplotlib.colors import ListedColormap
+    from matplotlib.transforms import ScaledTranslation
+
+    label_texts = [textwrap.fill(ev["model"], width=LABEL_MAX_WIDTH) for ev in events]
+    levels = place_event_labels(fig, ax, events, label_texts)
+
+    orgs = sorted({ev["org"] for ev in events})
+    palette = [next(ev["color"] for ev in events if ev["org"] == org) for org in orgs]
+    codes = np.array([orgs.index(ev["org"]) for ev in events])
+
+    ev_x = mdates.date2num([datetime.combine(ev["date"], datetime.min.time())
+                            for ev in events])
+    y_dot = y_max * 1.55 * np.array([level_frac(level or 0) for level in levels])
+
+    stems = np.stack([np.column_stack([ev_x, np.zeros_like(y_dot)]),
+                      np.column_stack([ev_x, y_dot])], axis=1)
+    ax.add_collection(LineCollection(
+        stems, colors=[palette[c] for c in codes], alpha=MARKER_ALPHA,
+        linewidths=MARKER_LW, linestyles="--", zorder=4,
+    ), autolim=False)
+
+    ax.scatter(ev_x, y_dot, c=codes, cmap=ListedColormap(palette),
+               vmin=0, vmax=max(len(orgs) - 1, 1), s=16, alpha=0.85,
+               linewidths=0, zorder=5)
+
+    # Label above the dot; labels with no room anywhere are left out
+    label_offset = ax.transData + ScaledTranslation(0, LABEL_OFFSET / 72,
+                                                    fig.dpi_scale_trans)
+    for x, y, level, text, code in zip(ev_x, y_dot, levels, label_texts, codes):
+        if level is None:
+            continue
+        ax.text(x, y, text, transform=label_offset,
+                ha="center", va="bottom",
+                fontsize=LABEL_FONTSIZE,
+                color=palette[code],
+                fontweight="semibold",
+                rotation=LABEL_ROTATION,
+                zorder=6)
+
+    hidden = levels.count(None)
+    if hidden:
+        ax.text(0.99, 0.99, f"{hidden} of {len(events)} labels hidden (no room)",
+                transform=ax.transAxes, ha="right", va="top",
+                fontsize=7.5, color="#888888")
 
 
 # ---------------------------------------------------------------------------
@@ -123,39 +406,79 @@ def assign_levels(events: list[dict], min_day_gap: int = MIN_DAY_GAP) -> list[in
 
 def plot(df: pd.DataFrame,
          events: list[dict],
-         output_path: Optional[Path] = None) -> None:
-
+         output_path: Optional[Path] = None,
+         figsize: tuple[float, float] = FIGURE_SIZE,
+         dpi: int = DPI,
+         granularity: str = "month",
+         overlays: Optional[pd.DataFrame] = None) -> None:
+    """
+    Draw the chart and save it to output_path, or show it interactively.
+    figsize is in inches; dpi applies to the saved file. granularity is
+    what one point of df stands for, as passed to load_commits; it sets
+    the legend and axis wording and, below monthly, the date ticks.
+    overlays, as load_overlays returns them, adds one thinner line per
+    metric on a right-hand axis of its own, since event counts run orders
+    of magnitude below commits.
+
+    Saving is headless: the Figure gets an Agg canvas directly, pyplot (and
+    with it any GUI backend) is never imported, and the figure is cleared
+    once written, so batch jobs can render many charts in one process
+    without pyplot's global figure registry holding on to them. Only the
+    interactive path goes through pyplot.
+    """
     if df.empty:
         raise ValueError("No commit data to plot — check your CSV and date range.")
+    if granularity not in GRANULARITY_WORDS:
+        raise ValueError(f"Unknown granularity '{granularity}'. "
+                         f"Expected one of {', '.join(GRANULARITY_WORDS)}.")
+    per, unit = GRANULARITY_WORDS[granularity]
+
+    import matplotlib.dates as mdates
+    import matplotlib.patches as mpatches
+    import matplotlib.ticker as mticker
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from matplotlib.lines import Line2D
 
     # ---- figure setup -------------------------------------------------------
-    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
+    if output_path:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+    else:
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=figsize)
     fig.patch.set_facecolor("#f8f9fa")
     ax.set_facecolor("#f8f9fa")
 
     # ---- commit line --------------------------------------------------------
-    # Split into confirmed (size field available) and estimated (scaled from PushEvents)
-    ESTIMATED_FROM = "2025-10"
-    df_actual = df[df["month"] < ESTIMATED_FROM]
-    df_est    = df[df["month"] >= ESTIMATED_FROM]
-
-    ax.plot(df_actual["date"], df_actual["commits"],
+    # Split into measured (size field available) and estimated (scaled from
+    # PushEvents); each line breaks where periods are missing
+    df_actual = df[~df["estimated"]]
+    df_est    = df[df["estimated"]]
+    step = PERIOD_STEPS[granularity]
+
+    measured = _break_at_gaps(df_actual, granularity)
+    ax.plot(measured["date"], measured["commits"],
             color=LINE_COLOR, linewidth=LINE_WIDTH,
-            zorder=3, label="Monthly GitHub Commits")
+            zorder=3, label=f"{per} GitHub Commits")
 
-    # Bridge the gap: connect last actual point to first estimated
-    if not df_actual.empty and not df_est.empty:
+    # Bridge the gap: connect last actual point to first estimated, if adjacent
+    if (not df_actual.empty and not df_est.empty
+            and df_est["date"].iloc[0] <= df_actual["date"].iloc[-1] + step):
         bridge = pd.concat([df_actual.iloc[[-1]], df_est.iloc[[0]]])
         ax.plot(bridge["date"], bridge["commits"],
                 color=LINE_COLOR, linewidth=LINE_WIDTH,
                 linestyle="--", zorder=3)
 
-    ax.plot(df_est["date"], df_est["commits"],
+    estimated = _break_at_gaps(df_est, granularity)
+    ax.plot(estimated["date"], estimated["commits"],
             color=LINE_COLOR, linewidth=LINE_WIDTH,
             linestyle="--", zorder=3,
-            label="Estimated (PushEvents × 4.14x ratio)")
+            label="Estimated (scaled from PushEvent counts)")
 
-    ax.fill_between(df["date"], df["commits"],
+    filled = _break_at_gaps(df, granularity)
+    ax.fill_between(filled["date"], filled["commits"].astype("float64"),
                     alpha=0.12, color=LINE_COLOR, zorder=2)
 
     # ---- y-axis formatting --------------------------------------------------
@@ -174,42 +497,42 @@ def plot(df: pd.DataFrame,
     ax.yaxis.set_major_formatter(mticker.FuncFormatter(_human))
 
     # ---- x-axis formatting --------------------------------------------------
-    ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%b\n%Y"))
-    ax.xaxis.set_minor_locator(mdates.MonthLocator())
+    if granularity == "month":
+        ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%b\n%Y"))
+        ax.xaxis.set_minor_locator(mdates.MonthLocator())
+    else:
+        # Finer series often cover weeks, not years; let matplotlib pick
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+    # ---- overlays -----------------------------------------------------------
+    # Metrics with no value in range (not fetched, or fetched only at a
+    # finer granularity than the chart's) are left out of the chart.
+    overlay_lines = []
+    values = (overlays.drop(columns="date").dropna(axis="columns", how="all")
+              if overlays is not None else None)
+    if values is not None and not values.empty and len(values.columns):
+        # Behind the main axes, so event stems and labels stay on top;
+        # ax's background is hidden (it matches the figure's) to show it
+        ax2 = ax.twinx()
+        ax2.set_zorder(ax.get_zorder() - 1)
+        ax.patch.set_visible(False)
+        broken = _break_at_gaps(overlays, granularity)
+        for i, metric in enumerate(values.columns):
+            line, = ax2.plot(broken["date"], broken[metric],
+                             color=OVERLAY_COLORS[i % len(OVERLAY_COLORS)],
+                             linewidth=OVERLAY_WIDTH, zorder=3,
+                             label=metric.replace("_", " ").capitalize())
+            overlay_lines.append(line)
+        ax2.set_ylim(0, max(values.max().max(), 1) * 1.55)
+        ax2.yaxis.set_major_formatter(mticker.FuncFormatter(_human))
+        ax2.set_ylabel(f"{per} events", fontsize=11, labelpad=8)
+        ax2.spines["top"].set_visible(False)
 
     # ---- event markers ------------------------------------------------------
-    levels = assign_levels(events)
-
-    for ev, level in zip(events, levels):
-        ev_dt = datetime(ev["date"].year, ev["date"].month, ev["date"].day)
-        color = ev["color"]
-
-        # Vertical line from bottom to a staggered height
-        line_top_frac = 0.30 + level * LEVEL_STEP_FRAC
-        ax.axvline(x=ev_dt, ymin=0, ymax=line_top_frac,
-                   color=color, alpha=MARKER_ALPHA,
-                   linewidth=MARKER_LW, linestyle="--", zorder=4)
-
-        # Dot at the top of the line
-        y_dot = y_max * 1.55 * line_top_frac
-        ax.plot(ev_dt, y_dot, "o", color=color,
-                markersize=4, alpha=0.85, zorder=5)
-
-        # Label above the dot
-        label_text = textwrap.fill(ev["model"], width=LABEL_MAX_WIDTH)
-        ax.annotate(
-            label_text,
-            xy=(ev_dt, y_dot),
-            xytext=(0, 6),
-            textcoords="offset points",
-            ha="center", va="bottom",
-            fontsize=LABEL_FONTSIZE,
-            color=color,
-            fontweight="semibold",
-            rotation=70,
-            zorder=6,
-        )
+    draw_events(fig, ax, events, y_max)
 
     # ---- legend for organisations -------------------------------------------
     seen_orgs = {ev["org"] for ev in events}
@@ -217,10 +540,10 @@ def plot(df: pd.DataFrame,
         mpatches.Patch(color=ORG_COLORS.get(org, "#6b7280"), label=org)
         for org in sorted(seen_orgs)
     ]
-    commit_line = plt.Line2D([0], [0], color=LINE_COLOR,
-                             linewidth=LINE_WIDTH, label="Monthly Commits")
+    commit_line = Line2D([0], [0], color=LINE_COLOR,
+                         linewidth=LINE_WIDTH, label=f"{per} Commits")
     ax.legend(
-        handles=[commit_line] + org_patches,
+        handles=[commit_line] + overlay_lines + org_patches,
         loc="upper left",
         fontsize=8.5,
         framealpha=0.85,
@@ -238,7 +561,7 @@ def plot(df: pd.DataFrame,
         "Global GitHub Commit Activity vs. Major LLM Releases",
         fontsize=16, fontweight="bold", pad=16,
     )
-    ax.set_xlabel("Month", fontsize=11, labelpad=8)
+    ax.set_xlabel(unit, fontsize=11, labelpad=8)
     ax.set_ylabel("Total Public Commits (PushEvents)", fontsize=11, labelpad=8)
 
     date_range_str = (
@@ -249,15 +572,19 @@ def plot(df: pd.DataFrame,
             transform=ax.transAxes, ha="right", va="bottom",
             fontsize=7.5, color="#888888")
 
-    plt.tight_layout()
+    fig.tight_layout()
 
     if output_path:
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        plt.savefig(output_path, dpi=150, bbox_inches="tight",
-                    facecolor=fig.get_facecolor())
+        try:
+            fig.savefig(output_path, dpi=dpi, bbox_inches="tight",
+                        facecolor=fig.get_facecolor())
+        finally:
+            fig.clear()
         print(f"Chart saved → {output_path}")
     else:
         plt.show()
+        plt.close(fig)
 
 
 # ---------------------------------------------------------------------------
@@ -268,12 +595,29 @@ def _parse_args():
     parser = argparse.ArgumentParser(
         description="Visualize GitHub commit timeline with LLM event overlays."
     )
+    parser.add_argument("--store", default="data/store",
+                        help="Columnar store directory (default: data/store)")
     parser.add_argument("--csv",   default="data/monthly_commits.csv",
-                        help="Path to monthly_commits.csv")
-    parser.add_argument("--start", default=None,
-                        help="Start month YYYY-MM (default: all data)")
-    parser.add_argument("--end",   default=None,
-                        help="End   month YYYY-MM (default: all data)")
+                        help="Path to monthly_commits.csv, used when the "
+                             "store doesn't exist")
+    parser.add_argument("--start", default=None, type=validate_period,
+                        help="Start YYYY-MM, YYYY-MM-DD or YYYY-MM-DDTHH (default: all data)")
+    parser.add_argument("--end",   default=None, type=validate_period,
+                        help="End   YYYY-MM, YYYY-MM-DD or YYYY-MM-DDTHH (default: all data)")
+    parser.add_argument("--granularity", default="month",
+                        choices=["hour", "day", "week", "month"],
+                        help="Plot one point per hour, day, week or month, "
+                             "rolled up from the finest data in the store "
+                             "(default: month)")
+    parser.add_argument("--overlay", default=None, nargs="+", metavar="METRIC",
+                        help="Also draw these stored metrics (e.g. stars forks) "
+                             "on a right-hand axis")
+    parser.add_argument("--outlier-window", default=None, type=int,
+                        help="Score outliers against a trailing window of N "
+                             "points instead of the whole series")
+    parser.add_argument("--verify-capping", action="store_true",
+                        help="Check the incremental outlier state against a "
+                             "full recompute (with --outlier-window)")
     parser.add_argument("--out",   default=None,
                         help="Save chart to this path (e.g. chart.png). "
                              "Omit to display interactively.")
@@ -282,23 +626,32 @@ def _parse_args():
 
 if __name__ == "__main__":
     args = _parse_args()
-    csv_path = Path(args.csv)
+    data_path = Path(args.store)
+    if not data_path.is_dir():
+        data_path = Path(args.csv)
 
-    if not csv_path.exists():
+    if not data_path.exists():
         raise FileNotFoundError(
-            f"Commit data not found at '{csv_path}'.\n"
-            "Run fetch_github_data.py first, or pass --csv <path>."
+            f"Commit data not found at '{args.store}' or '{args.csv}'.\n"
+            "Run main.py first, or pass --store / --csv <path>."
         )
 
-    df = load_commits(csv_path, args.start, args.end)
+    df = load_commits(data_path, args.start, args.end, args.granularity,
+                      outlier_window=args.outlier_window,
+                      verify_capping=args.verify_capping)
 
     # Determine date range for event filtering
     start_date = df["date"].min().date()
     end_date   = df["date"].max().date()
     events = get_events_in_range(start_date, end_date)
 
-    print(f"Loaded {len(df)} months of commit data.")
+    print(f"Loaded {len(df)} {args.granularity}(s) of commit data.")
     print(f"Overlaying {len(events)} LLM release event(s).")
 
+    overlays = None
+    if args.overlay:
+        overlays = load_overlays(data_path, args.overlay, args.start, args.end,
+                                 args.granularity)
+
     out = Path(args.out) if args.out else None
-    plot(df, events, output_path=out)
+    plot(df, events, output_path=out, granularity=args.granularity, overlays=overlays)